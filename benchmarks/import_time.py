@@ -0,0 +1,103 @@
+"""
+Import-time benchmark for the service entry points.
+
+Each module is imported in a fresh interpreter `--runs` times; the median wall
+time and the slowest top-level imports (from `-X importtime`) are reported.
+With `--baseline`, exits non-zero when a module got slower than the recorded
+median by more than `--tolerance`.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --update-baseline
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_MODULES = ["src.initializer", "web.app"]
+DEFAULT_BASELINE = PROJECT_ROOT / "benchmarks" / "import_time_baseline.json"
+
+_TIMER = (
+    "import importlib, sys, time; t = time.perf_counter(); "
+    "importlib.import_module(sys.argv[1]); print(time.perf_counter() - t)"
+)
+
+
+def time_import(module: str) -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", _TIMER, module],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(module: str, top: int = 10) -> list:
+    """(cumulative seconds, package) for the slowest top-level imports of `module`."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented by two spaces per level; keep top-level packages only.
+        if cumulative.strip().isdigit() and not name.startswith("  ") and "." not in name:
+            rows.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, as a fraction")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    for module in args.modules:
+        samples = [time_import(module) for _ in range(args.runs)]
+        results[module] = {
+            "median_seconds": round(statistics.median(samples), 4),
+            "min_seconds": round(min(samples), 4),
+            "slowest_imports": [{"package": name, "seconds": round(sec, 4)} for sec, name in slowest_imports(module)],
+        }
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    regressions = []
+    for module, result in results.items():
+        before = baseline.get(module, {}).get("median_seconds")
+        if before:
+            result["baseline_seconds"] = before
+            if result["median_seconds"] > before * (1 + args.tolerance):
+                regressions.append(module)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for module, result in results.items():
+            note = f" (baseline {result['baseline_seconds']:.3f}s)" if "baseline_seconds" in result else ""
+            print(f"{module}: {result['median_seconds']:.3f}s median over {args.runs} runs{note}")
+            for row in result["slowest_imports"][:5]:
+                print(f"    {row['seconds']:.3f}s  {row['package']}")
+
+    if args.update_baseline:
+        baseline.update({m: {"median_seconds": r["median_seconds"]} for m, r in results.items()})
+        args.baseline.write_text(json.dumps(baseline, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if regressions:
+        print(f"Import-time regression (>{args.tolerance:.0%}): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
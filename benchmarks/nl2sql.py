@@ -0,0 +1,292 @@
+"""
+End-to-end NL->SQL benchmark: the full 4-stage crew over a fixed question
+corpus (benchmarks/corpus.json) against the bundled transcripts DB, with an
+offline LLM so runs are reproducible (see benchmarks/stub_llm.py).
+
+For every question and run it records per-stage wall time, LLM calls and
+approximate prompt/completion tokens, tool calls and tool time, embedding and
+SQLite time, and whether the crew's final SQL returns the same rows as the
+gold SQL. The summary has p50/p95 over all runs. Results are written as JSON
+tagged with the git commit; `--compare` prints the change against an earlier
+result file.
+
+    python benchmarks/nl2sql.py --runs 5
+    python benchmarks/nl2sql.py --llm record --recording benchmarks/recordings/gemini.json
+    python benchmarks/nl2sql.py --llm replay --recording benchmarks/recordings/gemini.json
+    python benchmarks/nl2sql.py --compare benchmarks/results/nl2sql_<commit>.json
+"""
+import argparse
+import functools
+import json
+import math
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+DEFAULT_CORPUS = PROJECT_ROOT / "benchmarks" / "corpus.json"
+DEFAULT_RECORDING = PROJECT_ROOT / "benchmarks" / "recordings" / "replay.json"
+RESULTS_DIR = PROJECT_ROOT / "benchmarks" / "results"
+# Task order in src/crew_factory.build_crew, then the app-side execution of the final SQL.
+STAGES = ["understanding", "planning", "generation", "execution"]
+
+
+def percentile(values, p: float):
+    """Nearest-rank percentile (p in 0..100); None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+class Probe:
+    """Time and count calls to instrumented methods while one question runs."""
+
+    def __init__(self):
+        self.stage = STAGES[0]
+        self.seconds = Counter()
+        self.calls = Counter()
+        self.stage_calls = Counter()
+
+    def reset(self) -> None:
+        self.stage = STAGES[0]
+        self.seconds.clear()
+        self.calls.clear()
+        self.stage_calls.clear()
+
+    def instrument(self, cls, method: str, bucket: str, tool: bool = False) -> None:
+        original = getattr(cls, method)
+        probe = self
+
+        @functools.wraps(original)
+        def wrapper(self, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return original(self, *args, **kwargs)
+            finally:
+                probe.seconds[bucket] += time.perf_counter() - started
+                probe.calls[bucket] += 1
+                if tool:
+                    probe.stage_calls[f"{probe.stage}:{bucket}"] += 1
+        setattr(cls, method, wrapper)
+
+
+def _rows(db_path, sql: str):
+    from src.connection import get_pool
+    with get_pool(db_path).connection() as conn:
+        return [tuple(round(v, 6) if isinstance(v, float) else v for v in row) for row in conn.execute(sql)]
+
+
+def same_result(db_path, sql: str, gold_sql: str) -> bool:
+    """Execution accuracy: same rows as the gold SQL (in order only when the gold SQL orders them)."""
+    try:
+        predicted, gold = _rows(db_path, sql), _rows(db_path, gold_sql)
+    except Exception:
+        return False
+    if "order by" in gold_sql.lower():
+        return predicted == gold
+    return Counter(predicted) == Counter(gold)
+
+
+def run_question(entry, llm, probe, db_path) -> dict:
+    from src.crew_factory import crew_inputs
+    from src.initializer import create_crew, get_sql_execution_tool
+    from src.output_parser import parse_crew_output
+    from src.retrieval_context import retrieval_scope
+    from src.vectorstore_setup import embeddings
+
+    llm.begin(entry)
+    probe.reset()
+    stage_ends = []
+
+    def task_done(_output):
+        stage_ends.append(time.perf_counter())
+        probe.stage = STAGES[min(len(stage_ends), len(STAGES) - 1)]
+
+    embed_before = embeddings.stats()["embed_seconds"]
+    crew = create_crew(task_callback=task_done)
+    started = time.perf_counter()
+    error, raw = None, None
+    try:
+        with retrieval_scope():
+            raw = crew.kickoff(inputs=crew_inputs(entry["question"])).raw
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+
+    marks = [started] + stage_ends
+    stages = {STAGES[i]: round(marks[i + 1] - marks[i], 4) for i in range(min(len(stage_ends), len(STAGES)))}
+
+    parsed = parse_crew_output(raw) if raw is not None else None
+    final_sql, correct = None, False
+    if isinstance(parsed, dict) and parsed.get("success") and parsed.get("query"):
+        before = time.perf_counter()
+        result = get_sql_execution_tool().execute(parsed["query"])
+        stages["final_execution"] = round(time.perf_counter() - before, 4)
+        if result.get("success"):
+            final_sql = result["query"]
+            correct = same_result(db_path, final_sql, entry["gold_sql"])
+    elif error is None:
+        error = "crew returned no SQL"
+
+    llm_stats = {}
+    for call in llm.calls:
+        stats = llm_stats.setdefault(call["stage"], {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+        stats["calls"] += 1
+        stats["prompt_tokens"] += call["prompt_tokens"]
+        stats["completion_tokens"] += call["completion_tokens"]
+
+    tools = {"vector_search_tool", "sql_execution_tool", "sql_error_retrieval_tool"}
+    return {
+        "id": entry["id"],
+        "seconds": round(time.perf_counter() - started, 4),
+        "stages": stages,
+        "llm": llm_stats,
+        "tool_calls": {k: v for k, v in probe.calls.items() if k in tools},
+        "tool_calls_by_stage": dict(probe.stage_calls),
+        "tool_seconds": {k: round(v, 4) for k, v in probe.seconds.items() if k in tools},
+        "sqlite_seconds": round(probe.seconds["sqlite"], 4),
+        "embedding_seconds": round(embeddings.stats()["embed_seconds"] - embed_before, 4),
+        "final_sql": final_sql,
+        "correct": correct,
+        "error": error,
+    }
+
+
+def summarize(results) -> dict:
+    def spread(values):
+        return {"p50": percentile(values, 50), "p95": percentile(values, 95)}
+
+    summary = {
+        "questions": len({r["id"] for r in results}),
+        "runs": len(results),
+        "accuracy": round(sum(r["correct"] for r in results) / len(results), 4) if results else None,
+        "seconds": spread([r["seconds"] for r in results]),
+        "stages": {s: spread([r["stages"][s] for r in results if s in r["stages"]])
+                   for s in STAGES + ["final_execution"]},
+        "sqlite_seconds": spread([r["sqlite_seconds"] for r in results]),
+        "embedding_seconds": spread([r["embedding_seconds"] for r in results]),
+    }
+    per_run = max(1, len(results))
+    totals = Counter()
+    for r in results:
+        for stats in r["llm"].values():
+            totals.update(stats)
+        totals.update({f"tool:{k}": v for k, v in r["tool_calls"].items()})
+    summary["per_question_mean"] = {k: round(v / per_run, 2) for k, v in sorted(totals.items())}
+    summary["errors"] = sorted({r["id"] for r in results if r["error"]})
+    return summary
+
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=PROJECT_ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(old: dict, new: dict) -> None:
+    """Print p50/p95 and accuracy changes between two result files."""
+    rows = [("accuracy", old["summary"]["accuracy"], new["summary"]["accuracy"])]
+    for key in ("seconds", "sqlite_seconds", "embedding_seconds"):
+        for p in ("p50", "p95"):
+            rows.append((f"{key} {p}", old["summary"][key][p], new["summary"][key][p]))
+    for stage in new["summary"]["stages"]:
+        for p in ("p50", "p95"):
+            rows.append((f"{stage} {p}", old["summary"]["stages"].get(stage, {}).get(p),
+                         new["summary"]["stages"][stage][p]))
+    print(f"{old['commit']} -> {new['commit']}")
+    for name, before, after in rows:
+        if before is None or after is None:
+            continue
+        change = f"{(after - before) / before:+.1%}" if before else "n/a"
+        print(f"    {name:<28} {before:>10.4f} {after:>10.4f}  {change}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS)
+    parser.add_argument("--runs", type=int, default=3, help="repetitions of the whole corpus")
+    parser.add_argument("--only", nargs="*", help="question ids to run")
+    parser.add_argument("--llm", choices=["stub", "replay", "record"], default="stub")
+    parser.add_argument("--recording", type=Path, default=DEFAULT_RECORDING)
+    parser.add_argument("--no-warm-up", action="store_true", help="include model/store loading in the first run")
+    parser.add_argument("--output", type=Path, help="result file (default: benchmarks/results/nl2sql_<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    from benchmarks.stub_llm import ReplayLLM, ScriptedLLM
+    from src import initializer
+    from src.paths import DB_PATH
+    from src.tools.sql_error_retrieval_tool import SQLErrorRetrievalTool
+    from src.tools.sql_execution_tool import SQLExecutionTool
+    from src.tools.vector_search_tool import VectorSearchTool
+
+    corpus = json.loads(args.corpus.read_text())
+    if args.only:
+        corpus = [e for e in corpus if e["id"] in args.only]
+    if args.llm == "stub":
+        llm = ScriptedLLM()
+    elif args.llm == "replay":
+        llm = ReplayLLM(args.recording)
+    else:
+        llm = ReplayLLM(args.recording, inner=initializer.get_llm())
+    initializer.set_llm(llm)
+
+    probe = Probe()
+    probe.instrument(VectorSearchTool, "_run", "vector_search_tool", tool=True)
+    probe.instrument(SQLExecutionTool, "_run", "sql_execution_tool", tool=True)
+    probe.instrument(SQLErrorRetrievalTool, "_run", "sql_error_retrieval_tool", tool=True)
+    probe.instrument(SQLExecutionTool, "_execute_once", "sqlite")
+    probe.instrument(SQLExecutionTool, "_validate", "sqlite")
+
+    startup = {} if args.no_warm_up else initializer.warm_up()
+    db_path = initializer.get_sql_execution_tool().db_path or str(DB_PATH)
+
+    results = []
+    for run in range(args.runs):
+        for entry in corpus:
+            result = run_question(entry, llm, probe, db_path)
+            result["run"] = run
+            results.append(result)
+            mark = "✓" if result["correct"] else "✗"
+            print(f"[{run + 1}/{args.runs}] {mark} {entry['id']}: {result['seconds']:.2f}s"
+                  + (f"  ({result['error']})" if result["error"] else ""))
+    if args.llm == "record":
+        llm.save()
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "llm": args.llm,
+        "corpus": str(args.corpus),
+        "startup_phases": startup,
+        "summary": summarize(results),
+        "results": results,
+    }
+    output = args.output or RESULTS_DIR / f"nl2sql_{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, default=str) + "\n")
+
+    summary = report["summary"]
+    print(f"accuracy {summary['accuracy']:.1%} over {summary['runs']} runs; "
+          f"p50 {summary['seconds']['p50']:.2f}s, p95 {summary['seconds']['p95']:.2f}s")
+    for stage, spread in summary["stages"].items():
+        if spread["p50"] is not None:
+            print(f"    {stage:<16} p50 {spread['p50']:.3f}s  p95 {spread['p95']:.3f}s")
+    print(f"Results written to {output}")
+    if args.compare:
+        compare(json.loads(args.compare.read_text()), report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
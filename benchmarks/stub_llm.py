@@ -0,0 +1,173 @@
+"""
+Offline stand-ins for the Gemini LLM, for reproducible benchmark runs.
+
+ScriptedLLM plays every agent from the benchmark corpus: it answers in the
+ReAct format CrewAI parses, so the real tools run (vector search, SQL
+execution, error retrieval) and only the model's thinking is skipped. The SQL
+it "generates" is the entry's `generated_sql` (a deliberately broken query, to
+exercise local repair) or its `gold_sql`. When execution fails it asks the
+error-retrieval tool once and then gives up, so accuracy measures the
+pipeline's own repair, not the stub's.
+
+ReplayLLM records a real model's answers per question (`record`) and plays
+them back in order (`replay`), failing loudly on anything not recorded.
+
+Both count calls, approximate prompt/completion tokens (chars / 4) and tool
+actions per stage; `begin(entry)` starts a new question.
+"""
+import json
+import math
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from crewai import BaseLLM
+
+from src.output_parser import parse_crew_output
+
+# Agent role (from src/agents/) -> stage name, in crew task order.
+STAGE_ROLES = {
+    "Advanced Question Understanding Specialist": "understanding",
+    "Database Schema Retrieval and Semantic Planning Expert": "planning",
+    "SQL Generation Expert": "generation",
+    "SQL Execution and Automatic Repair Specialist": "execution",
+}
+_ACTION_RE = re.compile(r"^Action:\s*(\S+)", re.MULTILINE)
+_OBSERVATION = "Observation:"
+# Tool results fed back to the agent, not the format example in CrewAI's prompt.
+_OBSERVATION_RE = re.compile(r"Observation:(?! the result of the action)")
+
+
+def approx_tokens(text: str) -> int:
+    return math.ceil(len(text) / 4)
+
+
+def _text(messages) -> str:
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(str(m.get("content", "")) for m in messages)
+
+
+def detect_stage(messages) -> str:
+    """Stage of the agent being prompted, from its role in the system prompt (or anywhere)."""
+    first = _text(messages[:1]) if isinstance(messages, list) else messages
+    for text in (first, _text(messages)):
+        for role, stage in STAGE_ROLES.items():
+            if role in text:
+                return stage
+    return "unknown"
+
+
+class _BenchmarkLLM(BaseLLM):
+    """Per-stage call/token/tool-action accounting shared by the stub and replay models."""
+
+    def __init__(self, model: str):
+        super().__init__(model=model, temperature=0)
+        self.entry: Dict[str, Any] = {}
+        self.calls: List[Dict[str, Any]] = []
+
+    def begin(self, entry: Dict[str, Any]) -> None:
+        self.entry = entry
+        self.calls = []
+
+    def _respond(self, messages, stage: str, **kwargs) -> str:
+        raise NotImplementedError
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs) -> str:
+        stage = detect_stage(messages)
+        answer = self._respond(messages, stage, tools=tools, callbacks=callbacks,
+                               available_functions=available_functions, **kwargs)
+        self.calls.append({
+            "stage": stage,
+            "prompt_tokens": approx_tokens(_text(messages)),
+            "completion_tokens": approx_tokens(answer),
+            "actions": _ACTION_RE.findall(answer),
+        })
+        return answer
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+    def supports_stop_words(self) -> bool:
+        return True
+
+    def get_context_window_size(self) -> int:
+        return 128000
+
+
+def _action(tool: str, arguments: Dict[str, Any]) -> str:
+    return f"Thought: I should use {tool}.\nAction: {tool}\nAction Input: {json.dumps(arguments)}"
+
+
+def _final(answer: Any) -> str:
+    text = answer if isinstance(answer, str) else json.dumps(answer)
+    return f"Thought: I now know the final answer\nFinal Answer: {text}"
+
+
+class ScriptedLLM(_BenchmarkLLM):
+    """Deterministic agent answers driven by the current corpus entry (see module docstring)."""
+
+    def __init__(self):
+        super().__init__(model="benchmark/scripted")
+
+    def _respond(self, messages, stage: str, **kwargs) -> str:
+        text = _text(messages)
+        steps = len(_OBSERVATION_RE.findall(text))
+        question = self.entry.get("question", "")
+        sql = self.entry.get("generated_sql") or self.entry.get("gold_sql", "")
+
+        if stage == "understanding":
+            return _action("vector_search_tool", {"query": question}) if steps == 0 else _final(question)
+        if stage == "planning":
+            if steps == 0:
+                return _action("vector_search_tool", {"query": question})
+            return _final({"query_refined": question, "target_tables": [], "required_columns": []})
+        if stage == "generation":
+            return _final(sql)
+        if stage == "execution":
+            if steps == 0:
+                return _action("sql_execution_tool", {"query": sql})
+            observation = parse_crew_output(text.rsplit(_OBSERVATION, 1)[1].strip())
+            if isinstance(observation, dict) and observation.get("success") and observation.get("query"):
+                return _final({"success": True, "query": observation["query"], "status": "executed"})
+            if steps == 1 and isinstance(observation, dict):
+                return _action("sql_error_retrieval_tool", {"error_result": observation})
+            return _final("I apologize, but I wasn't able to retrieve the information you requested.")
+        return _final("")
+
+
+class ReplayLLM(_BenchmarkLLM):
+    """Record a real model's answers per corpus entry, or replay them in order."""
+
+    def __init__(self, path, inner: Optional[BaseLLM] = None):
+        super().__init__(model="benchmark/record" if inner is not None else "benchmark/replay")
+        self.path = Path(path)
+        self.inner = inner
+        self.recordings: Dict[str, List[str]] = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.recordings = json.load(f)
+        self._position = 0
+
+    def begin(self, entry: Dict[str, Any]) -> None:
+        super().begin(entry)
+        self._position = 0
+        if self.inner is not None:
+            self.recordings[entry["id"]] = []
+
+    def _respond(self, messages, stage: str, **kwargs) -> str:
+        key = self.entry["id"]
+        if self.inner is not None:
+            answer = self.inner.call(messages, **{k: v for k, v in kwargs.items() if v is not None})
+            self.recordings[key].append(answer)
+            return answer
+        answers = self.recordings.get(key, [])
+        if self._position >= len(answers):
+            raise RuntimeError(f"No recorded answer #{self._position} for {key!r} in {self.path}")
+        self._position += 1
+        return answers[self._position - 1]
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.recordings, f, indent=2)
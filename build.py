@@ -1,5 +1,7 @@
 import os
 from src.vectorstore_setup import setup_vector_store
+from src.value_index import get_value_index
+from src.paths import DB_PATH
 
 if __name__ == "__main__":
     print("🧱 Setting up the project...")
@@ -7,4 +9,7 @@ if __name__ == "__main__":
     # Rebuild vector store
     vectorstore = setup_vector_store()
 
+    # Offline value index for correcting WHERE literals
+    get_value_index(DB_PATH)
+
     print("✅ Project setup complete.")
@@ -0,0 +1,134 @@
+import re
+import sqlite3
+import threading
+import time
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from src.telemetry import record_cache
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    text = re.sub(r"\s+", " ", question.strip().lower())
+    return text.rstrip(" ?!.;")
+
+
+class AnswerCache:
+    """
+    On-disk cache of NL question -> validated SQL.
+
+    Entries are keyed on the normalized question plus the DB fingerprint, so a
+    schema or data change never serves an old answer. Only the SQL is stored:
+    a hit re-runs it against the live database and skips every LLM stage.
+    Eviction is LRU on `last_access`, bounded by `max_entries` and `ttl_seconds`.
+    """
+
+    def __init__(self, path, max_entries: int = 1000, ttl_seconds: int = 7 * 24 * 3600):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS answers (
+                   key TEXT PRIMARY KEY,
+                   question TEXT NOT NULL,
+                   fingerprint TEXT NOT NULL,
+                   sql TEXT NOT NULL,
+                   latency REAL NOT NULL DEFAULT 0,
+                   created_at REAL NOT NULL,
+                   last_access REAL NOT NULL,
+                   hit_count INTEGER NOT NULL DEFAULT 0
+               );"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_access ON answers(last_access);")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(question: str, fingerprint: str) -> str:
+        raw = f"{fingerprint}\x1f{normalize_question(question)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, question: str, fingerprint: str) -> Optional[str]:
+        """Return the cached SQL for this question/DB, or None on a miss."""
+        key = self.make_key(question, fingerprint)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sql, latency, created_at FROM answers WHERE key = ?;", (key,)
+            ).fetchone()
+            if row is None or now - row[2] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM answers WHERE key = ?;", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                record_cache("answer", misses=1)
+                return None
+            self._conn.execute(
+                "UPDATE answers SET last_access = ?, hit_count = hit_count + 1 WHERE key = ?;",
+                (now, key),
+            )
+            self._conn.commit()
+            self.hits += 1
+            record_cache("answer", hits=1)
+            self.saved_seconds += row[1]
+            return row[0]
+
+    def put(self, question: str, fingerprint: str, sql: str, latency: float = 0.0) -> None:
+        """Store the SQL that answered `question`, then evict down to `max_entries`."""
+        key = self.make_key(question, fingerprint)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """INSERT OR REPLACE INTO answers
+                       (key, question, fingerprint, sql, latency, created_at, last_access, hit_count)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, 0);""",
+                (key, normalize_question(question), fingerprint, sql, latency, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute("DELETE FROM answers WHERE created_at < ?;", (now - self.ttl_seconds,))
+        self._conn.execute(
+            """DELETE FROM answers WHERE key IN (
+                   SELECT key FROM answers ORDER BY last_access DESC LIMIT -1 OFFSET ?
+               );""",
+            (self.max_entries,),
+        )
+
+    def invalidate(self, fingerprint: Optional[str] = None, question: Optional[str] = None) -> int:
+        """Drop entries for one DB fingerprint / question, or everything. Returns rows removed."""
+        clauses, params = [], []
+        if fingerprint:
+            clauses.append("fingerprint = ?")
+            params.append(fingerprint)
+        if question:
+            clauses.append("question = ?")
+            params.append(normalize_question(question))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            cursor = self._conn.execute(f"DELETE FROM answers{where};", params)
+            self._conn.commit()
+            return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM answers;").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "saved_agent_seconds": round(self.saved_seconds, 3),
+        }
@@ -0,0 +1,225 @@
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from src.connection import db_fingerprint, get_pool
+from src.paths import CATALOG_CACHE_DIR
+
+
+class Column(NamedTuple):
+    name: str
+    type: str
+    notnull: bool
+    default: Optional[str]
+    pk: bool
+
+
+class ForeignKey(NamedTuple):
+    column: str
+    ref_table: str
+    ref_column: str
+
+
+class Table(NamedTuple):
+    name: str
+    columns: List[Column]
+    foreign_keys: List[ForeignKey]
+    sample_rows: List[list]
+    row_count: int
+
+
+class SchemaCatalog:
+    """
+    Typed view of one database's schema: tables, columns, PK/FK edges, sample
+    rows and row counts, with O(1) lookup maps.
+
+    Built once per DB fingerprint (see `get_catalog`) and persisted as JSON, so
+    tools and prompts never re-read PRAGMAs or re-parse document text on the
+    request path. Name lookups are case-insensitive.
+    """
+
+    def __init__(self, fingerprint: str, tables: List[Table]):
+        self.fingerprint = fingerprint
+        self.tables: Dict[str, Table] = {t.name: t for t in tables}
+        self._table_by_lower = {t.name.lower(): t.name for t in tables}
+        self.column_to_tables: Dict[str, List[str]] = {}
+        self._column_index: Dict[str, Dict[str, int]] = {}
+        for table in tables:
+            self._column_index[table.name] = {c.name.lower(): i for i, c in enumerate(table.columns)}
+            for column in table.columns:
+                self.column_to_tables.setdefault(column.name.lower(), []).append(table.name)
+
+    # --- lookups -----------------------------------------------------------
+
+    def table(self, name: str) -> Optional[Table]:
+        real = self._table_by_lower.get(name.lower())
+        return self.tables[real] if real else None
+
+    def column_names(self, table: str) -> List[str]:
+        info = self.table(table)
+        return [c.name for c in info.columns] if info else []
+
+    def column(self, table: str, column: str) -> Optional[Column]:
+        info = self.table(table)
+        if info is None:
+            return None
+        idx = self._column_index[info.name].get(column.lower())
+        return info.columns[idx] if idx is not None else None
+
+    def tables_with_column(self, column: str) -> List[str]:
+        return self.column_to_tables.get(column.lower(), [])
+
+    def sample_values(self, table: str, column: str) -> List[Any]:
+        """Distinct non-NULL sample values of `table.column`, in sample order."""
+        info = self.table(table)
+        if info is None:
+            return []
+        idx = self._column_index[info.name].get(column.lower())
+        if idx is None:
+            return []
+        return list(dict.fromkeys(row[idx] for row in info.sample_rows if row[idx] is not None))
+
+    # --- rendering ----------------------------------------------------------
+
+    @staticmethod
+    def column_line(column: Column) -> str:
+        flags = []
+        if column.pk:       flags.append("PRIMARY KEY")
+        if column.notnull:  flags.append("NOT NULL")
+        if column.default:  flags.append(f"DEFAULT {column.default}")
+        flag_txt = f" [{' '.join(flags)}]" if flags else ""
+        return f"- {column.name} ({column.type}){flag_txt}"
+
+    def render_document(self, table: str) -> str:
+        """
+        Schema document text for one table, as embedded in the Chroma store.
+        Column statistics change with every write, so they are not part of it
+        (see SQLErrorRetrievalTool); the text, and its hash, only change with
+        the schema or sample rows.
+        """
+        info = self.table(table)
+        content = [f"Table: {info.name}", "\nColumns:"]
+        content.extend(self.column_line(c) for c in info.columns)
+
+        if info.foreign_keys:
+            content.append("\nForeign Keys:")
+            for fk in info.foreign_keys:
+                content.append(f"- {fk.column} references {fk.ref_table}({fk.ref_column})")
+
+        if info.sample_rows:
+            content.append("\nSample Data:")
+            heads = [c.name for c in info.columns]
+            content.append(" | ".join(heads))
+            content.append("-" * (len(" | ".join(heads))))
+            for row in info.sample_rows:
+                content.append(" | ".join(str(v) if v is not None else "NULL" for v in row))
+        return "\n".join(content)
+
+    # --- building / persistence --------------------------------------------
+
+    @classmethod
+    def from_db(cls, db_path, fingerprint: Optional[str] = None, sample_size: int = 3) -> "SchemaCatalog":
+        fingerprint = fingerprint or db_fingerprint(db_path)
+        tables = []
+        with get_pool(db_path).connection() as conn:
+            names = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table';")]
+            for name in names:
+                quoted = '"' + name.replace('"', '""') + '"'
+                columns = [
+                    Column(r[1], r[2], bool(r[3]), r[4], bool(r[5]))
+                    for r in conn.execute(f"PRAGMA table_info({quoted});")
+                ]
+                fks = [ForeignKey(r[3], r[2], r[4]) for r in conn.execute(f"PRAGMA foreign_key_list({quoted});")]
+                sample = [list(r) for r in conn.execute(f"SELECT * FROM {quoted} LIMIT {sample_size};")]
+                (row_count,) = conn.execute(f"SELECT COUNT(*) FROM {quoted};").fetchone()
+                tables.append(Table(name, columns, fks, sample, row_count))
+        return cls(fingerprint, tables)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "fingerprint": self.fingerprint,
+            "tables": [
+                {
+                    "name": t.name,
+                    "columns": [list(c) for c in t.columns],
+                    "foreign_keys": [list(fk) for fk in t.foreign_keys],
+                    "sample_rows": t.sample_rows,
+                    "row_count": t.row_count,
+                }
+                for t in self.tables.values()
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SchemaCatalog":
+        tables = [
+            Table(
+                t["name"],
+                [Column(*c) for c in t["columns"]],
+                [ForeignKey(*fk) for fk in t["foreign_keys"]],
+                t["sample_rows"],
+                t["row_count"],
+            )
+            for t in data["tables"]
+        ]
+        return cls(data["fingerprint"], tables)
+
+    def save(self, path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"), default=str)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path) -> "SchemaCatalog":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+_catalogs: Dict[str, SchemaCatalog] = {}
+_catalogs_lock = threading.Lock()
+# resolved DB path -> fingerprints of catalogs built for it, so they can be dropped together
+_fingerprints_by_path: Dict[str, set] = {}
+
+
+def get_catalog(db_path, cache_dir=CATALOG_CACHE_DIR) -> SchemaCatalog:
+    """
+    Catalog for the database's current fingerprint: memory first, then the
+    JSON cache file, then a fresh build from the DB (which is then saved).
+    """
+    fingerprint = db_fingerprint(db_path)
+    with _catalogs_lock:
+        catalog = _catalogs.get(fingerprint)
+    if catalog is not None:
+        return catalog
+
+    cache_file = Path(cache_dir) / f"{fingerprint}.json"
+    catalog = None
+    if cache_file.exists():
+        try:
+            catalog = SchemaCatalog.load(cache_file)
+        except (OSError, ValueError, KeyError, TypeError):
+            catalog = None
+    if catalog is None:
+        catalog = SchemaCatalog.from_db(db_path, fingerprint)
+        try:
+            catalog.save(cache_file)
+        except OSError as e:
+            print(f"Could not persist schema catalog: {str(e)}")
+
+    with _catalogs_lock:
+        _catalogs[fingerprint] = catalog
+        _fingerprints_by_path.setdefault(str(Path(db_path).resolve()), set()).add(fingerprint)
+    return catalog
+
+
+def forget_catalogs(db_path) -> List[str]:
+    """Drop in-memory catalogs for `db_path` (JSON cache files are kept). Returns their fingerprints."""
+    with _catalogs_lock:
+        fingerprints = _fingerprints_by_path.pop(str(Path(db_path).resolve()), set())
+        for fingerprint in fingerprints:
+            _catalogs.pop(fingerprint, None)
+    return sorted(fingerprints)
@@ -0,0 +1,270 @@
+import hashlib
+import json
+import math
+import os
+import random
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from src.catalog import get_catalog
+from src.connection import get_pool
+from src.paths import CATALOG_CACHE_DIR
+
+# Tables up to this many rows are streamed whole; larger ones are block-sampled down to it.
+PROFILE_MAX_ROWS = int(os.getenv("PROFILE_MAX_ROWS", "100000"))
+PROFILE_SAMPLE_BLOCKS = int(os.getenv("PROFILE_SAMPLE_BLOCKS", "20"))
+PROFILE_TOP_K = int(os.getenv("PROFILE_TOP_K", "5"))
+# Frequency counters are pruned back to their heaviest TOP_COUNTER_SIZE entries past twice that.
+TOP_COUNTER_SIZE = 1000
+MAX_VALUE_CHARS = 40
+
+
+class HyperLogLog:
+    """Fixed-memory distinct counter (2**p one-byte registers, ~1.04/sqrt(2**p) error)."""
+
+    def __init__(self, p: int = 12):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    def add(self, value: Any) -> None:
+        h = int.from_bytes(hashlib.blake2b(repr(value).encode("utf-8"), digest_size=8).digest(), "big")
+        index = h >> (64 - self.p)
+        rest = (h << self.p) & 0xFFFFFFFFFFFFFFFF
+        rank = 64 - self.p + 1 if rest == 0 else 65 - rest.bit_length()
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * math.log(self.m / zeros)     # linear counting for small cardinalities
+        return int(round(estimate))
+
+
+class ColumnProfile(NamedTuple):
+    null_fraction: float
+    distinct: int
+    min: Any
+    max: Any
+    top_values: List[list]         # [[value, count in sample], ...]
+    distinct_source: str = "hll"   # "hll", "hll_scaled" (sampled, near-unique) or "sqlite_stat1"
+
+
+def _order_key(value):
+    # SQLite's cross-type ordering: NULL < numbers < text < blob.
+    if isinstance(value, (int, float)):
+        return (0, value)
+    if isinstance(value, str):
+        return (1, value)
+    return (2, bytes(value))
+
+
+def _display(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "<blob>"
+    if isinstance(value, str) and len(value) > MAX_VALUE_CHARS:
+        return value[:MAX_VALUE_CHARS] + "…"
+    return value
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _min_max_sql(table: str, column: str) -> str:
+    # One aggregate per subquery: SQLite only turns a lone MIN() or MAX() into
+    # an index (or rowid) seek; `SELECT MIN(x), MAX(x)` scans the whole table.
+    return f"SELECT (SELECT MIN({column}) FROM {_quote(table)}), (SELECT MAX({column}) FROM {_quote(table)});"
+
+
+def _rows(conn, table: str, columns: List[str], row_count: int, seed: str):
+    """(row iterator, sampled): the whole table, or PROFILE_SAMPLE_BLOCKS random rowid ranges of it."""
+    select = f"SELECT {', '.join(_quote(c) for c in columns)} FROM {_quote(table)}"
+    if row_count <= PROFILE_MAX_ROWS:
+        return conn.execute(select + ";"), False
+    try:
+        low, high = conn.execute(_min_max_sql(table, "rowid")).fetchone()
+    except sqlite3.OperationalError:            # WITHOUT ROWID table: take the head
+        return conn.execute(f"{select} LIMIT {PROFILE_MAX_ROWS};"), True
+    block = max(1, PROFILE_MAX_ROWS // PROFILE_SAMPLE_BLOCKS)
+    rng = random.Random(seed)                  # deterministic per DB version, so re-profiling is reproducible
+    starts = sorted(rng.randint(low, max(low, high - block)) for _ in range(PROFILE_SAMPLE_BLOCKS))
+
+    def blocks():
+        for start in starts:
+            yield from conn.execute(f"{select} WHERE rowid BETWEEN ? AND ?;", (start, start + block - 1))
+    return blocks(), True
+
+
+class _ColumnStats:
+    """Running null count, HLL, min/max and pruned frequency counter for one column."""
+
+    __slots__ = ("nulls", "hll", "counts", "low", "high", "low_key", "high_key")
+
+    def __init__(self):
+        self.nulls = 0
+        self.hll = HyperLogLog()
+        self.counts = Counter()
+        self.low = self.high = self.low_key = self.high_key = None
+
+    def add(self, value) -> None:
+        if value is None:
+            self.nulls += 1
+            return
+        self.hll.add(value)
+        self.counts[value] += 1
+        if len(self.counts) > 2 * TOP_COUNTER_SIZE:
+            self.counts = Counter(dict(self.counts.most_common(TOP_COUNTER_SIZE)))
+        key = _order_key(value)
+        if self.low_key is None or key < self.low_key:
+            self.low, self.low_key = value, key
+        if self.high_key is None or key > self.high_key:
+            self.high, self.high_key = value, key
+
+
+def _index_stats(conn) -> Dict[str, Dict[str, int]]:
+    """table -> {leading index column: distinct estimate} from sqlite_stat1, if ANALYZE has run."""
+    try:
+        stat_rows = conn.execute("SELECT tbl, idx, stat FROM sqlite_stat1 WHERE idx IS NOT NULL;").fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    stats: Dict[str, Dict[str, int]] = {}
+    for table, index, stat in stat_rows:
+        parts = stat.split()
+        if len(parts) < 2 or not parts[0].isdigit() or not parts[1].isdigit():
+            continue
+        info = conn.execute(f"PRAGMA index_info({_quote(index)});").fetchall()
+        if info and info[0][2]:
+            stats.setdefault(table, {})[info[0][2]] = max(1, int(parts[0]) // max(1, int(parts[1])))
+    return stats
+
+
+def profile_table(conn, table: str, columns: List[str], row_count: int, seed: str,
+                  indexed: Optional[Dict[str, int]] = None) -> Dict[str, ColumnProfile]:
+    """Profile every column of `table` in a single pass over its (sampled) rows."""
+    indexed = indexed or {}
+    rows, sampled = _rows(conn, table, columns, row_count, seed)
+    stats = [_ColumnStats() for _ in columns]
+    seen = 0
+    for row in rows:
+        seen += 1
+        for column_stats, value in zip(stats, row):
+            column_stats.add(value)
+
+    profiles = {}
+    for column, column_stats in zip(columns, stats):
+        non_null = seen - column_stats.nulls
+        low, high = column_stats.low, column_stats.high
+        distinct, source = min(column_stats.hll.count(), non_null), "hll"
+        if column in indexed:
+            distinct, source = indexed[column], "sqlite_stat1"
+            low, high = conn.execute(_min_max_sql(table, _quote(column))).fetchone()
+        elif sampled and non_null and distinct >= 0.9 * non_null:
+            # Nearly all-unique in the sample: assume it keeps growing with the table.
+            distinct, source = int(distinct * row_count / seen), "hll_scaled"
+        profiles[column] = ColumnProfile(
+            null_fraction=round(column_stats.nulls / seen, 4) if seen else 0.0,
+            distinct=distinct,
+            min=_display(low),
+            max=_display(high),
+            top_values=[[_display(v), c] for v, c in column_stats.counts.most_common(PROFILE_TOP_K) if c > 1],
+            distinct_source=source,
+        )
+    return profiles
+
+
+class DatabaseProfile:
+    """Column profiles for every table of one DB version."""
+
+    def __init__(self, fingerprint: str, tables: Dict[str, Dict[str, ColumnProfile]]):
+        self.fingerprint = fingerprint
+        self.tables = tables
+
+    def column(self, table: str, column: str) -> Optional[ColumnProfile]:
+        for name, columns in self.tables.items():
+            if name.lower() == table.lower():
+                for col, profile in columns.items():
+                    if col.lower() == column.lower():
+                        return profile
+        return None
+
+    @classmethod
+    def from_db(cls, db_path, catalog) -> "DatabaseProfile":
+        tables = {}
+        with get_pool(db_path).connection() as conn:
+            index_stats = _index_stats(conn)
+            for name, table in catalog.tables.items():
+                columns = [c.name for c in table.columns]
+                tables[name] = profile_table(
+                    conn, name, columns, table.row_count, f"{catalog.fingerprint}:{name}", index_stats.get(name)
+                )
+        return cls(catalog.fingerprint, tables)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "fingerprint": self.fingerprint,
+            "tables": {t: {c: list(p) for c, p in cols.items()} for t, cols in self.tables.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DatabaseProfile":
+        tables = {t: {c: ColumnProfile(*p) for c, p in cols.items()} for t, cols in data["tables"].items()}
+        return cls(data["fingerprint"], tables)
+
+
+_profiles: Dict[str, DatabaseProfile] = {}
+_profiles_lock = threading.Lock()
+
+
+def get_profile(db_path, cache_dir=CATALOG_CACHE_DIR) -> DatabaseProfile:
+    """Profile for the DB's current fingerprint: memory, then JSON cache, then a fresh profiling pass."""
+    catalog = get_catalog(db_path)
+    with _profiles_lock:
+        profile = _profiles.get(catalog.fingerprint)
+    if profile is not None:
+        return profile
+
+    cache_file = Path(cache_dir) / f"{catalog.fingerprint}.profile.json"
+    profile = None
+    if cache_file.exists():
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                profile = DatabaseProfile.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            profile = None
+    if profile is None:
+        profile = DatabaseProfile.from_db(db_path, catalog)
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = cache_file.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(profile.to_dict(), f, separators=(",", ":"), default=str)
+            tmp.replace(cache_file)
+        except OSError as e:
+            print(f"Could not persist column profile: {str(e)}")
+
+    with _profiles_lock:
+        _profiles[catalog.fingerprint] = profile
+    return profile
+
+
+def describe_column(name: str, profile: ColumnProfile) -> str:
+    """One schema-doc line, e.g. `- city: 0% null, ~120 distinct, range 'A' .. 'Z', top: 'Port X' (12)`."""
+    parts = [f"{profile.null_fraction:.0%} null", f"~{profile.distinct} distinct"]
+    if profile.min is not None:
+        parts.append(f"range {profile.min!r} .. {profile.max!r}")
+    if profile.top_values:
+        parts.append("top: " + ", ".join(f"{v!r} ({c})" for v, c in profile.top_values))
+    return f"- {name}: " + ", ".join(parts)
+
+
+def forget_profiles(fingerprints) -> None:
+    with _profiles_lock:
+        for fingerprint in fingerprints:
+            _profiles.pop(fingerprint, None)
@@ -0,0 +1,62 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+
+
+class QueueFullError(Exception):
+    """Raised when a request arrives while the wait queue is already full."""
+
+
+class QueueTimeoutError(Exception):
+    """Raised when a queued request waits longer than `queue_timeout` for a slot."""
+
+
+class CrewLimiter:
+    """
+    Caps concurrent crew runs at `max_concurrent` and queued ones at `max_queue`.
+
+    Requests beyond both limits are rejected immediately instead of piling up
+    on the worker threadpool.
+    """
+
+    def __init__(self, max_concurrent: int = 4, max_queue: int = 16, queue_timeout: Optional[float] = 60.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = None  # created on first use, inside the server's event loop
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        if self.active + self.waiting >= self.max_concurrent + self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(f"{self.waiting} requests already queued")
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise QueueTimeoutError(f"no crew slot free after {self.queue_timeout}s")
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
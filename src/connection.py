@@ -1,5 +1,10 @@
+from contextlib import contextmanager
 from pathlib import Path
+import hashlib
+import os
+import queue
 import sqlite3
+import threading
 
 # Define project root and DB path
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
@@ -10,3 +15,199 @@ def get_connection():
         raise FileNotFoundError(f"Database file not found at {DB_PATH}")
     conn = sqlite3.connect(DB_PATH)
     return conn
+
+
+# Tuning applied to every pooled connection. Sizes are overridable via env.
+MMAP_SIZE  = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))   # negative = KiB, i.e. 64 MiB
+POOL_SIZE  = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+# SQLite's hard_heap_limit is process-wide; 0 leaves it unset.
+HARD_HEAP_LIMIT = int(os.getenv("SQLITE_HARD_HEAP_LIMIT", "0"))
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of read-only, tuned SQLite connections for one DB file.
+
+    Connections are opened with `mode=ro` and `query_only`, so generated SQL can
+    never modify the database. On checkout each connection is health-checked,
+    and the whole pool is recycled if the file was replaced (e.g. a re-upload).
+    """
+
+    def __init__(self, db_path, max_size: int = POOL_SIZE):
+        self.db_path = Path(db_path).resolve()
+        self.max_size = max_size
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._file_id = None
+        self._closed = False
+
+    def _stat_id(self):
+        try:
+            stat = os.stat(self.db_path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Database file '{self.db_path}' does not exist.")
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE};")
+        conn.execute(f"PRAGMA cache_size = {CACHE_SIZE};")
+        conn.execute("PRAGMA temp_store = MEMORY;")
+        conn.execute("PRAGMA query_only = ON;")
+        if HARD_HEAP_LIMIT:
+            conn.execute(f"PRAGMA hard_heap_limit = {HARD_HEAP_LIMIT};")
+        return conn
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            self._created -= 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def _recycle_if_replaced(self) -> None:
+        file_id = self._stat_id()
+        if file_id == self._file_id:
+            return
+        with self._lock:
+            self._file_id = file_id
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+    def _checkout(self, timeout=None) -> sqlite3.Connection:
+        self._recycle_if_replaced()
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_open = self._created < self.max_size
+                    if can_open:
+                        self._created += 1
+                if can_open:
+                    try:
+                        return self._open()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                conn = self._idle.get(timeout=timeout)
+            try:
+                conn.execute("SELECT 1;").fetchone()
+                return conn
+            except sqlite3.Error:
+                self._discard(conn)
+
+    def _checkin(self, conn: sqlite3.Connection) -> None:
+        if self._closed:
+            self._discard(conn)
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        conn.row_factory = None
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Borrow a connection; it goes back to the pool when the block exits."""
+        conn = self._checkout(timeout)
+        try:
+            yield conn
+        finally:
+            self._checkin(conn)
+
+    def warm_up(self) -> None:
+        """Pull every table's pages into the OS/page cache once per process."""
+        with self.connection() as conn:
+            tables = [r[0] for r in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';")]
+            for table in tables:
+                conn.execute(f'SELECT COUNT(*) FROM "{table}";').fetchone()
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path=None) -> ConnectionPool:
+    """Process-wide pool for `db_path` (defaults to the bundled transcripts DB)."""
+    key = str(Path(db_path or DB_PATH).resolve())
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(key)
+        return pool
+
+
+def close_pool(db_path) -> None:
+    """Close and forget the pool for `db_path`; connections still checked out close on return."""
+    key = str(Path(db_path).resolve())
+    with _pools_lock:
+        pool = _pools.pop(key, None)
+    if pool is not None:
+        pool.close()
+
+
+# resolved DB path -> (inode, PRAGMA schema_version, hash): the cookie changes with every schema change
+_schema_hashes = {}
+_schema_hashes_lock = threading.Lock()
+
+
+def schema_hash(db_path) -> str:
+    """
+    Hash the CREATE statements in sqlite_master so schema changes change the key.
+
+    Memoized on the file's inode and `PRAGMA schema_version`, so the common
+    case costs one pragma instead of reading and hashing sqlite_master.
+    """
+    key = str(Path(db_path).resolve())
+    inode = os.stat(key).st_ino if os.path.exists(key) else None
+    with get_pool(db_path).connection() as conn:
+        version = conn.execute("PRAGMA schema_version;").fetchone()[0]
+        with _schema_hashes_lock:
+            cached = _schema_hashes.get(key)
+        if cached is not None and cached[:2] == (inode, version):
+            return cached[2]
+        rows = conn.execute(
+            "SELECT type, name, sql FROM sqlite_master WHERE sql IS NOT NULL ORDER BY type, name;"
+        ).fetchall()
+    digest = hashlib.sha256()
+    for row in rows:
+        digest.update("\x1f".join(str(v) for v in row).encode("utf-8"))
+    with _schema_hashes_lock:
+        _schema_hashes[key] = (inode, version, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def db_fingerprint(db_path, schema: str = None) -> str:
+    """
+    Identify a database version: schema hash plus file size and mtime.
+
+    `PRAGMA data_version` is only comparable within one connection, so the file
+    stat is what lets a fingerprint survive process restarts. Pass `schema` when
+    the caller already has the schema hash.
+    """
+    db_path = Path(db_path)
+    if not db_path.exists():
+        raise FileNotFoundError(f"Database file not found at {db_path}")
+    stat = os.stat(db_path)
+    raw = f"{schema or schema_hash(db_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
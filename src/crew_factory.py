@@ -0,0 +1,86 @@
+from crewai import Crew, Process
+from src.agents.query_understanding_agent import get_query_understanding_agent
+from src.agents.retrieval_agent import get_retrieval_agent
+from src.agents.sql_generator_agent import get_sql_generator_agent
+from src.agents.sql_execution_repair_agent import get_sql_execution_repair_agent
+from src.tasks.query_understanding_task import get_query_understanding_task
+from src.tasks.retrieval_task import get_retrieval_task
+from src.tasks.sql_generation_task import get_sql_generation_task
+from src.tasks.sql_execution_repair_task import get_sql_execution_repair_task
+from src.tasks.lite_sql_task import get_lite_sql_task
+from src.exemplar_store import NO_EXAMPLES
+from src.telemetry import stage_callback
+
+
+# Task names, in order, for tracing (src/telemetry.py crew_scope).
+CREW_STAGES = ["understanding", "planning", "generation", "execution"]
+LITE_STAGES = ["lite_sql"]
+
+
+def crew_inputs(user_query: str, examples: str = NO_EXAMPLES, schema_context: str = "") -> dict:
+    """Inputs for kickoff; every placeholder used by the task prompts must be present."""
+    return {"user_query": user_query, "examples": examples, "schema_context": schema_context}
+
+
+def build_crew(llm, vector_tool, sql_execution_tool, sql_error_retrieval_tool, task_callback=None) -> Crew:
+    """
+    Build a fresh 4-stage crew around already-initialized shared components.
+
+    The LLM client, tools (and through them the vector store and embedding
+    model) are shared; Agents, Tasks and the Crew carry per-run state (task
+    outputs, executors), so each request gets its own. Construction is pure
+    object wiring, no model or store loading.
+
+    `task_callback` is called with each TaskOutput as its stage finishes, after
+    the stage's trace span is ended.
+    """
+    query_understanding_agent = get_query_understanding_agent(vector_tool, llm)
+    retrieval_agent = get_retrieval_agent(vector_tool, llm)
+    sql_generator_agent = get_sql_generator_agent(llm)
+    sql_execution_repair_agent = get_sql_execution_repair_agent(
+        sql_execution_tool, sql_error_retrieval_tool, llm
+    )
+
+    query_understanding_task = get_query_understanding_task(query_understanding_agent)
+    retrieval_task = get_retrieval_task(retrieval_agent, context=[query_understanding_task])
+    sql_generation_task = get_sql_generation_task(sql_generator_agent, context=[query_understanding_task, retrieval_task])
+    sql_exec_repair_task = get_sql_execution_repair_task(sql_execution_repair_agent, context=[sql_generation_task])
+
+    return Crew(
+        agents=[
+            query_understanding_agent,
+            retrieval_agent,
+            sql_generator_agent,
+            sql_execution_repair_agent,
+        ],
+        tasks=[
+            query_understanding_task,
+            retrieval_task,
+            sql_generation_task,
+            sql_exec_repair_task,
+        ],
+        process=Process.sequential,
+        verbose=True,
+        memory=False,
+        max_iter=1,
+        task_callback=stage_callback(task_callback),
+    )
+
+
+def build_lite_crew(llm, task_callback=None) -> Crew:
+    """
+    One-call crew for simple single-table questions: understanding, planning and
+    SQL generation happen in one prompt, with the table schema supplied up front
+    (no tool calls). Execution happens outside the LLM.
+    """
+    sql_generator_agent = get_sql_generator_agent(llm)
+    lite_sql_task = get_lite_sql_task(sql_generator_agent)
+    return Crew(
+        agents=[sql_generator_agent],
+        tasks=[lite_sql_task],
+        process=Process.sequential,
+        verbose=True,
+        memory=False,
+        max_iter=1,
+        task_callback=stage_callback(task_callback),
+    )
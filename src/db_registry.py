@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from src.paths import REGISTRY_DIR
+
+REGISTRY_MAX_LOADED = int(os.getenv("REGISTRY_MAX_LOADED", "4"))
+
+
+class UnknownDatabase(KeyError):
+    """No registered database has this db_id."""
+
+
+# (resolved path, size, mtime_ns) -> sha256, so an unchanged file is hashed once
+_content_hashes: Dict[tuple, str] = {}
+
+
+def content_hash(db_path) -> str:
+    """sha256 of the database file's bytes, streamed in 1 MiB chunks."""
+    path = Path(db_path).resolve()
+    stat = path.stat()
+    key = (str(path), stat.st_size, stat.st_mtime_ns)
+    digest = _content_hashes.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = _content_hashes[key] = h.hexdigest()
+    return digest
+
+
+class DefaultDatabase:
+    """The bundled database, backed by the shared components in src.initializer."""
+
+    db_id = None
+
+    @property
+    def db_path(self) -> str:
+        return self.sql_execution_tool.db_path
+
+    @property
+    def vectorstore(self):
+        from src.initializer import get_vectorstore
+        return get_vectorstore()
+
+    @property
+    def sql_execution_tool(self):
+        from src.initializer import get_sql_execution_tool
+        return get_sql_execution_tool()
+
+    @property
+    def router(self):
+        from src.initializer import get_router
+        return get_router()
+
+    def ensure_fresh(self) -> bool:
+        from src.vectorstore_setup import ensure_vector_store_fresh
+        return ensure_vector_store_fresh(self.vectorstore)
+
+    def create_crew(self, task_callback=None):
+        from src.initializer import create_crew
+        return create_crew(task_callback=task_callback)
+
+    def create_lite_crew(self, task_callback=None):
+        from src.initializer import create_lite_crew
+        return create_lite_crew(task_callback=task_callback)
+
+
+class DatabaseContext(DefaultDatabase):
+    """
+    Schema store, tools and router for one uploaded database, each built on
+    first use. The Chroma store persists under REGISTRY_DIR/<db_id>, so a
+    context rebuilt after eviction only re-embeds schema docs that changed.
+    """
+
+    def __init__(self, db_id: str, db_path, persist_dir):
+        self.db_id = db_id
+        self._db_path = str(Path(db_path).resolve())
+        self.persist_dir = Path(persist_dir)
+        self._components: Dict[str, object] = {}
+        self._lock = threading.RLock()
+
+    def _component(self, name: str, build: Callable):
+        component = self._components.get(name)
+        if component is None:
+            with self._lock:
+                component = self._components.get(name)
+                if component is None:
+                    component = self._components[name] = build()
+        return component
+
+    @property
+    def db_path(self) -> str:
+        return self._db_path
+
+    @property
+    def vectorstore(self):
+        def build():
+            from src.vectorstore_setup import open_schema_store
+            print(f"🔄 Opening schema store for database {self.db_id}")
+            return open_schema_store(self._db_path, self.persist_dir)
+        return self._component("vectorstore", build)
+
+    @property
+    def sql_execution_tool(self):
+        def build():
+            from src.tools.sql_execution_tool import SQLExecutionTool
+            return SQLExecutionTool(db_path=self._db_path)
+        return self._component("sql_execution_tool", build)
+
+    @property
+    def vector_tool(self):
+        vectorstore = self.vectorstore
+
+        def build():
+            from src.tools.vector_search_tool import VectorSearchTool
+            return VectorSearchTool(vectorstore=vectorstore)
+        return self._component("vector_tool", build)
+
+    @property
+    def sql_error_retrieval_tool(self):
+        vectorstore = self.vectorstore
+
+        def build():
+            from src.tools.sql_error_retrieval_tool import SQLErrorRetrievalTool
+            return SQLErrorRetrievalTool(vectorstore=vectorstore, db_path=self._db_path)
+        return self._component("sql_error_retrieval_tool", build)
+
+    @property
+    def router(self):
+        vectorstore = self.vectorstore
+
+        def build():
+            from src.initializer import make_router
+            return make_router(vectorstore)
+        return self._component("router", build)
+
+    def ensure_fresh(self) -> bool:
+        from src.vectorstore_setup import ensure_vector_store_fresh
+        return ensure_vector_store_fresh(self.vectorstore, db_path=self._db_path, persist_dir=self.persist_dir)
+
+    def create_crew(self, task_callback=None):
+        from src.crew_factory import build_crew
+        from src.initializer import get_llm
+        return build_crew(
+            get_llm(), self.vector_tool, self.sql_execution_tool, self.sql_error_retrieval_tool,
+            task_callback=task_callback,
+        )
+
+    def release(self) -> None:
+        """Drop in-memory state (pool, catalog, profile, resolver, tools); on-disk indexes stay."""
+        from src.catalog import forget_catalogs
+        from src.column_profiler import forget_profiles
+        from src.connection import close_pool
+        from src.schema_repair import forget_resolvers
+        from src.value_index import forget_value_indexes
+        with self._lock:
+            self._components.clear()
+        close_pool(self._db_path)
+        fingerprints = forget_catalogs(self._db_path)
+        forget_resolvers(fingerprints)
+        forget_profiles(fingerprints)
+        forget_value_indexes(self._db_path)
+
+
+class DatabaseRegistry:
+    """
+    Uploaded databases keyed by content hash (`db_id`).
+
+    The db_id -> path index is a JSON file shared with the Streamlit process,
+    which registers uploads. Loaded contexts are kept in an LRU of at most
+    `max_loaded`; evicted ones are released and rebuilt from disk on next use.
+    """
+
+    def __init__(self, root=REGISTRY_DIR, max_loaded: int = REGISTRY_MAX_LOADED):
+        self.root = Path(root)
+        self.index_path = self.root / "index.json"
+        self.max_loaded = max_loaded
+        self.default = DefaultDatabase()
+        self._loaded: "OrderedDict[str, DatabaseContext]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.metrics = {"loads": 0, "hits": 0, "evictions": 0}
+
+    def registered(self) -> Dict[str, str]:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def register(self, db_path) -> str:
+        """Add `db_path` to the index and return its db_id (identical files share one)."""
+        db_id = content_hash(db_path)[:16]
+        with self._lock:
+            index = self.registered()
+            index[db_id] = str(Path(db_path).resolve())
+            self.root.mkdir(parents=True, exist_ok=True)
+            tmp = self.index_path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(index, f, indent=2)
+            tmp.replace(self.index_path)
+        return db_id
+
+    def path_for(self, db_id: str) -> Path:
+        path = self.registered().get(db_id)
+        if path is None or not Path(path).exists():
+            raise UnknownDatabase(db_id)
+        return Path(path)
+
+    def get(self, db_id: Optional[str] = None):
+        """Context for `db_id`, or the bundled database when it is None."""
+        if not db_id:
+            return self.default
+        with self._lock:
+            context = self._loaded.get(db_id)
+            if context is not None:
+                self._loaded.move_to_end(db_id)
+                self.metrics["hits"] += 1
+                return context
+        context = DatabaseContext(db_id, self.path_for(db_id), self.root / db_id)
+        evicted = []
+        with self._lock:
+            existing = self._loaded.get(db_id)
+            if existing is not None:
+                return existing
+            self._loaded[db_id] = context
+            self.metrics["loads"] += 1
+            while len(self._loaded) > self.max_loaded:
+                evicted.append(self._loaded.popitem(last=False)[1])
+                self.metrics["evictions"] += 1
+        for old in evicted:
+            print(f"♻️ Evicting database {old.db_id} from memory")
+            old.release()
+        return context
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.metrics, "loaded": list(self._loaded), "max_loaded": self.max_loaded}
+
+
+registry = DatabaseRegistry()
+
+
+def register_database(db_path) -> str:
+    return registry.register(db_path)
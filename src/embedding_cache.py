@@ -0,0 +1,146 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Union
+
+from langchain_core.embeddings import Embeddings
+
+from src.telemetry import EMBEDDING_SECONDS, record_cache, span
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper with an in-process LRU over a persistent SQLite cache.
+
+    Vectors are keyed on model name + text hash and stored as float32 blobs,
+    so identical text (repeated queries, unchanged schema docs) is embedded
+    once across processes. Misses are embedded together in `batch_size`
+    chunks through a single `embed_documents` call each.
+
+    `embeddings` may be a zero-argument factory; the model is then only loaded
+    on the first cache miss (or an explicit `load()`).
+    """
+
+    def __init__(self, embeddings: Union[Embeddings, Callable[[], Embeddings]], model_name: str, path,
+                 batch_size: int = 64, lru_size: int = 4096):
+        self._embeddings = embeddings if isinstance(embeddings, Embeddings) else None
+        self._factory = None if self._embeddings is not None else embeddings
+        self._load_lock = threading.Lock()
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.lru_size = lru_size
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.metrics = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "embed_calls": 0, "embed_seconds": 0.0}
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vec BLOB NOT NULL);")
+        self._conn.commit()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        if self._embeddings is None:
+            self.load()
+        return self._embeddings
+
+    @property
+    def loaded(self) -> bool:
+        return self._embeddings is not None
+
+    def load(self) -> Embeddings:
+        """Construct the wrapped model now (no-op when already loaded)."""
+        with self._load_lock:
+            if self._embeddings is None:
+                self._embeddings = self._factory()
+        return self._embeddings
+
+    def _key(self, kind: str, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\x1f{kind}\x1f{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vec: List[float]) -> None:
+        self._lru[key] = vec
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[key] = self._lru[key]
+            self.metrics["memory_hits"] += len(found)
+            missing = [k for k in dict.fromkeys(keys) if k not in found]
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for key, blob in self._conn.execute(
+                    f"SELECT key, vec FROM embeddings WHERE key IN ({placeholders});", chunk
+                ):
+                    vec = array("f", blob).tolist()
+                    found[key] = vec
+                    self._remember(key, vec)
+                    self.metrics["disk_hits"] += 1
+        return found
+
+    def _store(self, pairs: Dict[str, List[float]]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vec) VALUES (?, ?);",
+                [(key, array("f", vec).tobytes()) for key, vec in pairs.items()],
+            )
+            self._conn.commit()
+            for key, vec in pairs.items():
+                self._remember(key, vec)
+
+    def _embed(self, kind: str, texts: List[str]) -> List[List[float]]:
+        with span(f"embedding.{kind}", **{"embedding.model": self.model_name, "embedding.texts": len(texts)}):
+            return self._embed_cached(kind, texts)
+
+    def _embed_cached(self, kind: str, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(kind, t) for t in texts]
+        found = self._lookup(keys)
+
+        misses = list(dict.fromkeys((k, t) for k, t in zip(keys, texts) if k not in found))
+        record_cache("embedding", hits=len(keys) - len(misses), misses=len(misses))
+        for start in range(0, len(misses), self.batch_size):
+            batch = misses[start:start + self.batch_size]
+            started = time.perf_counter()
+            with span("embedding.model", EMBEDDING_SECONDS, (kind,),
+                      **{"embedding.model": self.model_name, "embedding.texts": len(batch)}):
+                if kind == "query" and len(batch) == 1:
+                    vectors = [self.embeddings.embed_query(batch[0][1])]
+                else:
+                    vectors = self.embeddings.embed_documents([t for _, t in batch])
+            with self._lock:
+                self.metrics["embed_calls"] += 1
+                self.metrics["embed_seconds"] += time.perf_counter() - started
+                self.metrics["misses"] += len(batch)
+            new = {k: list(v) for (k, _), v in zip(batch, vectors)}
+            self._store(new)
+            found.update(new)
+        return [found[k] for k in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed("doc", list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed("query", [text])[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            metrics = dict(self.metrics)
+            metrics["lru_entries"] = len(self._lru)
+        metrics["model_loaded"] = self.loaded
+        lookups = metrics["memory_hits"] + metrics["disk_hits"] + metrics["misses"]
+        metrics["hit_rate"] = round((lookups - metrics["misses"]) / lookups, 4) if lookups else 0.0
+        metrics["embed_seconds"] = round(metrics["embed_seconds"], 3)
+        return metrics
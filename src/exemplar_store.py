@@ -0,0 +1,103 @@
+import hashlib
+import re
+from typing import List, Optional, Tuple
+
+from src.answer_cache import normalize_question
+
+NO_EXAMPLES = "No similar questions have been answered before."
+
+# Numbers, quoted strings and capitalised words (not sentence-initial): the
+# parts of a question that pick rows rather than shape the query.
+_QUOTED_RE = re.compile(r"""'([^']*)'|"([^"]*)\"""")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WORD_RE = re.compile(r"(?<![.?!]\s)(?<!^)\b([A-Z][\w-]*)")
+_SQL_STRING_RE = re.compile(r"'((?:[^']|'')*)'")
+
+
+def question_literals(question: str) -> set:
+    """Case-folded numbers, quoted strings and capitalised words in `question`."""
+    question = question.strip()
+    literals = {a or b for a, b in _QUOTED_RE.findall(question)}
+    unquoted = _QUOTED_RE.sub(" ", question)
+    literals.update(_NUMBER_RE.findall(unquoted))
+    literals.update(_WORD_RE.findall(unquoted))
+    return {literal.casefold() for literal in literals}
+
+
+def sql_string_literals(sql: str) -> set:
+    """Case-folded string literals of `sql`, without LIKE wildcards."""
+    literals = (m.replace("''", "'").strip("%_ ").casefold() for m in _SQL_STRING_RE.findall(sql))
+    return {literal for literal in literals if literal}
+
+
+class ExemplarStore:
+    """
+    Verified (question, SQL, schema hash) pairs in their own Chroma collection.
+
+    Exemplars are keyed on the schema hash, so data writes don't orphan them.
+    `best_match` finds the closest previously answered question for the same
+    schema; above `threshold`, and only when both questions carry the same
+    literals (years, names, quoted values) and the new question mentions every
+    string the stored SQL filters on, its SQL can be run directly with no
+    agents. Otherwise `few_shot_context` turns the top-k pairs into prompt
+    examples.
+    """
+
+    def __init__(self, vectorstore, threshold: float = 0.92, k: int = 3):
+        self.vectorstore = vectorstore
+        self.threshold = threshold
+        self.k = k
+
+    @staticmethod
+    def _id(question: str, schema: str) -> str:
+        raw = f"{schema}\x1f{normalize_question(question)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def search(self, question: str, schema: str, k: Optional[int] = None) -> List[Tuple[str, str, float]]:
+        """Top-k (question, sql, similarity) for this schema, most similar first."""
+        try:
+            hits = self.vectorstore.similarity_search_with_relevance_scores(
+                normalize_question(question), k=k or self.k, filter={"schema_hash": schema}
+            )
+        except Exception as e:
+            print(f"Exemplar search failed: {str(e)}")
+            return []
+        return [
+            (doc.metadata.get("question", doc.page_content), doc.metadata.get("sql", ""), score)
+            for doc, score in hits
+        ]
+
+    def best_match(self, question: str, hits: List[Tuple[str, str, float]]) -> Optional[Tuple[str, str, float]]:
+        """
+        The top hit if it clears the threshold and asks for the same literals,
+        else None. Lowercase questions ("students in the math department") carry
+        no visible literals, so the stored SQL's own string literals must also
+        appear in the new question.
+        """
+        if not hits:
+            return None
+        hit_question, sql, score = hits[0]
+        if score < self.threshold or not sql:
+            return None
+        if question_literals(question) != question_literals(hit_question):
+            return None
+        folded = normalize_question(question).casefold()
+        if any(literal not in folded for literal in sql_string_literals(sql)):
+            return None
+        return hits[0]
+
+    def add(self, question: str, sql: str, schema: str) -> None:
+        """Record a question whose SQL executed successfully (idempotent per schema + question)."""
+        try:
+            self.vectorstore.add_texts(
+                [normalize_question(question)],
+                metadatas=[{"sql": sql, "schema_hash": schema, "question": question.strip()}],
+                ids=[self._id(question, schema)],
+            )
+        except Exception as e:
+            print(f"Failed to store exemplar: {str(e)}")
+
+    @staticmethod
+    def few_shot_context(hits: List[Tuple[str, str, float]]) -> str:
+        blocks = [f"Question: {q}\nSQL: {sql}" for q, sql, _ in hits if sql]
+        return "\n\n".join(blocks) if blocks else NO_EXAMPLES
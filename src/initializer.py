@@ -1,18 +1,7 @@
-from crewai import Crew, Process
-from src.tools.vector_search_tool import VectorSearchTool
-from src.tools.sql_execution_tool import SQLExecutionTool
-from src.tools.sql_error_retrieval_tool import SQLErrorRetrievalTool
-from src.agents.query_understanding_agent import get_query_understanding_agent
-from src.agents.retrieval_agent import get_retrieval_agent
-from src.agents.sql_generator_agent import get_sql_generator_agent
-from src.agents.sql_execution_repair_agent import get_sql_execution_repair_agent
-from src.tasks.query_understanding_task import get_query_understanding_task
-from src.tasks.retrieval_task import get_retrieval_task
-from src.tasks.sql_generation_task import get_sql_generation_task
-from src.tasks.sql_execution_repair_task import get_sql_execution_repair_task
-from src.vectorstore_setup import setup_vector_store
-from crewai import LLM
 import os
+import threading
+import time
+from typing import Callable, Dict
 
 # Load environment variables
 from dotenv import load_dotenv
@@ -22,40 +11,164 @@ db_path = os.getenv("DB_PATH")
 chroma_dir = os.getenv("CHROMA_DIR")
 gemini_api_key = os.getenv("GEMINI_API_KEY")
 
-llm = LLM(model="gemini/gemini-1.5-flash", api_key=gemini_api_key,temperature=0)
-
-vectorstore = setup_vector_store(rebuild=False)
-vector_tool = VectorSearchTool(vectorstore=vectorstore) 
-sql_execution_tool = SQLExecutionTool(db_path=db_path)
-sql_error_retrieval_tool = SQLErrorRetrievalTool(vectorstore=vectorstore)
-
-query_understanding_agent = get_query_understanding_agent(vector_tool, llm)
-retrieval_agent = get_retrieval_agent(vector_tool, llm)
-sql_generator_agent = get_sql_generator_agent(llm)
-sql_execution_repair_agent = get_sql_execution_repair_agent(
-    sql_execution_tool, sql_error_retrieval_tool, llm
-)
-
-query_understanding_task = get_query_understanding_task(query_understanding_agent)
-retrieval_task = get_retrieval_task(retrieval_agent, context=[query_understanding_task])
-sql_generation_task = get_sql_generation_task(sql_generator_agent, context=[query_understanding_task, retrieval_task])
-sql_exec_repair_task = get_sql_execution_repair_task(sql_execution_repair_agent, context=[sql_generation_task])
-
-complete_crew = Crew(
-    agents=[
-        query_understanding_agent,
-        retrieval_agent,
-        sql_generator_agent,
-        sql_execution_repair_agent,
-    ],
-    tasks=[
-        query_understanding_task,
-        retrieval_task,
-        sql_generation_task,
-        sql_exec_repair_task,
-    ],
-    process=Process.sequential,
-    verbose=True,
-    memory=False,
-    max_iter=1,
-)
\ No newline at end of file
+# Everything below is built on first use (or by `warm_up`), not at import time.
+# component / warm-up phase name -> seconds spent in it, for /ready and startup logs
+startup_phases: Dict[str, float] = {}
+_components: Dict[str, object] = {}
+_components_lock = threading.RLock()
+
+
+def _timed(name: str, fn: Callable):
+    started = time.perf_counter()
+    value = fn()
+    startup_phases[name] = round(time.perf_counter() - started, 3)
+    print(f"⏱️ {name}: {startup_phases[name]:.2f}s")
+    return value
+
+
+def _component(name: str, build: Callable):
+    """Build a shared component once; callers resolve dependencies first so timings don't overlap."""
+    component = _components.get(name)
+    if component is None:
+        with _components_lock:
+            component = _components.get(name)
+            if component is None:
+                component = _components[name] = _timed(name, build)
+    return component
+
+
+def get_llm():
+    def build():
+        from crewai import LLM
+        from src.telemetry import instrument_llm
+        return instrument_llm(
+            LLM(model=os.getenv("LLM_MODEL", "gemini/gemini-1.5-flash"), api_key=gemini_api_key, temperature=0)
+        )
+    return _component("llm", build)
+
+
+def set_llm(llm) -> None:
+    """Use `llm` for every crew built from now on (e.g. the offline model in benchmarks/)."""
+    with _components_lock:
+        _components["llm"] = llm
+
+
+def get_vectorstore():
+    def build():
+        from src.vectorstore_setup import setup_vector_store
+        return setup_vector_store(rebuild=False)
+    return _component("vectorstore", build)
+
+
+def get_vector_tool():
+    vectorstore = get_vectorstore()
+
+    def build():
+        from src.tools.vector_search_tool import VectorSearchTool
+        return VectorSearchTool(vectorstore=vectorstore)
+    return _component("vector_tool", build)
+
+
+def get_sql_execution_tool():
+    def build():
+        from src.tools.sql_execution_tool import SQLExecutionTool
+        return SQLExecutionTool(db_path=db_path)
+    return _component("sql_execution_tool", build)
+
+
+def get_sql_error_retrieval_tool():
+    vectorstore, sql_execution_tool = get_vectorstore(), get_sql_execution_tool()
+
+    def build():
+        from src.tools.sql_error_retrieval_tool import SQLErrorRetrievalTool
+        return SQLErrorRetrievalTool(vectorstore=vectorstore, db_path=sql_execution_tool.db_path)
+    return _component("sql_error_retrieval_tool", build)
+
+
+def get_exemplar_store():
+    def build():
+        from src.exemplar_store import ExemplarStore
+        from src.vectorstore_setup import setup_exemplar_store
+        return ExemplarStore(
+            setup_exemplar_store(),
+            threshold=float(os.getenv("EXEMPLAR_THRESHOLD", "0.92")),
+            k=int(os.getenv("EXEMPLAR_TOP_K", "3")),
+        )
+    return _component("exemplar_store", build)
+
+
+def make_router(vectorstore):
+    """Complexity router over `vectorstore`, configured from the LITE_* env vars."""
+    from src.router import ComplexityRouter
+    return ComplexityRouter(
+        vectorstore,
+        max_words=int(os.getenv("LITE_MAX_WORDS", "14")),
+        margin=float(os.getenv("LITE_TABLE_MARGIN", "0.05")),
+        enabled=os.getenv("LITE_PATH_ENABLED", "1") != "0",
+    )
+
+
+def get_router():
+    vectorstore = get_vectorstore()
+    return _component("router", lambda: make_router(vectorstore))
+
+
+def create_crew(task_callback=None):
+    """Per-request crew sharing this module's LLM, tools and vector store."""
+    from src.crew_factory import build_crew
+    return build_crew(
+        get_llm(), get_vector_tool(), get_sql_execution_tool(), get_sql_error_retrieval_tool(),
+        task_callback=task_callback,
+    )
+
+
+def create_lite_crew(task_callback=None):
+    """Single-call crew for questions the router classifies as simple."""
+    from src.crew_factory import build_lite_crew
+    return build_lite_crew(get_llm(), task_callback=task_callback)
+
+
+def warm_up() -> Dict[str, float]:
+    """
+    Build every component and pay first-call costs (model weights, one real
+    embedding, one Chroma query, SQLite pages, value index, spaCy, crew construction) so the
+    first request doesn't. Returns the per-phase timings.
+    """
+    from src.connection import get_pool
+    from src.keyword_engine import get_nlp
+    from src.value_index import get_value_index
+    from src.vectorstore_setup import embeddings
+
+    _timed("embedding_model", embeddings.load)
+    # Bypass the cache: the point is to run the model once.
+    _timed("first_embedding", lambda: embeddings.embeddings.embed_query("warm up"))
+    vectorstore = get_vectorstore()
+    _timed("first_chroma_query", lambda: vectorstore.similarity_search("student", k=1))
+    _timed("sqlite_warm_up", lambda: get_pool(get_sql_execution_tool().db_path).warm_up())
+    _timed("value_index", lambda: get_value_index(get_sql_execution_tool().db_path))
+    _timed("spacy", get_nlp)
+    get_sql_error_retrieval_tool()
+    get_exemplar_store()
+    get_router()
+    _timed("crew", create_crew)
+    return dict(startup_phases)
+
+
+_LEGACY_NAMES = {
+    "llm": get_llm,
+    "vectorstore": get_vectorstore,
+    "vector_tool": get_vector_tool,
+    "sql_execution_tool": get_sql_execution_tool,
+    "sql_error_retrieval_tool": get_sql_error_retrieval_tool,
+    "exemplar_store": get_exemplar_store,
+    "router": get_router,
+    # Kept for scripts (src/main.py) that run a single query.
+    "complete_crew": create_crew,
+}
+
+
+def __getattr__(name):
+    # `from src.initializer import vectorstore` etc. still work, building on access.
+    if name in _LEGACY_NAMES:
+        return _LEGACY_NAMES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,83 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import FrozenSet, List, Optional, Pattern, Tuple
+
+SPACY_MODEL = os.getenv("SPACY_MODEL", "en_core_web_sm")
+# Only POS tags, lemmas and stop flags are used; parsing and NER are the bulk of the pipeline cost.
+SPACY_DISABLE = ["parser", "ner"]
+KEYWORD_POS = {"NOUN", "PROPN", "ADJ"}
+SKIP_WORDS = {"table", "sum", "great", "column", "row"}
+
+_nlp = None
+_nlp_lock = threading.Lock()
+
+
+def get_nlp():
+    """spaCy pipeline, loaded on first use with the unused components disabled."""
+    global _nlp
+    if _nlp is None:
+        with _nlp_lock:
+            if _nlp is None:
+                import spacy
+                _nlp = spacy.load(SPACY_MODEL, disable=SPACY_DISABLE)
+    return _nlp
+
+
+@lru_cache(maxsize=1024)
+def extract_keywords(query: str) -> FrozenSet[str]:
+    """Lowercased NOUN/PROPN/ADJ lemmas of `query`, minus stop words and SKIP_WORDS."""
+    return frozenset(
+        token.lemma_.lower()
+        for token in get_nlp()(query)
+        if token.pos_ in KEYWORD_POS
+        and not token.is_stop
+        and len(token.lemma_) > 2
+        and token.lemma_.lower() not in SKIP_WORDS
+    )
+
+
+@lru_cache(maxsize=1024)
+def keyword_pattern(keywords: FrozenSet[str]) -> Optional[Pattern]:
+    """One alternation regex matching any keyword as a substring (longest first)."""
+    if not keywords:
+        return None
+    return re.compile("|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True)))
+
+
+class LineIndex:
+    """
+    Split-and-lowercased lines per document text, kept in a bounded LRU so the
+    schema docs returned on every search are only split once.
+    """
+
+    def __init__(self, max_docs: int = 512):
+        self.max_docs = max_docs
+        self._docs: "OrderedDict[str, Tuple[List[str], List[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lines(self, text: str) -> Tuple[List[str], List[str]]:
+        with self._lock:
+            entry = self._docs.get(text)
+            if entry is not None:
+                self._docs.move_to_end(text)
+                return entry
+        lines = text.split("\n")
+        entry = (lines, [line.lower() for line in lines])
+        with self._lock:
+            self._docs[text] = entry
+            while len(self._docs) > self.max_docs:
+                self._docs.popitem(last=False)
+        return entry
+
+    def matching_lines(self, text: str, pattern: Optional[Pattern]) -> List[str]:
+        if pattern is None:
+            return []
+        lines, lowered = self.lines(text)
+        search = pattern.search
+        return [line for line, low in zip(lines, lowered) if search(low)]
+
+
+line_index = LineIndex()
@@ -1,11 +1,22 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-from src.initializer import complete_crew
+from src.initializer import complete_crew, sql_execution_tool
+from src.crew_factory import CREW_STAGES, crew_inputs
+from src.output_parser import parse_crew_output
+from src.retrieval_context import retrieval_scope
+from src.telemetry import crew_scope, shutdown_tracing, text_attribute
 
 user_query = "what are all the addresses including line 1 and line 2?"
 
-result = complete_crew.kickoff(inputs={"user_query": user_query})
+with crew_scope("full", CREW_STAGES, **text_attribute("crew.question", user_query)), retrieval_scope():
+    result = complete_crew.kickoff(inputs=crew_inputs(user_query))
+shutdown_tracing()
 
 print("\n📌 FINAL RESULT:\n")
-print(result)
+parsed = parse_crew_output(result.raw)
+if isinstance(parsed, dict) and parsed.get("success") and parsed.get("query"):
+    # The crew returns only the validated SQL; fetch the rows directly.
+    print(sql_execution_tool.execute(parsed["query"]))
+else:
+    print(result)
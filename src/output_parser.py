@@ -0,0 +1,48 @@
+import ast
+import json
+import re
+from typing import Any
+
+
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+
+
+def parse_crew_output(raw: Any) -> Any:
+    """
+    Turn the final crew output into a dict when it is one.
+
+    The repair agent answers with JSON, sometimes wrapped in a ```json fence and
+    sometimes with Python literals (True/None). Anything else is returned as-is.
+    """
+    if not isinstance(raw, str):
+        return raw
+    text = _FENCE_RE.sub("", raw.strip())
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return raw
+
+
+_SQL_FENCE_RE = re.compile(r"```(?:sql|sqlite)?\s*(.*?)```", re.IGNORECASE | re.DOTALL)
+# A statement start: SELECT or a `WITH name AS (` CTE, at the start of a line or
+# after a label such as "SQL:", so prose like "rows with a select few" is skipped.
+_SQL_START_RE = re.compile(
+    r"(?:^|:)[ \t]*(SELECT\b|WITH\s+(?:RECURSIVE\s+)?[\w\"`\[\]]+\s*(?:\([^)]*\)\s*)?AS\s*(?:(?:NOT\s+)?MATERIALIZED\s*)?\()",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+def extract_sql(raw: str) -> str:
+    """Pull the SQL statement out of an LLM answer, preferring a fenced block and dropping chatter."""
+    text = str(raw).strip()
+    fenced = _SQL_FENCE_RE.search(text)
+    if fenced:
+        text = fenced.group(1).strip()
+    start = _SQL_START_RE.search(text)
+    if start:
+        text = text[start.start(1):]
+    return text.strip()
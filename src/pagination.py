@@ -0,0 +1,43 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+from typing import Optional
+
+# Signs page tokens so /query/page only runs SQL this server already executed.
+# Set it when several workers must accept each other's tokens; the per-process
+# default invalidates outstanding tokens on restart.
+PAGE_TOKEN_SECRET = (os.getenv("PAGE_TOKEN_SECRET") or secrets.token_hex(32)).encode("utf-8")
+
+
+class InvalidPageToken(ValueError):
+    """The continuation token is malformed, forged, or was issued for a different query or database."""
+
+
+def page_limit(page_size: Optional[int], maximum: int) -> int:
+    """Rows to return for a requested page size: the maximum when unset, else clamped to 1..maximum."""
+    return max(1, min(page_size or maximum, maximum))
+
+
+def _token_signature(query: str, offset: int, database: str) -> str:
+    message = f"{offset}\x1f{database}\x1f{query.strip()}".encode("utf-8")
+    return hmac.new(PAGE_TOKEN_SECRET, message, hashlib.sha256).hexdigest()
+
+
+def encode_page_token(query: str, offset: int, database: str = "") -> str:
+    raw = json.dumps({"o": offset, "s": _token_signature(query, offset, database)}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_page_token(query: str, token: str, database: str = "") -> int:
+    """Return the row offset a token points at, checking this server signed it for `query` on `database`."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        offset, signature = int(payload["o"]), str(payload["s"])
+    except Exception:
+        raise InvalidPageToken("Malformed page token.")
+    if offset < 0 or not hmac.compare_digest(signature, _token_signature(query, offset, database)):
+        raise InvalidPageToken("Page token does not belong to this query.")
+    return offset
@@ -6,5 +6,12 @@ DATA_DIR      = PROJECT_ROOT / "data"
 DB_PATH       = DATA_DIR / "student_transcripts_tracking.sqlite"
 SCHEMA_PATH   = DATA_DIR / "schema.sql"
 CHROMA_DIR    = PROJECT_ROOT / "chroma_data1"
-
-
+EXEMPLAR_DIR  = PROJECT_ROOT / "chroma_exemplars"   # survives schema-store rebuilds
+ANSWER_CACHE_PATH = DATA_DIR / "answer_cache.sqlite"
+CATALOG_CACHE_DIR = DATA_DIR / "catalog_cache"
+EMBEDDING_CACHE_PATH = DATA_DIR / "embedding_cache.sqlite"
+REGISTRY_DIR  = PROJECT_ROOT / "chroma_registry"    # per-uploaded-DB schema stores + index.json
+VALUE_INDEX_DIR = DATA_DIR / "value_index"           # FTS5 trigram sidecars, one per DB fingerprint
+QUERY_LOG_PATH = DATA_DIR / "query_log.sqlite"      # executed SQL + EXPLAIN QUERY PLAN accesses
+ADVISOR_DIR   = DATA_DIR / "index_advisor"          # writable copies for measuring index recommendations
+TRACE_PATH    = DATA_DIR / "traces.jsonl"           # spans when OTEL_TRACES_EXPORTER=file
@@ -0,0 +1,579 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from src.catalog import get_catalog
+from src.column_profiler import get_profile
+from src.connection import get_pool, schema_hash
+from src.paths import ADVISOR_DIR, QUERY_LOG_PATH
+from src.sql_validator import collect_references, is_identifier, tokenize
+
+QUERY_LOG_ENABLED = os.getenv("QUERY_LOG_ENABLED", "1") != "0"
+QUERY_LOG_MAX_PENDING = 10000
+QUERY_LOG_BATCH = 256
+# Equality columns first, then other referenced columns to make the index covering, up to this width.
+ADVISOR_MAX_INDEX_COLUMNS = int(os.getenv("ADVISOR_MAX_INDEX_COLUMNS", "4"))
+# Stop recommending once the next index saves less than this fraction of the workload's estimated cost.
+ADVISOR_MIN_GAIN = float(os.getenv("ADVISOR_MIN_GAIN", "0.01"))
+ADVISOR_TIMING_RUNS = int(os.getenv("ADVISOR_TIMING_RUNS", "5"))
+
+# e.g. "SCAN sec", "SEARCH e USING INTEGER PRIMARY KEY (rowid=?)",
+# "SEARCH t USING AUTOMATIC COVERING INDEX (transcript_id=?)"
+_ACCESS_RE = re.compile(
+    r"^(SCAN|SEARCH)(?: TABLE)? (\S+)(?: AS (\S+))?"
+    r"(?: USING (AUTOMATIC )?(?:PARTIAL )?(COVERING )?(?:INDEX(?: ([^\s(]+))?|(INTEGER PRIMARY KEY|PRIMARY KEY)))?"
+    r"(?: \((.*)\))?$"
+)
+_CONSTRAINT_RE = re.compile(r"(\w+)\s*(?:=|>|<)")
+
+
+class TableAccess(NamedTuple):
+    table: str
+    operation: str              # SCAN (every row) or SEARCH (index / rowid lookup)
+    index: Optional[str]
+    covering: bool
+    automatic: bool             # SQLite built a throwaway index for this query: a missing index
+    constraints: List[str]      # columns the lookup is keyed on
+    detail: str
+
+
+def explain_accesses(conn, sql: str, catalog) -> List[TableAccess]:
+    """Table accesses from EXPLAIN QUERY PLAN, in loop order (outermost first), with aliases resolved."""
+    aliases = collect_references(sql).tables
+    accesses = []
+    for _, _, _, detail in conn.execute("EXPLAIN QUERY PLAN " + sql):
+        match = _ACCESS_RE.match(detail)
+        if not match:
+            continue
+        operation, name, alias, automatic, covering, index, pk, constraint = match.groups()
+        table = catalog.table(aliases.get((alias or name).lower(), name))
+        if table is None:           # CTE, subquery or constant row
+            continue
+        accesses.append(TableAccess(
+            table.name, operation, index or pk, bool(covering), bool(automatic),
+            _CONSTRAINT_RE.findall(constraint or ""), detail,
+        ))
+    return accesses
+
+
+def estimate_cost(accesses: List[TableAccess], catalog, profile=None) -> float:
+    """
+    Rough rows-touched estimate under nested loops: each access runs once per
+    row produced by the loops outside it. A SCAN reads the whole table; a
+    SEARCH costs a B-tree descent plus the expected matches (rows / distinct
+    values of its leading column, from the column profile).
+    """
+    cost, loops = 0.0, 1.0
+    for access in accesses:
+        rows = max(1, catalog.table(access.table).row_count)
+        if access.operation == "SCAN":
+            probe = out = rows
+        else:
+            keys = [c for c in access.constraints if c.lower() != "rowid"]
+            matches = 1.0
+            if keys:
+                stats = profile.column(access.table, keys[0]) if profile else None
+                matches = rows / max(1, stats.distinct) if stats else math.sqrt(rows)
+            probe, out = math.log2(rows) + 1 + matches, matches
+            if access.automatic:
+                cost += rows                # building the transient index, once per query
+        cost += loops * probe
+        loops *= out
+    return cost
+
+
+def _sql_hash(sql: str) -> str:
+    return hashlib.sha1(sql.strip().encode("utf-8")).hexdigest()[:16]
+
+
+class QueryLog:
+    """
+    Executed SELECTs per DB schema hash with the table accesses of their query
+    plan. Keyed on the schema (tables and indexes), not the data version, so
+    the workload survives writes. The plan is taken once per distinct SQL;
+    later executions only bump its counters.
+
+    `submit` is what the execution path calls: it only queues the entry, and a
+    background writer plans and stores queued entries in batches, one commit
+    per batch. `flush` waits for the queue to drain before reading.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._planned = set()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute("PRAGMA synchronous=NORMAL;")
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS queries (
+                   schema_hash TEXT NOT NULL,
+                   sql_hash TEXT NOT NULL,
+                   sql TEXT NOT NULL,
+                   executions INTEGER NOT NULL,
+                   total_ms REAL NOT NULL,
+                   max_ms REAL NOT NULL,
+                   first_seen REAL NOT NULL,
+                   last_seen REAL NOT NULL,
+                   PRIMARY KEY (schema_hash, sql_hash)
+               );
+               CREATE TABLE IF NOT EXISTS accesses (
+                   schema_hash TEXT NOT NULL,
+                   sql_hash TEXT NOT NULL,
+                   position INTEGER NOT NULL,
+                   tbl TEXT NOT NULL,
+                   operation TEXT NOT NULL,
+                   idx TEXT,
+                   automatic INTEGER NOT NULL,
+                   detail TEXT NOT NULL,
+                   PRIMARY KEY (schema_hash, sql_hash, position)
+               );"""
+        )
+        self._conn.commit()
+        self._pending = queue.Queue(maxsize=QUERY_LOG_MAX_PENDING)
+        self._writer = None
+
+    def submit(self, db_path, sql: str, elapsed_ms: float) -> None:
+        """Queue an execution for the background writer; dropped when the queue is full."""
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._drain, name="query-log", daemon=True)
+                self._writer.start()
+        try:
+            self._pending.put_nowait((db_path, sql, elapsed_ms, time.time()))
+        except queue.Full:
+            pass
+
+    def flush(self) -> None:
+        self._pending.join()
+
+    def _drain(self) -> None:
+        while True:
+            batch = [self._pending.get()]
+            while len(batch) < QUERY_LOG_BATCH:
+                try:
+                    batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            for entry in batch:
+                try:
+                    self._store(*entry)
+                except Exception as e:
+                    print(f"Query log failed: {str(e)}")
+            with self._lock:
+                self._conn.commit()
+            for _ in batch:
+                self._pending.task_done()
+
+    def record(self, db_path, sql: str, elapsed_ms: float) -> None:
+        """Plan and store one execution synchronously."""
+        self._store(db_path, sql, elapsed_ms, time.time())
+        with self._lock:
+            self._conn.commit()
+
+    def _store(self, db_path, sql: str, elapsed_ms: float, now: float) -> None:
+        key = (schema_hash(db_path), _sql_hash(sql))
+        accesses = None
+        if key not in self._planned:
+            with get_pool(db_path).connection() as conn:
+                accesses = explain_accesses(conn, sql, get_catalog(db_path))
+        with self._lock:
+            self._conn.execute(
+                """INSERT INTO queries (schema_hash, sql_hash, sql, executions, total_ms, max_ms, first_seen, last_seen)
+                   VALUES (?, ?, ?, 1, ?, ?, ?, ?)
+                   ON CONFLICT (schema_hash, sql_hash) DO UPDATE SET
+                       executions = executions + 1,
+                       total_ms = total_ms + excluded.total_ms,
+                       max_ms = MAX(max_ms, excluded.max_ms),
+                       last_seen = excluded.last_seen;""",
+                (*key, sql, elapsed_ms, elapsed_ms, now, now),
+            )
+            if accesses is not None:
+                self._conn.execute("DELETE FROM accesses WHERE schema_hash = ? AND sql_hash = ?;", key)
+                self._conn.executemany(
+                    "INSERT INTO accesses VALUES (?, ?, ?, ?, ?, ?, ?, ?);",
+                    [(*key, i, a.table, a.operation, a.index, int(a.automatic), a.detail)
+                     for i, a in enumerate(accesses)],
+                )
+                self._planned.add(key)
+
+    def workload(self, schema: str) -> List[Tuple[str, int, float]]:
+        """(sql, executions, mean ms) for every logged query of one DB schema, busiest first."""
+        with self._lock:
+            return self._conn.execute(
+                """SELECT sql, executions, total_ms / executions FROM queries
+                   WHERE schema_hash = ? ORDER BY executions * total_ms DESC;""",
+                (schema,),
+            ).fetchall()
+
+    def table_summary(self, schema: str) -> Dict[str, Dict[str, int]]:
+        """table -> executions that SCANned / SEARCHed it (and needed an automatic index)."""
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT a.tbl, a.operation, a.automatic, SUM(q.executions)
+                   FROM accesses a JOIN queries q USING (schema_hash, sql_hash)
+                   WHERE a.schema_hash = ? GROUP BY 1, 2, 3;""",
+                (schema,),
+            ).fetchall()
+        summary: Dict[str, Dict[str, int]] = {}
+        for table, operation, automatic, executions in rows:
+            counts = summary.setdefault(table, {"SCAN": 0, "SEARCH": 0, "automatic_index": 0})
+            counts[operation] += executions
+            if automatic:
+                counts["automatic_index"] += executions
+        return summary
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            queries, executions = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(executions), 0) FROM queries;"
+            ).fetchone()
+        return {"queries": queries, "executions": executions, "path": str(self.path)}
+
+
+_query_log: Optional[QueryLog] = None
+_query_log_lock = threading.Lock()
+
+
+def get_query_log() -> QueryLog:
+    global _query_log
+    with _query_log_lock:
+        if _query_log is None:
+            _query_log = QueryLog(os.getenv("QUERY_LOG_PATH", str(QUERY_LOG_PATH)))
+        return _query_log
+
+
+def record_execution(db_path, sql: str, elapsed_ms: float) -> None:
+    """Queue an executed query for the log (planned off the request path); never fails the query."""
+    if not QUERY_LOG_ENABLED:
+        return
+    try:
+        get_query_log().submit(db_path, sql, elapsed_ms)
+    except Exception as e:
+        print(f"Query log failed: {str(e)}")
+
+
+# --- index advisor ----------------------------------------------------------
+
+class IndexCandidate(NamedTuple):
+    table: str
+    columns: Tuple[str, ...]
+    covering: bool
+
+    @property
+    def name(self) -> str:
+        return re.sub(r"\W", "_", f"idx_advisor_{self.table}_{'_'.join(self.columns)}").lower()
+
+    @property
+    def create_sql(self) -> str:
+        columns = ", ".join(_quote(c) for c in self.columns)
+        return f"CREATE INDEX {_quote(self.name)} ON {_quote(self.table)} ({columns});"
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _column_usage(sql: str, catalog) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+    """(table -> columns compared with = / IN, table -> every referenced column) for one query."""
+    tokens = tokenize(sql)
+    refs = collect_references(sql)
+    query_tables = [t.name for t in (catalog.table(n) for n in dict.fromkeys(refs.tables.values())) if t]
+
+    def owner(qualifier: Optional[str], column: str) -> Optional[str]:
+        tables = [refs.tables.get(qualifier.lower(), qualifier)] if qualifier else query_tables
+        for table in tables:
+            if catalog.column(table, column) is not None:
+                return catalog.table(table).name
+        return None
+
+    def operand(i: int) -> Optional[Tuple[Optional[str], str]]:
+        """The column reference whose name (or qualifier) is token i, as (qualifier, column)."""
+        if not 0 <= i < len(tokens) or not is_identifier(tokens[i]):
+            return None
+        if i >= 2 and tokens[i - 1].text == "." and is_identifier(tokens[i - 2]):
+            return tokens[i - 2].name, tokens[i].name
+        if i + 2 < len(tokens) and tokens[i + 1].text == "." and is_identifier(tokens[i + 2]):
+            return tokens[i].name, tokens[i + 2].name
+        return None, tokens[i].name
+
+    equality: Dict[str, List[str]] = {}
+    for i, token in enumerate(tokens):
+        if token.text in ("=", "=="):
+            sides = [operand(i - 1), operand(i + 1)]
+        elif token.kind == "keyword" and token.text.upper() == "IN":
+            sides = [operand(i - 1)]
+        else:
+            continue
+        for side in filter(None, sides):
+            table = owner(*side)
+            if table:
+                column = catalog.column(table, side[1]).name
+                equality.setdefault(table, [])
+                if column not in equality[table]:
+                    equality[table].append(column)
+
+    referenced: Dict[str, List[str]] = {}
+    for qualifier, column in refs.qualified + [(None, t.name) for t in refs.unqualified]:
+        table = column and owner(qualifier, column)
+        if table:
+            name = catalog.column(table, column).name
+            referenced.setdefault(table, [])
+            if name not in referenced[table]:
+                referenced[table].append(name)
+    return equality, referenced
+
+
+def _schema_clone(db_path) -> sqlite3.Connection:
+    """
+    Empty in-memory copy of the schema (plus sqlite_stat1): the planner sees
+    the same schema and statistics as on the real DB, so hypothetical indexes
+    can be tried with EXPLAIN QUERY PLAN without building them on the data.
+    """
+    clone = sqlite3.connect(":memory:")
+    with get_pool(db_path).connection() as conn:
+        statements = [r[0] for r in conn.execute(
+            """SELECT sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'
+               ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1 ELSE 2 END, rowid;"""
+        )]
+        try:
+            stat1 = conn.execute("SELECT tbl, idx, stat FROM sqlite_stat1;").fetchall()
+        except sqlite3.OperationalError:
+            stat1 = []
+    for statement in statements:
+        try:
+            clone.execute(statement)
+        except sqlite3.Error:
+            pass                        # e.g. virtual tables whose module isn't loaded
+    if stat1:
+        clone.execute("ANALYZE;")
+        clone.execute("DELETE FROM sqlite_stat1;")
+        clone.executemany("INSERT INTO sqlite_stat1 VALUES (?, ?, ?);", stat1)
+        clone.execute("ANALYZE sqlite_master;")     # reload the statistics into the planner
+    clone.commit()
+    return clone
+
+
+def _existing_prefixes(conn, table: str) -> List[Tuple[str, ...]]:
+    prefixes = []
+    for index in conn.execute(f"PRAGMA index_list({_quote(table)});").fetchall():
+        columns = [r[2] for r in conn.execute(f"PRAGMA index_info({_quote(index[1])});")]
+        prefixes.append(tuple(c.lower() for c in columns if c))
+    return prefixes
+
+
+def _candidates(workload, plans, catalog, clone) -> Dict[str, List[IndexCandidate]]:
+    """
+    Indexes worth trying for the logged plans: for every column a query
+    compares with `=` / IN (joins and filters alike, since an index can change
+    which table drives the join) and every key SQLite had to auto-index, an
+    index leading with it, widened to cover the query's other columns of that
+    table when they fit. What the planner actually does with each is decided
+    in `advise`.
+    """
+    candidates: Dict[str, List[IndexCandidate]] = {}
+    for sql, _, _ in workload:
+        if sql not in plans:
+            continue
+        equality, referenced = _column_usage(sql, catalog)
+        found = candidates.setdefault(sql, [])
+        keys = [(table, [column]) for table, columns in equality.items() for column in columns]
+        keys += [(a.table, a.constraints) for a in plans[sql][0] if a.automatic]
+        for table, columns in keys:
+            columns = [c for c in columns if c.lower() != "rowid"][:ADVISOR_MAX_INDEX_COLUMNS]
+            if not columns:
+                continue
+            first = catalog.column(table, columns[0])
+            if len(columns) == 1 and first.pk and (first.type or "").upper() == "INTEGER":
+                continue                # rowid alias: already the table's own B-tree
+            lowered = tuple(c.lower() for c in columns)
+            if any(prefix[:len(lowered)] == lowered for prefix in _existing_prefixes(clone, table)):
+                continue
+            rest = [c for c in referenced.get(table, []) if c not in columns]
+            covering = len(columns) + len(rest) <= ADVISOR_MAX_INDEX_COLUMNS
+            index_columns = tuple(columns + rest) if covering else tuple(columns)
+            candidate = IndexCandidate(table, index_columns, covering)
+            if candidate not in found:
+                found.append(candidate)
+    return candidates
+
+
+def _options(clone, candidates: Dict[str, List[IndexCandidate]], catalog) -> List[Tuple[IndexCandidate, ...]]:
+    """
+    Index sets to evaluate: each candidate alone, plus for every query the
+    subset of its candidates the planner uses when all exist at once. A
+    multi-join usually only changes plan when its filter column and the next
+    join key are both indexed, which no single index shows.
+    """
+    options = list(dict.fromkeys((c,) for found in candidates.values() for c in found))
+    for sql, found in candidates.items():
+        if len(found) < 2:
+            continue
+        for candidate in found:
+            clone.execute(candidate.create_sql)
+        try:
+            used = {a.index for a in explain_accesses(clone, sql, catalog)}
+        finally:
+            for candidate in found:
+                clone.execute(f"DROP INDEX {_quote(candidate.name)};")
+        bundle = tuple(c for c in found if c.name in used)
+        if len(bundle) > 1 and bundle not in options:
+            options.append(bundle)
+    return options
+
+
+def _plan_workload(clone, workload, catalog, profile) -> Dict[str, Tuple[List[TableAccess], float]]:
+    plans = {}
+    for sql, _, _ in workload:
+        try:
+            accesses = explain_accesses(clone, sql, catalog)
+        except sqlite3.Error:
+            continue
+        plans[sql] = (accesses, estimate_cost(accesses, catalog, profile))
+    return plans
+
+
+def _time_query(conn, sql: str, runs: int) -> float:
+    """Best-of-`runs` wall time in ms to execute `sql` and fetch every row."""
+    best = float("inf")
+    for _ in range(max(1, runs)):
+        started = time.perf_counter()
+        conn.execute(sql).fetchall()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def advise(db_path, apply: bool = False, copy_path=None, log: Optional[QueryLog] = None) -> Dict[str, Any]:
+    """
+    Recommend indexes for the logged workload of `db_path`.
+
+    Candidates come from the columns the logged queries filter or join on
+    with `=` / IN, and from keys SQLite had to auto-index. They are chosen
+    greedily: each round tries every remaining candidate (or bundle, see
+    `_options`) on a schema-only clone, keeps the one that lowers the
+    workload's estimated cost most, and stops when the gain falls under
+    ADVISOR_MIN_GAIN. With `apply`, the
+    recommendations are created one by one on a writable copy of the DB
+    (never the original) and the affected queries are timed before and after.
+    """
+    log = log or get_query_log()
+    log.flush()
+    catalog = get_catalog(db_path)
+    try:
+        profile = get_profile(db_path)
+    except Exception:
+        profile = None
+    schema = schema_hash(db_path)
+    workload = log.workload(schema)
+    executions = {sql: count for sql, count, _ in workload}
+    clone = _schema_clone(db_path)
+
+    def total(plans):
+        return sum(executions[sql] * cost for sql, (_, cost) in plans.items())
+
+    baseline = current = _plan_workload(clone, workload, catalog, profile)
+    options = _options(clone, _candidates(workload, current, catalog, clone), catalog)
+    recommendations = []
+    while options:
+        best = None
+        for option in options:
+            for candidate in option:
+                clone.execute(candidate.create_sql)
+            plans = _plan_workload(clone, workload, catalog, profile)
+            for candidate in option:
+                clone.execute(f"DROP INDEX {_quote(candidate.name)};")
+            if best is None or total(plans) < total(best[1]):
+                best = (option, plans)
+        option, plans = best
+        if total(current) - total(plans) < ADVISOR_MIN_GAIN * total(current):
+            break
+        for candidate in option:
+            clone.execute(candidate.create_sql)
+        affected = [sql for sql in plans if plans[sql][1] < current[sql][1]]
+        before = sum(executions[sql] * current[sql][1] for sql in affected)
+        after = sum(executions[sql] * plans[sql][1] for sql in affected)
+        recommendations.append({
+            "indexes": [
+                {"table": c.table, "columns": list(c.columns), "covering": c.covering, "sql": c.create_sql}
+                for c in option
+            ],
+            "queries": len(affected),
+            "executions": sum(executions[sql] for sql in affected),
+            "estimated_cost_before": round(before, 1),
+            "estimated_cost_after": round(after, 1),
+            "estimated_speedup": round(before / after, 2) if after else None,
+            "plans": [
+                {"sql": sql,
+                 "before": [a.detail for a in current[sql][0]],
+                 "after": [a.detail for a in plans[sql][0]]}
+                for sql in affected
+            ],
+        })
+        current = plans
+        # Drop what is now built; bundles keep only their missing members.
+        options = list(dict.fromkeys(
+            rest for rest in (tuple(c for c in o if c not in option) for o in options) if rest
+        ))
+    clone.close()
+
+    report = {
+        "fingerprint": catalog.fingerprint,
+        "schema_hash": schema,
+        "queries": len(workload),
+        "executions": sum(executions.values()),
+        "tables": log.table_summary(schema),
+        "recommendations": recommendations,
+        "estimated_workload_speedup": round(total(baseline) / total(current), 2) if total(current) else None,
+        "applied": False,
+    }
+    if apply and recommendations:
+        report["copy_path"] = str(_measure_on_copy(db_path, catalog.fingerprint, recommendations, executions,
+                                                   copy_path))
+        report["applied"] = True
+    return report
+
+
+def _measure_on_copy(db_path, fingerprint: str, recommendations, executions, copy_path=None) -> Path:
+    """Create each recommendation in turn on a fresh copy of the DB, timing its queries around it."""
+    copy_path = Path(copy_path or ADVISOR_DIR / f"{fingerprint}.sqlite")
+    copy_path.parent.mkdir(parents=True, exist_ok=True)
+    copy_path.unlink(missing_ok=True)
+    source = sqlite3.connect(f"file:{Path(db_path).resolve()}?mode=ro", uri=True)
+    copy = sqlite3.connect(str(copy_path))
+    try:
+        source.backup(copy)
+        for rec in recommendations:
+            queries = [p["sql"] for p in rec["plans"]]
+            before = sum(executions[sql] * _time_query(copy, sql, ADVISOR_TIMING_RUNS) for sql in queries)
+            for index in rec["indexes"]:
+                copy.execute(index["sql"])
+            copy.commit()
+            after = sum(executions[sql] * _time_query(copy, sql, ADVISOR_TIMING_RUNS) for sql in queries)
+            rec["measured_ms_before"] = round(before, 3)
+            rec["measured_ms_after"] = round(after, 3)
+            rec["measured_speedup"] = round(before / after, 2) if after else None
+    finally:
+        source.close()
+        copy.close()
+    return copy_path
+
+
+if __name__ == "__main__":
+    from src.paths import DB_PATH
+    parser = argparse.ArgumentParser(description="Recommend indexes for the logged query workload.")
+    parser.add_argument("db_path", nargs="?", default=str(DB_PATH))
+    parser.add_argument("--apply", action="store_true",
+                        help="create the indexes on a writable copy and measure the speedup")
+    parser.add_argument("--copy", help=f"path of the writable copy (default: {ADVISOR_DIR}/<fingerprint>.sqlite)")
+    args = parser.parse_args()
+    print(json.dumps(advise(args.db_path, apply=args.apply, copy_path=args.copy), indent=2))
@@ -0,0 +1,112 @@
+import gzip
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+except ImportError:  # optional: only needed for Arrow IPC responses
+    pa = None
+
+try:
+    import zstandard
+except ImportError:  # optional: zstd falls back to gzip/identity
+    zstandard = None
+
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+COLUMNS_JSON = "application/vnd.crewtosql.columns+json"
+GZIP_MIN_SIZE = 1024
+
+
+class UnsupportedFormat(Exception):
+    """The client asked for a format this server cannot produce (e.g. Arrow without pyarrow)."""
+
+
+def wants_format(accept: Optional[str], format_param: Optional[str] = None) -> str:
+    """Pick "arrow", "columns" or "json" from the ?format= override or the Accept header."""
+    if format_param:
+        return format_param.lower()
+    accept = (accept or "").lower()
+    if ARROW_STREAM in accept:
+        return "arrow"
+    if COLUMNS_JSON in accept:
+        return "columns"
+    return "json"
+
+
+def columns_and_rows(result: Dict[str, Any]) -> Tuple[List[str], List[list]]:
+    """Columns plus row lists from an execution result, whether rows are dicts or lists."""
+    columns = list(result.get("columns") or [])
+    data = result.get("data") or []
+    if data and isinstance(data[0], dict):
+        if not columns:
+            columns = list(data[0].keys())
+        rows = [[row.get(col) for col in columns] for row in data]
+    else:
+        rows = [list(row) for row in data]
+    return columns, rows
+
+
+def to_columnar(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Replace `data: [{col: value}]` with `columns` + `rows: [[...]]`, keeping other fields."""
+    columns, rows = columns_and_rows(result)
+    compact = {k: v for k, v in result.items() if k != "data"}
+    compact["columns"] = columns
+    compact["rows"] = rows
+    return compact
+
+
+def _arrow_column(values: list):
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # SQLite columns are not strictly typed; mixed columns go out as text.
+        return pa.array([None if v is None else str(v) for v in values], type=pa.string())
+
+
+def to_arrow_ipc(result: Dict[str, Any]) -> bytes:
+    """Encode the rows as one Arrow IPC stream; non-row fields travel as schema metadata."""
+    if pa is None:
+        raise UnsupportedFormat("Arrow responses need pyarrow installed on the server.")
+    columns, rows = columns_and_rows(result)
+    arrays = [_arrow_column([row[i] for row in rows]) for i in range(len(columns))]
+    meta = {k: v for k, v in result.items() if k not in ("data", "columns")}
+    table = pa.Table.from_arrays(arrays, names=columns).replace_schema_metadata(
+        {"crewtosql": json.dumps(meta, default=str)}
+    )
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def compress(body: bytes, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """Compress with zstd or gzip when the client accepts it and the body is worth it."""
+    accept_encoding = (accept_encoding or "").lower()
+    if len(body) < GZIP_MIN_SIZE:
+        return body, None
+    if "zstd" in accept_encoding and zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compress(body), "zstd"
+    if "gzip" in accept_encoding:
+        return gzip.compress(body, compresslevel=5), "gzip"
+    return body, None
+
+
+def encode_result(result: Any, fmt: str, accept_encoding: Optional[str]) -> Tuple[bytes, str, Optional[str]]:
+    """
+    Serialize an execution result as (body, media_type, content_encoding).
+
+    Only successful row results are re-shaped; errors and plain messages are
+    always sent as regular JSON.
+    """
+    has_rows = isinstance(result, dict) and result.get("success") and "data" in result
+    if fmt == "arrow" and has_rows:
+        body, media_type = to_arrow_ipc(result), ARROW_STREAM
+    elif fmt == "columns" and has_rows:
+        body, media_type = json.dumps(to_columnar(result), default=str).encode("utf-8"), COLUMNS_JSON
+    elif fmt in ("json", "arrow", "columns"):
+        body, media_type = json.dumps(result, default=str).encode("utf-8"), "application/json"
+    else:
+        raise UnsupportedFormat(f"Unknown result format '{fmt}'.")
+    body, encoding = compress(body, accept_encoding)
+    return body, media_type, encoding
@@ -0,0 +1,80 @@
+import json
+import math
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.telemetry import record_cache
+
+# Cosine similarity above which a later query reuses an earlier query's top-k.
+REUSE_THRESHOLD = float(os.getenv("RETRIEVAL_REUSE_THRESHOLD", "0.97"))
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class RetrievalContext:
+    """
+    Memo of vector searches made while answering one request.
+
+    Exact (query, k, filter) repeats return the same documents; a different
+    query whose embedding is within `threshold` cosine of an earlier one (same
+    filter, k no larger) reuses that result set. Either way tool output stays
+    deterministic within the request and no embedding/HNSW query is repeated.
+    """
+
+    def __init__(self, threshold: float = REUSE_THRESHOLD):
+        self.threshold = threshold
+        self._exact: Dict[Tuple[str, int, str], list] = {}
+        self._by_vector: List[Tuple[List[float], int, str, list]] = []
+        self.stats = {"exact_hits": 0, "near_hits": 0, "searches": 0}
+
+    def search(self, vectorstore, query: str, k: int, filter: Optional[Dict[str, Any]] = None) -> list:
+        filter_key = json.dumps(filter, sort_keys=True) if filter else ""
+        key = (query.strip(), k, filter_key)
+        if key in self._exact:
+            self.stats["exact_hits"] += 1
+            record_cache("retrieval", hits=1)
+            return self._exact[key]
+
+        vector = vectorstore.embeddings.embed_query(query)
+        for earlier, earlier_k, earlier_filter, docs in self._by_vector:
+            if earlier_filter == filter_key and earlier_k >= k and _cosine(vector, earlier) >= self.threshold:
+                self.stats["near_hits"] += 1
+                record_cache("retrieval", hits=1)
+                result = docs[:k]
+                self._exact[key] = result
+                return result
+
+        self.stats["searches"] += 1
+        record_cache("retrieval", misses=1)
+        docs = vectorstore.similarity_search_by_vector(vector, k=k, filter=filter)
+        self._exact[key] = docs
+        self._by_vector.append((vector, k, filter_key, docs))
+        return docs
+
+
+_current: ContextVar[Optional[RetrievalContext]] = ContextVar("retrieval_context", default=None)
+
+
+@contextmanager
+def retrieval_scope(threshold: float = REUSE_THRESHOLD):
+    """Memoize vector searches for the duration of one request (inherited by worker threads)."""
+    context = RetrievalContext(threshold)
+    token = _current.set(context)
+    try:
+        yield context
+    finally:
+        _current.reset(token)
+
+
+def similarity_search(vectorstore, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None) -> list:
+    """`vectorstore.similarity_search`, memoized when called inside a retrieval_scope."""
+    context = _current.get()
+    if context is None:
+        return vectorstore.similarity_search(query, k=k, filter=filter)
+    return context.search(vectorstore, query, k, filter)
@@ -0,0 +1,90 @@
+import logging
+import re
+import threading
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Phrases that usually mean joins, grouping, ranking or nesting: keep those on the full pipeline.
+COMPLEX_PATTERN = re.compile(
+    r"\b(per|each|every|by|group|grouped|average|avg|mean|top|most|least|highest|lowest|rank|ranked|"
+    r"compare|compared|than|both|either|neither|without|never|not|except|along with|together with|"
+    r"their|whose|who have|which have|that have|enrolled in|for which|between|percentage|ratio)\b",
+    re.IGNORECASE,
+)
+
+
+class RouteDecision(NamedTuple):
+    path: str                      # "lite" or "full"
+    reason: str
+    table: Optional[str] = None
+    schema_context: str = ""
+
+
+class ComplexityRouter:
+    """
+    Sends simple single-table questions to the 1-call lite crew, everything else
+    to the 4-stage crew.
+
+    A question is "simple" when it is short, has none of the COMPLEX_PATTERN
+    phrases, and the schema vector search clearly points at one table (the top
+    hit beats the runner-up by `margin`). Per-path counts and latencies are kept
+    for /crew/stats.
+    """
+
+    def __init__(self, vectorstore, max_words: int = 14, margin: float = 0.05, enabled: bool = True):
+        self.vectorstore = vectorstore
+        self.max_words = max_words
+        self.margin = margin
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.counts = {"lite": 0, "full": 0, "lite_fallback": 0}
+        self.latency = {"lite": 0.0, "full": 0.0}
+
+    def route(self, question: str) -> RouteDecision:
+        decision = self._decide(question)
+        logger.info("Routing %r -> %s (%s)", question, decision.path, decision.reason)
+        return decision
+
+    def _decide(self, question: str) -> RouteDecision:
+        if not self.enabled:
+            return RouteDecision("full", "lite path disabled")
+        if len(question.split()) > self.max_words:
+            return RouteDecision("full", f"longer than {self.max_words} words")
+        match = COMPLEX_PATTERN.search(question)
+        if match:
+            return RouteDecision("full", f"complex phrase '{match.group(0)}'")
+
+        try:
+            hits = self.vectorstore.similarity_search_with_relevance_scores(
+                question, k=2, filter={"type": "schema"}
+            )
+        except Exception as e:
+            return RouteDecision("full", f"schema search failed: {e}")
+        if not hits:
+            return RouteDecision("full", "no schema hits")
+
+        top_doc, top_score = hits[0]
+        runner_up = hits[1][1] if len(hits) > 1 else 0.0
+        if top_score - runner_up < self.margin:
+            return RouteDecision("full", f"ambiguous tables ({top_score:.2f} vs {runner_up:.2f})")
+        table = top_doc.metadata.get("table")
+        return RouteDecision("lite", f"single table {table} ({top_score:.2f})", table, top_doc.page_content)
+
+    def record(self, path: str, seconds: float, fell_back: bool = False) -> None:
+        with self._lock:
+            self.counts[path] += 1
+            self.latency[path] += seconds
+            if fell_back:
+                self.counts["lite_fallback"] += 1
+        logger.info("%s path finished in %.2fs%s", path, seconds, " (after lite fallback)" if fell_back else "")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "counts": dict(self.counts),
+                "avg_latency_seconds": {
+                    path: round(total / self.counts[path], 3) if self.counts[path] else None
+                    for path, total in self.latency.items()
+                },
+            }
@@ -0,0 +1,216 @@
+import re
+import threading
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Set, Tuple
+
+from src.catalog import get_catalog
+
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_TABLE_REF_RE = re.compile(
+    r"\b(?:FROM|JOIN)\s+[`\"\[]?(\w+)[`\"\]]?(?:\s+(?:AS\s+)?(?!(?:ON|USING|WHERE|JOIN|INNER|LEFT|RIGHT|"
+    r"FULL|CROSS|NATURAL|GROUP|ORDER|LIMIT|HAVING|UNION|EXCEPT|INTERSECT)\b)(\w+))?",
+    re.IGNORECASE,
+)
+_ERROR_RE = re.compile(r"^(no such column|no such table|ambiguous column name):\s*(.+)$", re.IGNORECASE)
+
+
+def _trigrams(name: str) -> Set[str]:
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _stem(name: str) -> str:
+    """Cheap singular form so `Student`/`Students`, `Course`/`Courses` and `Address`/`Addresses` compare equal."""
+    if name.endswith("ies") and len(name) > 5:
+        return name[:-3] + "y"
+    if name.endswith(("sses", "xes", "zzes", "ches", "shes")) and len(name) > 4:
+        return name[:-2]
+    if name.endswith("s") and not name.endswith(("ss", "us", "is")) and len(name) > 3:
+        return name[:-1]
+    return name
+
+
+def similarity(a: str, b: str) -> float:
+    a, b = a.lower(), b.lower()
+    if a == b:
+        return 1.0
+    if _stem(a) == _stem(b) or a.replace("_", "") == b.replace("_", ""):
+        return 0.95
+    ta, tb = _trigrams(a), _trigrams(b)
+    jaccard = len(ta & tb) / len(ta | tb) if ta | tb else 0.0
+    return max(jaccard, SequenceMatcher(None, a, b).ratio())
+
+
+class IdentifierResolver:
+    """
+    Maps misspelled table/column names onto the real catalog.
+
+    Built once per DB fingerprint from the schema catalog. Lookups score every
+    candidate by trigram overlap, edit ratio and singular/plural equivalence.
+    """
+
+    def __init__(self, tables: Dict[str, List[str]], foreign_keys: Dict[str, List[Tuple[str, str, str]]]):
+        self.tables = tables                      # table -> columns (real casing)
+        self.foreign_keys = foreign_keys          # table -> [(column, ref_table, ref_column)]
+        self._table_by_lower = {t.lower(): t for t in tables}
+
+    @classmethod
+    def from_catalog(cls, catalog) -> "IdentifierResolver":
+        tables = {name: [c.name for c in t.columns] for name, t in catalog.tables.items()}
+        fks = {name: [tuple(fk) for fk in t.foreign_keys] for name, t in catalog.tables.items()}
+        return cls(tables, fks)
+
+    def real_table(self, name: str) -> Optional[str]:
+        return self._table_by_lower.get(name.lower())
+
+    def best_table(self, name: str, threshold: float = 0.6) -> Optional[str]:
+        scored = sorted(((similarity(name, t), t) for t in self.tables), reverse=True)
+        return scored[0][1] if scored and scored[0][0] >= threshold else None
+
+    def best_column(self, name: str, tables: List[str], threshold: float = 0.6) -> Optional[Tuple[str, str]]:
+        """(table, column) in `tables` closest to `name`; ties prefer the earlier table."""
+        best = None
+        for order, table in enumerate(tables):
+            for column in self.tables.get(table, []):
+                score = similarity(name, column)
+                key = (score, -order)
+                if score >= threshold and (best is None or key > best[0]):
+                    best = (key, table, column)
+        return (best[1], best[2]) if best else None
+
+    def owning_table(self, column: str, tables: List[str]) -> Optional[str]:
+        """
+        Table to qualify an ambiguous column with: the one whose primary side of a
+        foreign key it is (i.e. not the referencing copy), else the first in FROM.
+        """
+        holders = [t for t in tables if any(c.lower() == column.lower() for c in self.tables.get(t, []))]
+        for table in holders:
+            referenced_elsewhere = any(
+                ref_table == table and ref_col.lower() == column.lower()
+                for other in holders for _, ref_table, ref_col in self.foreign_keys.get(other, [])
+            )
+            if referenced_elsewhere:
+                return table
+        return holders[0] if holders else None
+
+
+_resolvers: Dict[str, IdentifierResolver] = {}
+_resolvers_lock = threading.Lock()
+
+
+def get_resolver(db_path) -> IdentifierResolver:
+    catalog = get_catalog(db_path)
+    with _resolvers_lock:
+        resolver = _resolvers.get(catalog.fingerprint)
+        if resolver is None:
+            resolver = _resolvers[catalog.fingerprint] = IdentifierResolver.from_catalog(catalog)
+    return resolver
+
+
+def forget_resolvers(fingerprints) -> None:
+    with _resolvers_lock:
+        for fingerprint in fingerprints:
+            _resolvers.pop(fingerprint, None)
+
+
+def _replace_identifier(sql: str, old: str, new: str, qualifier: Optional[str] = None,
+                        new_qualifier: Optional[str] = None) -> str:
+    """Replace `[qualifier.]old` with `[new_qualifier or qualifier.]new` outside string literals."""
+    if qualifier:
+        pattern = re.compile(rf"\b{re.escape(qualifier)}\s*\.\s*[`\"\[]?{re.escape(old)}[`\"\]]?(?!\w)", re.IGNORECASE)
+        replacement = f"{new_qualifier or qualifier}.{new}"
+    else:
+        pattern = re.compile(rf"(?<![\w.])[`\"\[]?{re.escape(old)}[`\"\]]?(?!\w)", re.IGNORECASE)
+        replacement = new
+    parts, last = [], 0
+    for literal in _STRING_RE.finditer(sql):
+        parts.append(pattern.sub(lambda m: replacement, sql[last:literal.start()]))
+        parts.append(literal.group(0))
+        last = literal.end()
+    parts.append(pattern.sub(lambda m: replacement, sql[last:]))
+    return "".join(parts)
+
+
+def table_aliases(sql: str, resolver: IdentifierResolver) -> Dict[str, str]:
+    """alias (lowercase) -> real table name, for every table referenced in FROM/JOIN."""
+    aliases = {}
+    for table, alias in _TABLE_REF_RE.findall(_STRING_RE.sub("''", sql)):
+        real = resolver.real_table(table) or table
+        aliases[table.lower()] = real
+        if alias:
+            aliases[alias.lower()] = real
+    return aliases
+
+
+def propose_fix(sql: str, error_message: str, resolver: IdentifierResolver) -> Optional[Tuple[str, str]]:
+    """One deterministic rewrite for a schema error, as (new_sql, description), or None."""
+    match = _ERROR_RE.match(error_message.strip())
+    if not match:
+        return None
+    kind, ident = match.group(1).lower(), match.group(2).strip().strip("`\"[]")
+    aliases = table_aliases(sql, resolver)
+    query_tables = list(dict.fromkeys(t for t in aliases.values() if t in resolver.tables))
+
+    if kind == "no such table":
+        table = ident.split(".")[-1]
+        fixed = resolver.best_table(table)
+        if fixed and fixed != table:
+            return _replace_identifier(sql, table, fixed), f"table {table} -> {fixed}"
+        return None
+
+    qualifier, column = ident.rsplit(".", 1) if "." in ident else (None, ident)
+
+    if kind == "ambiguous column name":
+        owner = resolver.owning_table(column, query_tables)
+        if not owner:
+            return None
+        alias = next((a for a, t in aliases.items() if t == owner and a != owner.lower()), owner)
+        return _replace_identifier(sql, column, f"{alias}.{column}"), f"column {column} -> {alias}.{column}"
+
+    # no such column
+    if qualifier:
+        table = aliases.get(qualifier.lower())
+        if table is None or table not in resolver.tables:
+            return None
+        candidates = [table]
+    else:
+        candidates = query_tables
+    found = resolver.best_column(column, candidates)
+    if found is None and qualifier:
+        # Right column, wrong alias: look across the other tables in the query.
+        found = resolver.best_column(column, query_tables)
+        if found:
+            alias = next((a for a, t in aliases.items() if t == found[0] and a != found[0].lower()), found[0])
+            new_sql = _replace_identifier(sql, column, found[1], qualifier, new_qualifier=alias)
+            return new_sql, f"column {ident} -> {alias}.{found[1]}"
+    if not found or found[1] == column:
+        return None
+    return _replace_identifier(sql, column, found[1], qualifier), f"column {ident} -> {found[1]}"
+
+
+def repair_and_execute(sql: str, error_message: str, execute, db_path, max_attempts: int = 4):
+    """
+    Apply local fixes one error at a time, re-executing after each.
+
+    `execute(sql)` must return the SQLExecutionTool result dict. Returns
+    (result, repairs) for the first successful execution, or (None, repairs)
+    when the errors are not ones this resolver can fix.
+    """
+    try:
+        resolver = get_resolver(db_path)
+    except Exception:
+        return None, []
+    repairs, seen = [], {sql}
+    for _ in range(max_attempts):
+        proposal = propose_fix(sql, error_message, resolver)
+        if proposal is None or proposal[0] in seen:
+            return None, repairs
+        sql, description = proposal
+        seen.add(sql)
+        repairs.append(description)
+        result = execute(sql)
+        if result.get("success"):
+            return result, repairs
+        error_message = result.get("error_message", "")
+    return None, repairs
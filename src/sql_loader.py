@@ -0,0 +1,200 @@
+import codecs
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+READ_CHUNK_BYTES = 1 << 20
+LOAD_BATCH_STATEMENTS = int(os.getenv("SQL_LOAD_BATCH_STATEMENTS", "20000"))
+# Bulk-load tuning for the private build file; it is swapped in atomically when complete.
+BULK_PRAGMAS = (
+    "PRAGMA journal_mode = OFF;",
+    "PRAGMA synchronous = OFF;",
+    "PRAGMA locking_mode = EXCLUSIVE;",
+    "PRAGMA temp_store = MEMORY;",
+    "PRAGMA cache_size = -262144;",
+)
+
+# Next character sequence that can change the lexer state.
+_TOKEN_RE = re.compile(r"""[;'"`\[]|--|/\*""")
+_CLOSERS = {"'": "'", '"': '"', "`": "`", "[": "]", "--": "\n", "/*": "*/"}
+# Leading keywords of a statement, skipping comments.
+_LEAD_RE = re.compile(r"\A(?:\s+|--[^\n]*(?:\n|\Z)|/\*.*?\*/)*(\w+)(?:\s+(\w+))?(?:\s+(\w+))?", re.DOTALL)
+_TRANSACTION_KEYWORDS = {"BEGIN", "COMMIT", "END", "ROLLBACK"}
+# Pragmas the loader owns while building; the dump's own values are ignored.
+_OWNED_PRAGMA_RE = re.compile(r"\bPRAGMA\s+(?:main\.)?(journal_mode|synchronous|locking_mode)\b", re.IGNORECASE)
+
+
+def iter_statements(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Split SQL text arriving in chunks into complete statements.
+
+    Tracks quotes ('' escapes fall out naturally as adjacent strings),
+    identifier quoting, and line/block comments, so only top-level semicolons
+    end a statement. CREATE TRIGGER bodies are held until sqlite3 agrees the
+    statement is complete. Memory is bounded by the longest statement.
+    """
+    buf, start, pos, state = "", 0, 0, None
+    for chunk in chunks:
+        buf = buf[start:] + chunk
+        pos -= start
+        start = 0
+        while True:
+            if state is None:
+                match = _TOKEN_RE.search(buf, pos)
+                if match is None:
+                    # Keep the last char: it may be the first half of `--` or `/*`.
+                    pos = max(pos, len(buf) - 1)
+                    break
+                token, pos = match.group(0), match.end()
+                if token != ";":
+                    state = token
+                    continue
+                statement = buf[start:pos]
+                if _is_trigger(statement) and not sqlite3.complete_statement(statement):
+                    continue
+                start = pos
+                if statement.strip() != ";":
+                    yield statement
+            else:
+                closer = _CLOSERS[state]
+                idx = buf.find(closer, pos)
+                if idx < 0:
+                    pos = max(pos, len(buf) - len(closer) + 1)
+                    break
+                pos, state = idx + len(closer), None
+    tail = buf[start:]
+    if tail.strip() and _LEAD_RE.match(tail):
+        yield tail
+
+
+def _keywords(statement: str):
+    match = _LEAD_RE.match(statement)
+    return tuple(w.upper() for w in match.groups() if w) if match else ()
+
+
+def _is_trigger(statement: str) -> bool:
+    words = _keywords(statement)
+    return len(words) >= 2 and words[0] == "CREATE" and "TRIGGER" in words[1:3]
+
+
+def _is_index(statement: str) -> bool:
+    words = _keywords(statement)
+    return len(words) >= 2 and words[0] == "CREATE" and "INDEX" in words[1:3]
+
+
+def file_sha256(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def manifest_path(db_path) -> Path:
+    db_path = Path(db_path)
+    return db_path.with_name(db_path.name + ".load.json")
+
+
+def is_current(sql_path, db_path, source_sha256: Optional[str] = None) -> bool:
+    """True when `db_path` was already built from a file with the same content hash."""
+    if not Path(db_path).exists():
+        return False
+    try:
+        with open(manifest_path(db_path), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return manifest.get("source_sha256") == (source_sha256 or file_sha256(sql_path))
+
+
+def load_sql_dump(sql_path, db_path, force: bool = False, batch_statements: int = LOAD_BATCH_STATEMENTS,
+                  progress: Optional[Callable[[int, int, int], None]] = None) -> dict:
+    """
+    Build `db_path` from the SQL dump at `sql_path` without reading it whole.
+
+    Statements are streamed from 1 MiB chunks into a private `.building`
+    file with journaling and fsync off, committed every `batch_statements`,
+    with CREATE INDEX deferred until the data is in. The finished file
+    replaces `db_path` atomically, and a manifest records the dump's sha256 so
+    an identical dump is not rebuilt unless `force`. `progress(bytes_read,
+    total_bytes, statements)` is called after every chunk.
+    """
+    sql_path, db_path = Path(sql_path), Path(db_path)
+    source_sha256 = file_sha256(sql_path)
+    if not force and is_current(sql_path, db_path, source_sha256):
+        return {"skipped": True, "source_sha256": source_sha256}
+
+    started = time.perf_counter()
+    total_bytes = sql_path.stat().st_size
+    building = db_path.with_name(db_path.name + ".building")
+    building.unlink(missing_ok=True)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+
+    statements = deferred = 0
+    deferred_indexes = []
+    conn = sqlite3.connect(str(building), isolation_level=None)
+    try:
+        for pragma in BULK_PRAGMAS:
+            conn.execute(pragma)
+        with open(sql_path, "rb") as raw:
+            def chunks():
+                # Decode incrementally so progress is measured in file bytes.
+                decoder = codecs.getincrementaldecoder("utf-8")()
+                for block in iter(lambda: raw.read(READ_CHUNK_BYTES), b""):
+                    yield decoder.decode(block)
+                    if progress:
+                        progress(raw.tell(), total_bytes, statements)
+                yield decoder.decode(b"", final=True)
+
+            conn.execute("BEGIN;")
+            pending = 0
+            for statement in iter_statements(chunks()):
+                words = _keywords(statement)
+                if not words or words[0] in _TRANSACTION_KEYWORDS or _OWNED_PRAGMA_RE.search(statement):
+                    continue
+                if _is_index(statement):
+                    deferred_indexes.append(statement)
+                    continue
+                if words[0] == "PRAGMA":
+                    # Most pragmas (e.g. foreign_keys) are no-ops inside a transaction.
+                    conn.execute("COMMIT;")
+                    conn.execute(statement)
+                    conn.execute("BEGIN;")
+                else:
+                    conn.execute(statement)
+                statements += 1
+                pending += 1
+                if pending >= batch_statements:
+                    conn.execute("COMMIT;")
+                    conn.execute("BEGIN;")
+                    pending = 0
+            conn.execute("COMMIT;")
+
+        for statement in deferred_indexes:
+            conn.execute(statement)
+            deferred += 1
+        conn.execute("PRAGMA optimize;")
+        conn.execute("PRAGMA journal_mode = DELETE;")
+    except Exception:
+        conn.close()
+        building.unlink(missing_ok=True)
+        raise
+    conn.close()
+
+    os.replace(building, db_path)
+    stats = {
+        "skipped": False,
+        "source_sha256": source_sha256,
+        "statements": statements + deferred,
+        "deferred_indexes": deferred,
+        "bytes": total_bytes,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    with open(manifest_path(db_path), "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2)
+    return stats
@@ -0,0 +1,321 @@
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Set
+
+import sqlparse
+from sqlparse import sql as S, tokens as T
+
+from src.catalog import get_catalog
+from src.connection import get_pool
+from src.schema_repair import get_resolver
+from src.sql_loader import iter_statements
+
+SQL_VALIDATION_ENABLED = os.getenv("SQL_VALIDATION_ENABLED", "1") != "0"
+
+# Columns every rowid table has without declaring them.
+_IMPLICIT_COLUMNS = frozenset({"rowid", "oid", "_rowid_"})
+
+
+class Token(NamedTuple):
+    kind: str            # keyword, name, quoted, string, number, param, op
+    text: str
+    name: str            # identifier without quoting (names and quoted identifiers)
+
+
+class ValidationReport:
+    """Everything wrong with one statement, found without executing it."""
+
+    def __init__(self, sql: str):
+        self.sql = sql
+        self.errors: List[Dict[str, Any]] = []
+        self.warnings: List[Dict[str, Any]] = []
+        self.tables: List[str] = []
+        self.columns: List[str] = []
+        self.compile_error: Optional[Dict[str, Any]] = None
+        self.elapsed_ms = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors and self.compile_error is None
+
+    def add(self, kind: str, name: str, message: str, suggestion: Optional[str] = None) -> None:
+        if not any(e["kind"] == kind and e["name"] == name for e in self.errors):
+            self.errors.append({"kind": kind, "name": name, "message": message, "suggestion": suggestion})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ok": self.ok,
+            "errors": self.errors,
+            "warnings": self.warnings,
+            "compile_error": self.compile_error,
+            "tables": self.tables,
+            "columns": self.columns,
+            "elapsed_ms": self.elapsed_ms,
+        }
+
+    def error_response(self, query: str) -> Dict[str, Any]:
+        """SQLExecutionTool-shaped failure; `error_message` is SQLite's own when it compiled the SQL."""
+        first = self.compile_error or {"type": "OperationalError", "message": self.errors[0]["message"]}
+        return {
+            "success": False,
+            "query": query,
+            "error_type": first["type"],
+            "error_message": first["message"],
+            "stage": "validation",
+            "validation": self.to_dict(),
+        }
+
+
+def _token(ttype, text: str) -> Token:
+    if ttype in T.Keyword:
+        return Token("keyword", text, "")
+    if ttype in T.Name.Placeholder:
+        return Token("param", text, "")
+    if ttype in T.Name or ttype in T.String.Symbol:
+        if text[0] in "\"`":
+            return Token("quoted", text, text[1:-1].replace(text[0] * 2, text[0]))
+        if text[0] == "[":
+            return Token("quoted", text, text[1:-1])
+        return Token("name", text, text)
+    if ttype in T.String:
+        return Token("string", text, "")
+    if ttype in T.Number:
+        return Token("number", text, "")
+    return Token("op", text, "")
+
+
+def tokenize(sql: str) -> List[Token]:
+    """sqlparse's lexer output without whitespace and comments."""
+    return [_token(ttype, text) for ttype, text in sqlparse.lexer.tokenize(sql)
+            if ttype not in T.Whitespace and ttype not in T.Comment]
+
+
+def is_identifier(token: Optional[Token]) -> bool:
+    return token is not None and token.kind in ("name", "quoted")
+
+
+class _References(NamedTuple):
+    tables: Dict[str, str]            # alias or table name (lowercase) -> table name as written
+    derived: Set[str]                 # CTE names and subquery aliases (lowercase)
+    aliases: Set[str]                 # result column aliases (lowercase)
+    qualified: List[tuple]            # (qualifier, column)
+    unqualified: List[Token]
+
+
+def _children(group) -> list:
+    return [t for t in group.tokens if not t.is_whitespace and not isinstance(t, S.Comment)
+            and t.ttype not in T.Comment]
+
+
+def _name(token) -> Optional[Token]:
+    """The identifier a leaf token (or a one-token group) spells, if any."""
+    while token.is_group and len(_children(token)) == 1:
+        token = _children(token)[0]
+    leaf = None if token.is_group else _token(token.ttype, token.value)
+    return leaf if is_identifier(leaf) else None
+
+
+def collect_references(sql: str) -> _References:
+    """Table refs with aliases, CTEs, derived tables, output aliases and columns, from sqlparse's tree."""
+    refs = _References({}, set(), set(), [], [])
+    for statement in sqlparse.parse(sql):
+        _walk(statement, refs)
+    return refs
+
+
+def _walk(group, refs: _References) -> None:
+    clause = None                     # what identifiers after the last keyword name
+    for token in _children(group):
+        if token.ttype in T.Keyword:
+            upper = token.normalized
+            if upper == "FROM" or upper.endswith("JOIN"):
+                clause = "table"
+            elif upper in ("WITH", "RECURSIVE", "WINDOW"):
+                clause = "cte"        # named definitions: `name AS (...)`
+            elif upper in ("COLLATE", "OVER"):
+                clause = "skip"       # collation or window name
+            else:
+                clause = None
+        elif clause == "table":
+            _table(token, refs)
+        elif clause == "cte":
+            _cte(token, refs)
+        elif clause == "skip":
+            clause = None
+            if not _name(token):
+                _expression(token, refs)
+        else:
+            _expression(token, refs)
+
+
+def _table(token, refs: _References) -> None:
+    if isinstance(token, S.IdentifierList):
+        for item in _children(token):
+            _table(item, refs)
+        return
+    if not isinstance(token, S.Identifier):
+        _expression(token, refs)
+        return
+    first, alias = _children(token)[0], token.get_alias()
+    if isinstance(first, (S.Parenthesis, S.Function)):
+        # Derived table or table-valued function: [AS] alias
+        if alias:
+            refs.derived.add(alias.lower())
+        _expression(first, refs)
+        return
+    name = _name(_children(token)[2]) if token.get_parent_name() else _name(first)
+    if name is None:
+        return
+    refs.tables[name.name.lower()] = name.name
+    if alias:
+        refs.tables[alias.lower()] = name.name
+
+
+def _cte(token, refs: _References) -> None:
+    """`name [(col, ...)] AS (select)`: the name is a derived table, the column list names its output."""
+    if isinstance(token, S.IdentifierList):
+        for item in _children(token):
+            _cte(item, refs)
+        return
+    children = _children(token) if isinstance(token, S.Identifier) else [token]
+    head = children[0]
+    if isinstance(head, S.Function):
+        for column in head.get_parameters():
+            if _name(column):
+                refs.aliases.add(_name(column).name.lower())
+        head = _children(head)[0]
+    if _name(head):
+        refs.derived.add(_name(head).name.lower())
+    for body in children[1:]:
+        if body.is_group:
+            _walk(body, refs)
+
+
+def _expression(token, refs: _References) -> None:
+    if isinstance(token, S.Identifier):
+        children = _children(token)
+        alias = token.get_alias()
+        if alias:
+            refs.aliases.add(alias.lower())
+        keywords = [c.normalized for c in children]
+        if "AS" in keywords:
+            children = children[:keywords.index("AS")]     # alias, or the type in CAST(x AS type)
+        elif alias:
+            children = children[:-1]
+        # Leading name chain: column, table.column, schema.table.column or table.*
+        chain = []
+        while children and (children[0].ttype in T.Punctuation and children[0].value == "."
+                            or children[0].ttype in T.Wildcard or _name(children[0])):
+            chain.append(children.pop(0))
+        names = [_name(t) for t in chain if _name(t)]
+        if chain and chain[-1].ttype in T.Wildcard:
+            if names:
+                refs.qualified.append((names[-1].name, None))
+        elif len(names) == 1:
+            refs.unqualified.append(names[0])
+        elif len(names) > 1:
+            refs.qualified.append((names[-2].name, names[-1].name))
+        for child in children:
+            _expression(child, refs)
+    elif isinstance(token, S.Function):
+        for child in _children(token)[1:]:
+            _expression(child, refs)
+    elif token.is_group:
+        _walk(token, refs)
+    elif _name(token):
+        refs.unqualified.append(_name(token))
+
+
+def _check_statement(report: ValidationReport, sql: str, catalog, resolver) -> None:
+    refs = collect_references(sql)
+    query_tables, resolved = [], {}      # resolved: alias/table key -> real table (or its likely fix)
+    for key, name in refs.tables.items():
+        if key in refs.derived or name.lower() in refs.derived:
+            continue
+        table = catalog.table(name)
+        if table is None:
+            fixed = resolver.best_table(name)
+            report.add("unknown_table", name, f"no such table: {name}", fixed)
+            if fixed:
+                resolved[key] = fixed
+            continue
+        resolved[key] = table.name
+        if table.name not in query_tables:
+            query_tables.append(table.name)
+    report.tables = query_tables
+
+    referenced = []
+    for qualifier, column in refs.qualified:
+        key = qualifier.lower()
+        if key in refs.derived or refs.tables.get(key, "").lower() in refs.derived:
+            continue
+        if key not in refs.tables:
+            report.add("unknown_alias", qualifier,
+                       f"no such column: {qualifier}.{column}" if column else f"no such table: {qualifier}",
+                       None)
+            continue
+        table = resolved.get(key)
+        if table is None or column is None:
+            continue
+        if catalog.column(table, column) is None and column.lower() not in _IMPLICIT_COLUMNS:
+            found = resolver.best_column(column, [table])
+            report.add("unknown_column", f"{qualifier}.{column}", f"no such column: {qualifier}.{column}",
+                       f"{qualifier}.{found[1]}" if found else None)
+        else:
+            referenced.append(f"{table}.{column}")
+
+    # With CTEs or derived tables in scope, an unqualified name may be one of their
+    # columns, so it only has to exist somewhere in the schema.
+    scope = query_tables if not refs.derived else list(catalog.tables)
+    for token in refs.unqualified:
+        column, key = token.name, token.name.lower()
+        if key in refs.aliases or key in refs.tables or key in refs.derived or key in _IMPLICIT_COLUMNS:
+            continue
+        owner = next((t for t in scope if catalog.column(t, column) is not None), None)
+        if owner:
+            referenced.append(f"{owner}.{catalog.column(owner, column).name}")
+            continue
+        if token.text.startswith('"'):
+            # Most likely a string literal written with double quotes.
+            suggestion = "'" + column.replace("'", "''") + "'"
+        else:
+            found = resolver.best_column(column, query_tables or list(catalog.tables))
+            suggestion = found[1] if found else None
+        report.add("unknown_column", column, f"no such column: {column}", suggestion)
+    report.columns = list(dict.fromkeys(referenced))
+
+
+def _compile(report: ValidationReport, sql: str, db_path) -> None:
+    """EXPLAIN prepares the statement against the live schema without running it."""
+    try:
+        with get_pool(db_path).connection() as conn:
+            conn.execute("EXPLAIN " + sql).fetchone()
+    except sqlite3.Error as e:
+        report.compile_error = {"type": type(e).__name__, "message": str(e)}
+
+
+def validate_sql(sql: str, db_path) -> ValidationReport:
+    """
+    Check generated SQL before it runs: one statement, every table, alias and
+    column resolved against the catalog (with the closest real name as a
+    suggestion), then compiled with EXPLAIN. Static findings that SQLite
+    nevertheless compiles are kept as warnings, so the heuristics can never
+    reject a query the database accepts.
+    """
+    started = time.perf_counter()
+    report = ValidationReport(sql)
+    statements = [s for s in iter_statements([sql]) if tokenize(s.rstrip(";"))]
+    if len(statements) > 1:
+        report.add("multiple_statements", str(len(statements)),
+                   "You can only execute one statement at a time.", statements[0].strip())
+    elif not statements:
+        report.add("empty", "", "The query is empty.")
+    else:
+        catalog, resolver = get_catalog(db_path), get_resolver(db_path)
+        _check_statement(report, statements[0], catalog, resolver)
+        _compile(report, sql, db_path)
+        if report.compile_error is None and report.errors:
+            report.warnings, report.errors = report.errors, []
+    report.elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+    return report
@@ -0,0 +1,30 @@
+from crewai import Task
+
+def get_lite_sql_task(agent):
+    return Task(
+    description="""
+    You are a SQL Generation Expert answering a simple question that only needs one table.
+    In a single step, understand the question, plan the query and write the SQL.
+
+    User Question: "{user_query}"
+
+    **Relevant Table Schema** (retrieved for this question, use these names exactly):
+    {schema_context}
+
+    **Previously Verified Examples** (reuse their patterns when they fit, ignore them otherwise):
+    {examples}
+
+    **Your Process:**
+    1. Work out what the user wants: which columns, filters, counts or ordering
+    2. Map every requested field to a column of the table above, preserving all fields the user asked for
+    3. Write one SQLite query against that table only
+
+    **Output Requirements**:
+    - Generate ONLY the SQL query
+    - No explanations, no markdown formatting, no additional text
+    - Use table and column names exactly as in the schema above
+    - End the query with a semicolon
+    """,
+    agent=agent,
+    expected_output="A single clean, executable SQLite query answering the question.",
+)
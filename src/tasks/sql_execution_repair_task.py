@@ -7,15 +7,24 @@ def get_sql_execution_repair_task(agent, context):
 
     **Primary Execution Process:**
     1. Execute the SQL query using SQLExecutionTool1
-    2. If successful (success=True), clean the query formatting and return the results to the user
+    2. If successful (success=True), check the preview rows make sense for the question, then return
+       the final query (the tool only shows a preview; the application fetches the full result itself)
     3. If failed (success=False), begin automatic repair process
+    4. If the result contains "local_repairs", the tool already fixed table/column names or WHERE
+       literal values itself: treat it as successful and use the returned "query" (not your original)
+       as the final query
+    5. If the failed result has "stage": "validation", the query was checked against the schema and
+       compiled without running: "validation.errors" lists EVERY unknown table/column at once, each
+       with a "suggestion" (closest real name, or a single-quoted string for a double-quoted value).
+       Fix all of them in one attempt instead of one per execution
 
     **3-Attempt Repair Strategy:**
 
     **ATTEMPT 1 - Schema Correction:**
     - Use SQLErrorRetrievalTool to retrieve similar table/column names via vector search
     - Focus on "no such table" and "no such column" errors
-    - Apply best matches from relevant_info (exact name corrections)
+    - Apply best matches from relevant_info (exact name corrections; "suggested_values" are the
+      closest values that really exist in that column)
     - Re-execute with corrected schema names
 
     **ATTEMPT 2 - Syntax & Logic Fixes:**
@@ -32,6 +41,12 @@ def get_sql_execution_repair_task(agent, context):
     - Remove problematic clauses and rebuild step by step
     - Re-execute with restructured query
 
+    **Budget Errors (QueryTimeout / QueryTooExpensive / ResultTooLarge):**
+    - The query was stopped because it was too slow, too expensive or returned too much data
+    - Do NOT re-run it unchanged; follow the hint in error_message
+    - Add missing JOIN ... ON conditions (avoid Cartesian products), add selective WHERE filters,
+      aggregate instead of listing rows, select fewer columns or add a LIMIT
+
     **If All Repairs Fail:**
     Provide a friendly, non-technical explanation such as:
     "I apologize, but I wasn't able to retrieve the information you requested. The query encountered some technical issues that I couldn't automatically resolve. Could you please rephrase your question or provide more details about what specific information you're looking for?"
@@ -49,18 +64,18 @@ def get_sql_execution_repair_task(agent, context):
     context=context,  # Takes SQL query from agent 3
     expected_output="""
     Either:
-    1. **Successful Results**: JSON format with query results including row_count, columns, and data array
+    1. **Successful Results**: JSON with the final validated query and its status (no result rows)
     2. **Friendly Error Message**: User-friendly explanation when all 3 repair attempts fail, without technical details
 
     Format for successful results:
     {
         "success": True,
-        "query": ""corrected_query_if_modified or the orginal if not modified",
-        "row_count": X,
-        "columns": ["col1", "col2", ...],
-        "data": [{"col1": "value1", "col2": "value2"}, ...]
+        "query": "corrected_query_if_modified or the original if not modified",
+        "status": "executed"
     }
 
+    Do NOT copy "columns" or "data" from the tool output into the answer.
+
     Format for friendly error:
     "I apologize, but I wasn't able to retrieve the information you requested. [Helpful suggestion for user]"
     """
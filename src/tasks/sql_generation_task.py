@@ -61,6 +61,10 @@ def get_sql_generation_task(agent, context):
     - "where_clauses": Array of filter conditions with reasoning
     - "aggregations_and_sorting": Object with aggregations, grouping, sorting, and limiting details
 
+    **Previously Verified Examples** (questions on this database whose SQL ran successfully;
+    reuse their table/column choices and join paths when they fit, ignore them otherwise):
+    {examples}
+
     **SQL Generation Guidelines**:
     - Extract table and column names exactly as specified in the JSON
     - Use proper SQL formatting with consistent indentation
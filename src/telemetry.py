@@ -0,0 +1,404 @@
+"""
+Tracing and Prometheus metrics for the NL->SQL pipeline.
+
+Spans follow OpenTelemetry. With opentelemetry-sdk installed,
+OTEL_TRACES_EXPORTER picks the exporter: "file" writes one JSON span per line
+to TRACE_PATH, "otlp" sends to the collector at OTEL_EXPORTER_OTLP_ENDPOINT
+(opentelemetry-exporter-otlp-proto-http), "console" prints them. The default
+"none" leaves any tracer provider configured elsewhere (e.g.
+opentelemetry-instrument) in charge; without the SDK every span is a no-op.
+
+A crew run is a `crew_scope`: one root span and one span per task, the task
+span being ended by the crew's task callback (`stage_callback`). Tool, LLM,
+embedding, Chroma and SQLite spans opened during the run are children of the
+current task, and their latency histograms are labelled with its stage.
+
+Questions and SQL are user data: spans carry only a hash of them (e.g.
+`db.query.text.sha256`) unless TRACE_INCLUDE_TEXT=1.
+
+Metrics are served by /metrics in web/app.py; without prometheus_client they
+are not collected.
+"""
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Sequence
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SpanExportResult
+except ImportError:  # optional: without the OpenTelemetry SDK every span is a no-op
+    trace = None
+
+try:
+    import prometheus_client
+except ImportError:  # optional: without it /metrics answers 501
+    prometheus_client = None
+
+from src.paths import TRACE_PATH
+
+TRACES_EXPORTER = os.getenv("OTEL_TRACES_EXPORTER", "none").lower()
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "crew-to-sql")
+TRACE_INCLUDE_TEXT = os.getenv("TRACE_INCLUDE_TEXT", "0") == "1"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+ATTEMPT_BUCKETS = (0, 1, 2, 3, 4, 6, 8)
+
+
+class MetricsUnavailable(Exception):
+    """/metrics was requested but prometheus_client is not installed."""
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs) -> "_NoopMetric":
+        return self
+
+    def observe(self, value) -> None:
+        pass
+
+    def inc(self, amount=1) -> None:
+        pass
+
+
+def _histogram(name: str, documentation: str, labels: Sequence[str], buckets=LATENCY_BUCKETS):
+    if prometheus_client is None:
+        return _NoopMetric()
+    return prometheus_client.Histogram(name, documentation, labels, buckets=buckets)
+
+
+def _counter(name: str, documentation: str, labels: Sequence[str]):
+    if prometheus_client is None:
+        return _NoopMetric()
+    return prometheus_client.Counter(name, documentation, labels)
+
+
+CREW_SECONDS = _histogram("nl2sql_crew_seconds", "Wall time of one crew run", ["route"])
+STAGE_SECONDS = _histogram("nl2sql_stage_seconds", "Wall time of one crew task", ["stage"])
+TOOL_SECONDS = _histogram("nl2sql_tool_seconds", "Agent tool call time", ["tool", "stage"])
+LLM_SECONDS = _histogram("nl2sql_llm_call_seconds", "LLM call time", ["stage"])
+LLM_TOKENS = _histogram("nl2sql_llm_tokens", "LLM tokens used by one crew run", ["route", "kind"],
+                        buckets=TOKEN_BUCKETS)
+EMBEDDING_SECONDS = _histogram("nl2sql_embedding_seconds", "Embedding model time for cache misses", ["kind"])
+CHROMA_SECONDS = _histogram("nl2sql_chroma_query_seconds", "Chroma similarity query time", ["collection"])
+SQLITE_SECONDS = _histogram("nl2sql_sqlite_seconds", "SQLite validation/execution time", ["operation"])
+REPAIR_ATTEMPTS = _histogram("nl2sql_repair_attempts", "Repair attempts per execution (local) or crew run (agent)",
+                             ["kind"], buckets=ATTEMPT_BUCKETS)
+# Hit rate = rate(..{result="hit"}) / rate(..) per cache.
+CACHE_LOOKUPS = _counter("nl2sql_cache_lookups_total", "Cache lookups by outcome", ["cache", "result"])
+
+
+class JsonLinesSpanExporter:
+    """Append finished spans to `path`, one OpenTelemetry JSON object per line."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+    def export(self, spans) -> "SpanExportResult":
+        lines = [json.dumps(json.loads(span.to_json())) for span in spans]
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+
+_tracer = None
+_provider = None
+_tracer_lock = threading.Lock()
+
+
+def _exporter():
+    if TRACES_EXPORTER == "file":
+        return JsonLinesSpanExporter(os.getenv("TRACE_PATH", str(TRACE_PATH)))
+    if TRACES_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()
+    if TRACES_EXPORTER == "console":
+        return ConsoleSpanExporter()
+    return None
+
+
+def get_tracer():
+    """The pipeline's tracer, configured from OTEL_TRACES_EXPORTER on first use; None without the SDK."""
+    global _tracer, _provider
+    if _tracer is None and trace is not None:
+        with _tracer_lock:
+            if _tracer is None:
+                try:
+                    exporter = _exporter()
+                except ImportError as e:
+                    print(f"⚠️ Trace exporter {TRACES_EXPORTER!r} unavailable: {e}")
+                    exporter = None
+                if exporter is not None:
+                    _provider = TracerProvider(resource=Resource.create({"service.name": SERVICE_NAME}))
+                    _provider.add_span_processor(BatchSpanProcessor(exporter))
+                    trace.set_tracer_provider(_provider)
+                _tracer = trace.get_tracer("crew_to_sql")
+    return _tracer
+
+
+def shutdown_tracing() -> None:
+    """Flush and stop the exporter configured here (no-op otherwise)."""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+class CrewRun:
+    """One crew kickoff: its root span, the open task span and tool calls per stage."""
+
+    def __init__(self, route: str, stages: Sequence[str], root):
+        self.route = route
+        self.stages = list(stages)
+        self.root = root
+        self.index = 0
+        self.stage_span = None
+        self.stage_started = 0.0
+        self.tool_calls: Counter = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def stage(self) -> str:
+        return self.stages[self.index] if self.index < len(self.stages) else f"stage_{self.index}"
+
+    def start_stage(self) -> None:
+        self.stage_started = time.perf_counter()
+        tracer = get_tracer()
+        if tracer is not None:
+            self.stage_span = tracer.start_span(
+                f"crew.task.{self.stage}",
+                context=trace.set_span_in_context(self.root),
+                attributes={"crew.stage": self.stage, "crew.stage_index": self.index},
+            )
+
+    def end_stage(self, output=None, error: Optional[BaseException] = None) -> None:
+        STAGE_SECONDS.labels(self.stage).observe(time.perf_counter() - self.stage_started)
+        if self.stage_span is not None:
+            raw = getattr(output, "raw", None)
+            if raw is not None:
+                self.stage_span.set_attribute("crew.output_chars", len(str(raw)))
+            if error is not None:
+                self.stage_span.record_exception(error)
+                self.stage_span.set_status(trace.Status(trace.StatusCode.ERROR, str(error)))
+            self.stage_span.end()
+            self.stage_span = None
+
+    def task_done(self, output) -> None:
+        with self._lock:
+            self.end_stage(output)
+            self.index += 1
+            if self.index < len(self.stages):
+                self.start_stage()
+            else:
+                self.stage_started = None
+
+    def count_tool(self, tool: str) -> None:
+        with self._lock:
+            self.tool_calls[(self.stage, tool)] += 1
+
+    def record_usage(self, crew_output) -> None:
+        """Token totals from a CrewOutput's `token_usage` (prompt and completion)."""
+        usage = getattr(crew_output, "token_usage", None)
+        if usage is None:
+            return
+        prompt, completion = getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0
+        LLM_TOKENS.labels(self.route, "prompt").observe(prompt)
+        LLM_TOKENS.labels(self.route, "completion").observe(completion)
+        if self.root is not None:
+            self.root.set_attribute("gen_ai.usage.input_tokens", prompt)
+            self.root.set_attribute("gen_ai.usage.output_tokens", completion)
+
+
+_current_run: ContextVar[Optional[CrewRun]] = ContextVar("crew_run", default=None)
+
+
+def current_stage() -> str:
+    run = _current_run.get()
+    return run.stage if run is not None else "none"
+
+
+@contextmanager
+def crew_scope(route: str, stages: Sequence[str], **attributes):
+    """
+    Trace one crew run (inherited by worker threads, like retrieval_scope).
+
+    `stages` names the crew's tasks in order; the crew must be built with
+    `stage_callback` so each task's span ends with it.
+    """
+    tracer = get_tracer()
+    started = time.perf_counter()
+    root_span = tracer.start_as_current_span(f"crew.{route}", attributes=_attributes(attributes)) if tracer else nullcontext()
+    with root_span as root:
+        run = CrewRun(route, stages, root)
+        run.start_stage()
+        token = _current_run.set(run)
+        error = None
+        try:
+            yield run
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _current_run.reset(token)
+            with run._lock:
+                if run.stage_started is not None:
+                    run.end_stage(error=error)
+            CREW_SECONDS.labels(route).observe(time.perf_counter() - started)
+            if "execution" in run.stages:
+                executions = run.tool_calls[("execution", "sql_execution_tool")]
+                REPAIR_ATTEMPTS.labels("agent").observe(max(0, executions - 1))
+
+
+def stage_callback(task_callback=None):
+    """Crew `task_callback` that ends the current task span, then calls `task_callback`."""
+    def callback(output):
+        run = _current_run.get()
+        if run is not None:
+            run.task_done(output)
+        if task_callback is not None:
+            task_callback(output)
+    return callback
+
+
+def text_attribute(key: str, text: Optional[str]) -> Dict[str, Any]:
+    """`{key: text}` with TRACE_INCLUDE_TEXT=1, else `{key.sha256: <hash prefix>}` to correlate without exporting it."""
+    if text is None:
+        return {}
+    if TRACE_INCLUDE_TEXT:
+        return {key: text}
+    return {f"{key}.sha256": hashlib.sha256(text.strip().encode("utf-8")).hexdigest()[:16]}
+
+
+def _attributes(attributes: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in attributes.items() if v is not None}
+
+
+def _parent_context():
+    """The current task's span when nothing more specific is open in this thread."""
+    run = _current_run.get()
+    if run is None or run.stage_span is None:
+        return None
+    current = trace.get_current_span()
+    if current is run.root or not current.get_span_context().is_valid:
+        return trace.set_span_in_context(run.stage_span)
+    return None
+
+
+@contextmanager
+def span(name: str, histogram=None, labels: Sequence[str] = (), **attributes):
+    """
+    A span around the block (None when tracing is off), observing the block's
+    duration into `histogram.labels(*labels)` when given.
+    """
+    started = time.perf_counter()
+    tracer = get_tracer()
+    try:
+        if tracer is None:
+            yield None
+        else:
+            with tracer.start_as_current_span(name, context=_parent_context(),
+                                              attributes=_attributes(attributes)) as current:
+                yield current
+    finally:
+        if histogram is not None:
+            histogram.labels(*labels).observe(time.perf_counter() - started)
+
+
+def record_cache(cache: str, hits: int = 0, misses: int = 0) -> None:
+    if hits:
+        CACHE_LOOKUPS.labels(cache, "hit").inc(hits)
+    if misses:
+        CACHE_LOOKUPS.labels(cache, "miss").inc(misses)
+
+
+def record_repair_attempts(kind: str, attempts: int) -> None:
+    REPAIR_ATTEMPTS.labels(kind).observe(attempts)
+
+
+def traced_tool(run_method):
+    """Decorator for a BaseTool's `_run`: tool span, per-stage latency and call count."""
+    @functools.wraps(run_method)
+    def wrapper(self, *args, **kwargs):
+        stage = current_stage()
+        run = _current_run.get()
+        if run is not None:
+            run.count_tool(self.name)
+        with span(f"tool.{self.name}", TOOL_SECONDS, (self.name, stage), **{"tool.name": self.name, "crew.stage": stage}):
+            return run_method(self, *args, **kwargs)
+    return wrapper
+
+
+def instrument_llm(llm):
+    """Wrap `llm.call` in a span and the per-stage LLM latency histogram."""
+    call = llm.call
+
+    @functools.wraps(call)
+    def traced_call(messages, *args, **kwargs):
+        stage = current_stage()
+        attributes = {"gen_ai.operation.name": "chat", "gen_ai.request.model": getattr(llm, "model", None),
+                      "crew.stage": stage}
+        with span("llm.call", LLM_SECONDS, (stage,), **attributes) as current:
+            answer = call(messages, *args, **kwargs)
+            if current is not None:
+                prompt = messages if isinstance(messages, str) else "".join(str(m.get("content", "")) for m in messages)
+                current.set_attribute("llm.prompt_chars", len(prompt))
+                current.set_attribute("llm.completion_chars", len(str(answer)))
+            return answer
+
+    object.__setattr__(llm, "call", traced_call)
+    return llm
+
+
+_VECTOR_QUERIES = (
+    "similarity_search",
+    "similarity_search_by_vector",
+    "similarity_search_with_score",
+    "similarity_search_with_relevance_scores",
+)
+_in_vector_query: ContextVar[bool] = ContextVar("in_vector_query", default=False)
+
+
+def instrument_vectorstore(store, collection: str):
+    """Wrap a vector store's similarity queries in spans (outermost call only, they call each other)."""
+    def traced(method: str, query):
+        @functools.wraps(query)
+        def wrapper(*args, **kwargs):
+            if _in_vector_query.get():
+                return query(*args, **kwargs)
+            token = _in_vector_query.set(True)
+            try:
+                with span(f"chroma.{method}", CHROMA_SECONDS, (collection,), **{
+                    "db.system": "chromadb", "db.collection.name": collection,
+                    "db.operation.name": method, "vector.k": kwargs.get("k"), "crew.stage": current_stage(),
+                }):
+                    return query(*args, **kwargs)
+            finally:
+                _in_vector_query.reset(token)
+        return wrapper
+
+    for method in _VECTOR_QUERIES:
+        query = getattr(store, method, None)
+        if query is not None:
+            object.__setattr__(store, method, traced(method, query))
+    return store
+
+
+def render_metrics():
+    """(body, content type) of the Prometheus exposition; raises MetricsUnavailable without prometheus_client."""
+    if prometheus_client is None:
+        raise MetricsUnavailable("prometheus_client is not installed")
+    return prometheus_client.generate_latest(), prometheus_client.CONTENT_TYPE_LATEST
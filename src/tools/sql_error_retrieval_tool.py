@@ -2,6 +2,11 @@ import sqlite3, os, json
 from pydantic import BaseModel, Field
 from typing import Any, Dict
 from src.paths import DB_PATH
+from src.catalog import get_catalog
+from src.column_profiler import describe_column, get_profile
+from src.value_index import check_literals
+from src.retrieval_context import similarity_search
+from src.telemetry import traced_tool
 from crewai.tools import BaseTool
 
 
@@ -13,10 +18,12 @@ class SQLErrorRetrievalTool(BaseTool):
     name: str = "sql_error_retrieval_tool"
     description: str = "Retrieve relevant schema fixes from vector store based on SQL execution errors"
     vectorstore: Any = Field(description="ChromaDB vector store instance")
+    db_path: str = Field(default=os.getenv("DB_PATH") or str(DB_PATH), description="Path to the SQLite database file")
 
     class Config:
         arbitrary_types_allowed = True
 
+    @traced_tool
     def _run(self, error_result: Dict[str, Any]) -> Dict[str, Any]:
         if error_result.get("success", True):
             return {"message": "No error to process", "relevant_info": []}
@@ -27,6 +34,7 @@ class SQLErrorRetrievalTool(BaseTool):
 
         search_targets = []
         filtered_docs = []
+        catalog = get_catalog(self.db_path)
 
         # 1. No such column
         if "no such column" in error_message.lower():
@@ -39,28 +47,45 @@ class SQLErrorRetrievalTool(BaseTool):
             table = self._extract_table_name(error_message)
             search_targets.append(("table", table))
 
-        # 3. Bad value in WHERE clause
+        # 3. Bad value in WHERE clause: check every literal against the value index first
         elif "where" in query.lower():
-            bad_column, bad_value = self._extract_column_value_in_where(query)
-            if bad_column and bad_value:
-                search_targets.append(("value", bad_column))
+            filtered_docs.extend(self._value_corrections(query))
+            if not filtered_docs:
+                bad_column, bad_value = self._extract_column_value_in_where(query)
+                if bad_column and bad_value:
+                    search_targets.append(("value", bad_column))
+
+        # Validation found every unresolved name at once; search for the ones it could not place
+        for error in (error_result.get("validation") or {}).get("errors", []):
+            if error.get("suggestion"):
+                filtered_docs.append({
+                    "type": error["kind"],
+                    "search": error["name"],
+                    "suggestion": error["suggestion"],
+                })
+                continue
+            target_type = {"unknown_table": "table", "unknown_column": "column"}.get(error["kind"])
+            target = (target_type, error["name"].split(".")[-1].lower()) if target_type else None
+            if target and target not in search_targets:
+                search_targets.append(target)
 
         # Perform targeted vector search
         for target_type, target_name in search_targets:
             try:
-                docs = self.vectorstore.similarity_search(target_name, k=3)
+                docs = similarity_search(self.vectorstore, target_name, k=3)
                 for doc in docs:
                     table_name = doc.metadata.get("table", "").lower()
 
                     # Handle column errors
                     if target_type == "column":
-                        matching_lines = self._extract_matching_columns(doc.page_content, target_name)
+                        matching_lines = self._extract_matching_columns(catalog, table_name, target_name)
                         if matching_lines:
                             filtered_docs.append({
                                 "type": "column",
                                 "search": target_name,
                                 "table": table_name,
-                                "columns": matching_lines
+                                "columns": matching_lines,
+                                "profiles": self._column_profiles(catalog, table_name, target_name)
                             })
 
                     # Handle table errors
@@ -75,13 +100,14 @@ class SQLErrorRetrievalTool(BaseTool):
 
                     # Handle value-based condition errors
                     elif target_type == "value":
-                        values = self._extract_sample_values(doc.page_content, target_name)
+                        values = self._extract_sample_values(catalog, table_name, target_name)
                         if values:
                             filtered_docs.append({
                                 "type": "value",
                                 "search": target_name,
                                 "table": table_name,
-                                "sample_values": values
+                                "sample_values": values,
+                                "profiles": self._column_profiles(catalog, table_name, target_name)
                             })
 
             except Exception as e:
@@ -108,33 +134,55 @@ class SQLErrorRetrievalTool(BaseTool):
             return match.group(1).lower(), match.group(2).lower()
         return None, None
 
-    def _extract_matching_columns(self, content: str, column_name: str) -> list:
-        lines = content.splitlines()
-        return [line.strip() for line in lines if line.strip().startswith("-") and column_name in line]
-
-    def _extract_sample_values(self, content: str, column_name: str) -> list:
-        # Try to find sample values under the column name
-        section_start = content.find("Sample Data")
-        if section_start == -1:
+    def _value_corrections(self, query: str) -> list:
+        try:
+            checks = check_literals(query, self.db_path)
+        except Exception as e:
+            print(f"Value index lookup failed: {str(e)}")
             return []
-
-        sample_block = content[section_start:]
-        lines = sample_block.splitlines()
-
-        headers = []
-        data_rows = []
-        for i, line in enumerate(lines):
-            if i == 1:
-                headers = [h.strip() for h in line.split("|")]
-            elif i > 2:
-                data_rows.append([cell.strip() for cell in line.split("|")])
-
-        if not headers:
+        return [
+            {
+                "type": "value",
+                "table": check.table,
+                "column": check.column,
+                "search": check.value,
+                "suggested_values": [value for value, _ in check.suggestions],
+            }
+            for check in checks if not check.found
+        ]
+
+    def _extract_matching_columns(self, catalog, table_name: str, column_name: str) -> list:
+        table = catalog.table(table_name)
+        if table is None:
             return []
+        return [catalog.column_line(c) for c in table.columns if column_name in c.name.lower()]
 
+    def _column_profiles(self, catalog, table_name: str, column_name: str) -> list:
+        """Current null/distinct/range/top-value lines for the matching columns (kept out of the embedded docs)."""
+        table = catalog.table(table_name)
+        if table is None:
+            return []
         try:
-            idx = headers.index(column_name)
-            return list({row[idx] for row in data_rows if len(row) > idx})
-        except ValueError:
+            profile = get_profile(self.db_path)
+        except Exception as e:
+            print(f"Column profile unavailable: {str(e)}")
             return []
-
+        lines = []
+        for c in table.columns:
+            if column_name in c.name.lower():
+                column_profile = profile.column(table.name, c.name)
+                if column_profile is not None:
+                    lines.append(describe_column(c.name, column_profile))
+        return lines
+
+    def _extract_sample_values(self, catalog, table_name: str, column_name: str) -> list:
+        """Most frequent values from the column profile, then the catalog's sample rows."""
+        values = []
+        try:
+            profile = get_profile(self.db_path).column(table_name, column_name)
+        except Exception:
+            profile = None
+        if profile is not None:
+            values.extend(str(v) for v, _ in profile.top_values)
+        values.extend(str(v) for v in catalog.sample_values(table_name, column_name))
+        return list(dict.fromkeys(values))
@@ -1,13 +1,124 @@
-import sqlite3, os, json
+import sqlite3, os, threading, time
 from pydantic import BaseModel, Field
-from typing import Any, Dict
+from typing import Any, Dict, Iterator, Optional
 from src.paths import DB_PATH
 from src.paths import CHROMA_DIR
 from crewai.tools import BaseTool
+from src.connection import get_pool
+from src.pagination import InvalidPageToken, decode_page_token, encode_page_token, page_limit
+from src.schema_repair import repair_and_execute
+from src.value_index import correct_literals
+from src.sql_validator import SQL_VALIDATION_ENABLED, validate_sql
+from src.query_plan import record_execution
+from src.telemetry import SQLITE_SECONDS, record_repair_attempts, span, text_attribute, traced_tool
 from pathlib import Path
 
 db_path = os.getenv("DB_PATH")  
 
+# Server-side cap on rows returned by one call, whatever the generated SQL selects.
+MAX_RESULT_ROWS = int(os.getenv("MAX_RESULT_ROWS", "1000"))
+# What the agents see of a result: enough rows to judge it, not to transcribe it.
+LLM_PREVIEW_ROWS = int(os.getenv("LLM_PREVIEW_ROWS", "5"))
+LLM_PREVIEW_CELL_CHARS = 200
+FETCH_BATCH_SIZE = 500
+
+# Per-query execution budget for generated SQL (0 disables a limit).
+QUERY_TIMEOUT_SECONDS = float(os.getenv("QUERY_TIMEOUT_SECONDS", "10"))
+QUERY_MAX_VM_STEPS = int(os.getenv("QUERY_MAX_VM_STEPS", "200000000"))
+QUERY_MAX_RESULT_BYTES = int(os.getenv("QUERY_MAX_RESULT_BYTES", str(32 * 1024 * 1024)))
+PROGRESS_INTERVAL = 10000   # VM instructions between budget checks
+
+# Structured error types returned when a budget stops a query, with a hint for the repair stage.
+BUDGET_ERRORS = {
+    "timeout": ("QueryTimeout",
+                "The query ran longer than the time budget. Add selective WHERE filters, make sure every "
+                "JOIN has an ON condition (no Cartesian products), or aggregate instead of listing rows."),
+    "vm_steps": ("QueryTooExpensive",
+                 "The query needed too much work to evaluate. Check for missing JOIN conditions, "
+                 "correlated subqueries over large tables, or unnecessary cross joins."),
+    "result_bytes": ("ResultTooLarge",
+                     "The result is too large. Select fewer columns or add a LIMIT."),
+    "cancelled": ("QueryCancelled",
+                  "The query was cancelled because the client went away."),
+}
+
+
+def _clip(value):
+    if isinstance(value, str) and len(value) > LLM_PREVIEW_CELL_CHARS:
+        return value[:LLM_PREVIEW_CELL_CHARS] + "…"
+    return value
+
+
+class BudgetExceeded(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class ExecutionBudget:
+    """
+    Interrupts a query via SQLite's progress handler once it exceeds its wall-clock
+    time, VM-instruction count, or is cancelled through `cancel_event`. Local
+    repair retries run under the same budget: the clock starts at the first
+    install and VM steps and result bytes accumulate.
+    """
+
+    def __init__(self, timeout_seconds: float = QUERY_TIMEOUT_SECONDS, max_vm_steps: int = QUERY_MAX_VM_STEPS,
+                 max_result_bytes: int = QUERY_MAX_RESULT_BYTES, cancel_event: Optional[threading.Event] = None):
+        self.timeout_seconds = timeout_seconds
+        self.max_vm_steps = max_vm_steps
+        self.max_result_bytes = max_result_bytes
+        self.cancel_event = cancel_event
+        self.reason = None
+        self.vm_steps = 0
+        self.result_bytes = 0
+        self._deadline = None
+
+    def _check(self) -> int:
+        self.vm_steps += PROGRESS_INTERVAL
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            self.reason = "cancelled"
+        elif self.max_vm_steps and self.vm_steps > self.max_vm_steps:
+            self.reason = "vm_steps"
+        elif self._deadline is not None and time.monotonic() > self._deadline:
+            self.reason = "timeout"
+        return 1 if self.reason else 0
+
+    def install(self, conn: sqlite3.Connection, use_deadline: bool = True) -> None:
+        if use_deadline and self.timeout_seconds and self._deadline is None:
+            self._deadline = time.monotonic() + self.timeout_seconds
+        conn.set_progress_handler(self._check, PROGRESS_INTERVAL)
+
+    @staticmethod
+    def uninstall(conn: sqlite3.Connection) -> None:
+        conn.set_progress_handler(None, 0)
+
+    def charge_rows(self, rows) -> None:
+        """Account for fetched rows against the result-size budget (rough, per-value estimate)."""
+        if not self.max_result_bytes:
+            return
+        for row in rows:
+            self.result_bytes += sum(len(v) if isinstance(v, (str, bytes)) else 8 for v in row)
+        if self.result_bytes > self.max_result_bytes:
+            self.reason = "result_bytes"
+            raise BudgetExceeded(self.reason)
+
+    def error_response(self, query: str) -> Dict[str, Any]:
+        error_type, hint = BUDGET_ERRORS[self.reason]
+        return {
+            "success": False,
+            "query": query,
+            "error_type": error_type,
+            "error_message": hint,
+            "budget": {
+                "timeout_seconds": self.timeout_seconds,
+                "max_vm_steps": self.max_vm_steps,
+                "max_result_bytes": self.max_result_bytes,
+                "vm_steps": self.vm_steps,
+            },
+        }
+
+
 class SQLExecutionTool(BaseTool):
     name: str = "sql_execution_tool"
     description: str = "Execute SQL queries against the database and return results or error information"
@@ -16,55 +127,160 @@ class SQLExecutionTool(BaseTool):
     class Config:
         arbitrary_types_allowed = True
 
-    def _run(self, query: str) -> Dict[str, Any]:
-        """Execute a SQL query and return results or errors in JSON format."""
+    @traced_tool
+    def _run(self, query: str, page_size: Optional[int] = None, page_token: Optional[str] = None,
+             include_total: bool = False) -> Dict[str, Any]:
+        """
+        Execute a SQL query for an agent: errors in full, results as a preview of
+        at most LLM_PREVIEW_ROWS rows with long values clipped. The API executes
+        the final SQL itself, so rows never have to pass through the LLM.
+        """
+        limit = min(page_size or LLM_PREVIEW_ROWS, LLM_PREVIEW_ROWS)
+        response = self.execute(query, page_size=limit, page_token=page_token, include_total=include_total)
+        if response.get("success") and "data" in response:
+            response["data"] = [
+                {k: _clip(v) for k, v in row.items()} for row in response["data"]
+            ]
+            response["preview"] = True
+            response.pop("next_page_token", None)
+        return response
 
-        # Check if the database file exists first
-        if not os.path.exists(self.db_path):
-            return {
-                "success": False,
-                "error_type": "ConnectionError",
-                "error_message": f"Database file '{self.db_path}' does not exist."
-            }
+    def execute(self, query: str, page_size: Optional[int] = None, page_token: Optional[str] = None,
+                include_total: bool = False, budget: Optional[ExecutionBudget] = None,
+                local_repair: bool = True) -> Dict[str, Any]:
+        """
+        Validate, then execute a SQL query; on a schema error first try the local resolver.
+
+        Validation (src/sql_validator.py) resolves every table, alias and column
+        against the catalog and compiles the SQL with EXPLAIN, so a bad query
+        fails without running and its response carries the full `validation`
+        report. "no such table/column" and "ambiguous column name" errors are
+        fixed against the real catalog and re-executed in-process (see
+        src/schema_repair.py); a SELECT that returns no rows has its literals
+        checked against the value index. A repaired success carries
+        `original_query` and `local_repairs`; otherwise the original result is
+        returned for the LLM repair agent. The original run and every local
+        retry share one ExecutionBudget, created here when the caller has none.
+        """
+        budget = budget or ExecutionBudget()
+        report = self._validate(query) if not page_token else None
+        if report is not None and not report.ok:
+            response = report.error_response(query)
+        else:
+            response = self._execute_once(query, page_size, page_token, include_total, budget)
+        if not local_repair or page_token:
+            return response
+        attempts = 0
+        if not response.get("success"):
+            attempts += 1
+            repaired, repairs = repair_and_execute(
+                query,
+                response.get("error_message", ""),
+                lambda sql: self._execute_once(sql, page_size, None, include_total, budget),
+                self.db_path,
+            )
+            if repaired is None:
+                record_repair_attempts("local", attempts)
+                return response
+            response = {**repaired, "original_query": query, "local_repairs": repairs}
+        if response.get("row_count") == 0 and response.get("query_type") == "SELECT":
+            attempts += 1
+            response = self._correct_values(response, page_size, include_total, budget)
+        record_repair_attempts("local", attempts)
+        return response
 
-        conn = None
+    def _validate(self, query: str):
+        if not SQL_VALIDATION_ENABLED:
+            return None
         try:
-            # Establish connection to the SQLite database
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+            with span("sqlite.validate", SQLITE_SECONDS, ("validate",), **{"db.system": "sqlite"}) as current:
+                report = validate_sql(query, self.db_path)
+                if current is not None:
+                    current.set_attribute("sql.valid", report.ok)
+                return report
+        except Exception:
+            return None            # e.g. missing DB file: let execution report it
 
-            # Try to execute the query
-            cursor.execute(query)
-            query_type = query.strip().upper().split()[0]
+    def _correct_values(self, response: Dict[str, Any], page_size, include_total,
+                        budget: Optional[ExecutionBudget] = None) -> Dict[str, Any]:
+        """
+        Zero rows: swap WHERE literals that don't exist in their column for the
+        same value in the column's own case (src/value_index.py) and keep the
+        result if it now returns rows. Near matches are only listed under
+        `value_suggestions`; the empty result stands.
+        """
+        sql = response["query"]
+        try:
+            corrected, fixes, suggestions = correct_literals(sql, self.db_path)
+        except Exception:
+            return response
+        if suggestions:
+            response = {**response, "value_suggestions": suggestions}
+        if not fixes:
+            return response
+        retried = self._execute_once(corrected, page_size, None, include_total, budget)
+        if not retried.get("success") or not retried.get("row_count"):
+            return response
+        return {
+            **retried,
+            "original_query": response.get("original_query", sql),
+            "local_repairs": response.get("local_repairs", []) + fixes,
+        }
 
-            # Handling SELECT queries
-            if query_type == 'SELECT':
-                rows = cursor.fetchall()
-                results = [dict(row) for row in rows]
-                column_names = [description[0] for description in cursor.description]
-                response = {
-                    "success": True,
-                    "query": query,
-                    "query_type": query_type,
-                    "row_count": len(results),
-                    "columns": column_names,
-                    "data": results
-                }
-            else:
-                # For non-SELECT queries
-                conn.commit()
-                rows_affected = cursor.rowcount
-                response = {
-                    "success": True,
-                    "query": query,
-                    "query_type": query_type,
-                    "rows_affected": rows_affected,
-                    "message": f"Query executed successfully. {rows_affected} row(s) affected."
-                }
+    def _execute_once(self, query: str, page_size: Optional[int] = None, page_token: Optional[str] = None,
+                      include_total: bool = False, budget: Optional[ExecutionBudget] = None) -> Dict[str, Any]:
+        """
+        Execute a SQL query under an ExecutionBudget and return results or errors.
+
+        Rows are read from the cursor in batches and at most `page_size` rows
+        (capped at MAX_RESULT_ROWS) are returned. When more exist, `has_more` is
+        set and `next_page_token` resumes after this page. `total_rows` is only
+        computed when `include_total` is set, by draining the rest of the cursor
+        without keeping the rows.
+
+        A query stopped by its budget returns `success: False` with an
+        `error_type` of QueryTimeout, QueryTooExpensive, ResultTooLarge or
+        QueryCancelled and a repair hint in `error_message`.
+        """
+        budget = budget or ExecutionBudget()
+
+        try:
+            limit = page_limit(page_size, MAX_RESULT_ROWS)
+            offset = decode_page_token(query, page_token, str(self.db_path)) if page_token else 0
 
+            started = time.perf_counter()
+            attributes = {"db.system": "sqlite", **text_attribute("db.query.text", query)}
+            with span("sqlite.query", SQLITE_SECONDS, ("query",), **attributes):
+                with get_pool(self.db_path).connection() as conn:
+                    budget.install(conn)
+                    try:
+                        response = self._execute_page(conn, query, offset, limit, include_total, budget)
+                    finally:
+                        budget.uninstall(conn)
+
+            if not offset and response.get("query_type") in ("SELECT", "WITH"):
+                # Plan + timing for the index advisor (src/query_plan.py)
+                record_execution(self.db_path, query, (time.perf_counter() - started) * 1000)
             return response
 
+        except BudgetExceeded:
+            return budget.error_response(query)
+
+        except InvalidPageToken as e:
+            return {
+                "success": False,
+                "query": query,
+                "error_type": "InvalidPageToken",
+                "error_message": str(e)
+            }
+
+        except FileNotFoundError:
+            return {
+                "success": False,
+                "error_type": "ConnectionError",
+                "error_message": f"Database file '{self.db_path}' does not exist."
+            }
+
         except sqlite3.Error as e:
             error_response = {
                 "success": False,
@@ -85,6 +301,92 @@ class SQLExecutionTool(BaseTool):
             }
             return error_response
 
-        finally:
-            if conn:
-                conn.close()
+    def _execute_page(self, conn, query: str, offset: int, limit: int, include_total: bool,
+                      budget: ExecutionBudget) -> Dict[str, Any]:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+
+        # Try to execute the query
+        try:
+            cursor.execute(query)
+            query_type = query.strip().upper().split()[0]
+
+            # Anything that yields rows (SELECT, WITH ..., PRAGMA) has a description
+            if cursor.description is None:
+                # Pooled connections are read-only, so this only covers no-op statements
+                rows_affected = cursor.rowcount
+                return {
+                    "success": True,
+                    "query": query,
+                    "query_type": query_type,
+                    "rows_affected": rows_affected,
+                    "message": f"Query executed successfully. {rows_affected} row(s) affected."
+                }
+
+            skipped = self._skip_rows(cursor, offset)
+            rows = cursor.fetchmany(limit + 1)
+            budget.charge_rows(rows)
+            has_more = len(rows) > limit
+            results = [dict(row) for row in rows[:limit]]
+            column_names = [description[0] for description in cursor.description]
+            response = {
+                "success": True,
+                "query": query,
+                "query_type": query_type,
+                "row_count": len(results),
+                "columns": column_names,
+                "data": results,
+                "offset": offset,
+                "has_more": has_more,
+                "next_page_token": encode_page_token(query, offset + limit, str(self.db_path)) if has_more else None,
+            }
+            if include_total:
+                remaining = self._skip_rows(cursor, float("inf"))
+                response["total_rows"] = skipped + len(rows) + remaining
+            return response
+        except sqlite3.OperationalError:
+            if budget.reason:
+                raise BudgetExceeded(budget.reason)
+            raise
+
+    @staticmethod
+    def _skip_rows(cursor, count) -> int:
+        """Advance the cursor by up to `count` rows without materializing them all."""
+        skipped = 0
+        while skipped < count:
+            batch = cursor.fetchmany(int(min(FETCH_BATCH_SIZE, count - skipped)))
+            if not batch:
+                break
+            skipped += len(batch)
+        return skipped
+
+    def iter_batches(self, query: str, batch_size: int = 500,
+                     budget: Optional[ExecutionBudget] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield a SELECT's result straight from the cursor in `batch_size` chunks.
+
+        The first item is {"columns": [...]}, then {"rows": [[...], ...]} per chunk.
+        Pooled connections allow cross-thread use, which streaming responses need
+        because each chunk is pulled from whichever worker thread is free.
+        The budget's VM-step limit, result-size limit and cancel event apply, but
+        not its wall-clock timeout, since time spent waiting on a slow client is
+        not query work. Raises BudgetExceeded when the budget stops the query.
+        """
+        budget = budget or ExecutionBudget()
+        with get_pool(self.db_path).connection() as conn:
+            budget.install(conn, use_deadline=False)
+            try:
+                cursor = conn.execute(query)
+                yield {"columns": [d[0] for d in cursor.description or []]}
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    budget.charge_rows(rows)
+                    yield {"rows": [list(row) for row in rows]}
+            except sqlite3.OperationalError:
+                if budget.reason:
+                    raise BudgetExceeded(budget.reason)
+                raise
+            finally:
+                budget.uninstall(conn)
@@ -0,0 +1,311 @@
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from src.catalog import get_catalog
+from src.column_profiler import get_profile
+from src.connection import get_pool, schema_hash
+from src.paths import VALUE_INDEX_DIR
+from src.schema_repair import get_resolver, similarity, table_aliases
+
+# Text columns with at most this many distinct values get indexed (names, not free text or ids)...
+VALUE_INDEX_MAX_DISTINCT = int(os.getenv("VALUE_INDEX_MAX_DISTINCT", "5000"))
+# ...and, on tables large enough for the ratio to mean something, only when values repeat:
+# near-unique columns there are identifiers. Small lookup tables (15 departments) are all unique.
+VALUE_INDEX_MAX_RATIO = float(os.getenv("VALUE_INDEX_MAX_RATIO", "0.5"))
+VALUE_INDEX_RATIO_MIN_ROWS = int(os.getenv("VALUE_INDEX_RATIO_MIN_ROWS", "1000"))
+# Identifier and personal-data columns are never indexed, whatever their cardinality.
+_IDENTIFIER_RE = re.compile(
+    r"(?:^|_)(?:id|uuid|guid|key|code|email|phone|mobile|fax|ssn|password|token|first_name|middle_name|last_name"
+    r"|address|street|line_\d+|zip|postcode)(?:$|_)",
+    re.IGNORECASE,
+)
+VALUE_MATCH_THRESHOLD = float(os.getenv("VALUE_MATCH_THRESHOLD", "0.6"))
+_TEXT_TYPES = ("CHAR", "TEXT", "CLOB", "STRING")
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+# `[alias.]column = 'literal'` and `[alias.]column IN ('a', 'b')`
+_EQUALS_RE = re.compile(r"(?:\b(\w+)\s*\.\s*)?\b(\w+)[`\"\]]?\s*==?\s*'((?:[^']|'')*)'", re.IGNORECASE)
+_IN_RE = re.compile(r"(?:\b(\w+)\s*\.\s*)?\b(\w+)[`\"\]]?\s+IN\s*\(([^()]*)\)", re.IGNORECASE)
+
+
+class LiteralCheck(NamedTuple):
+    table: str
+    column: str
+    value: str
+    start: int                     # span of the quoted literal in the SQL
+    end: int
+    found: bool
+    suggestions: List[Tuple[str, float]]
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _fts_phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _unique_columns(conn, table: str) -> set:
+    """Columns that are alone in a UNIQUE index or constraint."""
+    unique = set()
+    for row in conn.execute(f"PRAGMA index_list({_quote(table)});"):
+        if row[2]:
+            info = conn.execute(f"PRAGMA index_info({_quote(row[1])});").fetchall()
+            if len(info) == 1 and info[0][2]:
+                unique.add(info[0][2])
+    return unique
+
+
+def build_value_index(db_path, target: Path) -> int:
+    """
+    Write the sidecar index for `db_path` to `target`: an exact-lookup table and
+    an FTS5 trigram table over the distinct values of categorical text columns
+    (chosen from the column profile; keys, unique columns, identifier-named
+    columns and, on large tables, near-unique ones are skipped so identifiers
+    never reach prompts). Returns the value count.
+    """
+    catalog, profile = get_catalog(db_path), get_profile(db_path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    building = target.with_name(target.name + ".building")
+    building.unlink(missing_ok=True)
+    out = sqlite3.connect(str(building))
+    out.executescript("""
+        PRAGMA journal_mode = OFF;
+        PRAGMA synchronous = OFF;
+        CREATE TABLE members (tbl TEXT, col TEXT, folded TEXT, value TEXT, PRIMARY KEY (tbl, col, folded, value))
+            WITHOUT ROWID;
+        CREATE VIRTUAL TABLE fuzzy USING fts5(value, tbl UNINDEXED, col UNINDEXED, tokenize = 'trigram');
+    """)
+    total = 0
+    with get_pool(db_path).connection() as conn:
+        for table in catalog.tables.values():
+            unique = _unique_columns(conn, table.name)
+            for column in table.columns:
+                stats = profile.tables.get(table.name, {}).get(column.name)
+                if column.pk or column.name in unique or _IDENTIFIER_RE.search(column.name):
+                    continue
+                if stats is None or stats.distinct > VALUE_INDEX_MAX_DISTINCT:
+                    continue
+                if (table.row_count >= VALUE_INDEX_RATIO_MIN_ROWS
+                        and stats.distinct > VALUE_INDEX_MAX_RATIO * table.row_count):
+                    continue
+                if column.type and not any(t in column.type.upper() for t in _TEXT_TYPES):
+                    continue
+                values = [r[0] for r in conn.execute(
+                    f"SELECT DISTINCT {_quote(column.name)} FROM {_quote(table.name)} "
+                    f"WHERE typeof({_quote(column.name)}) = 'text' LIMIT {VALUE_INDEX_MAX_DISTINCT + 1};"
+                )]
+                if not values or len(values) > VALUE_INDEX_MAX_DISTINCT:
+                    continue
+                out.executemany("INSERT OR IGNORE INTO members VALUES (?, ?, ?, ?);",
+                                [(table.name, column.name, v.casefold(), v) for v in values])
+                out.executemany("INSERT INTO fuzzy (value, tbl, col) VALUES (?, ?, ?);",
+                                [(v, table.name, column.name) for v in values])
+                total += len(values)
+    out.commit()
+    out.close()
+    os.replace(building, target)
+    return total
+
+
+class ValueIndex:
+    """Read side of the sidecar index: membership checks and fuzzy suggestions for one DB version."""
+
+    def __init__(self, path: Path, version: str = ""):
+        self.path = path
+        self.version = version
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.columns = {
+            (t.lower(), c.lower()): (t, c)
+            for t, c in self._conn.execute("SELECT DISTINCT tbl, col FROM members;")
+        }
+
+    def indexed(self, table: str, column: str) -> Optional[Tuple[str, str]]:
+        """Real (table, column) names when the column is indexed, else None."""
+        return self.columns.get((table.lower(), column.lower()))
+
+    def contains(self, table: str, column: str, value: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM members WHERE tbl = ? AND col = ? AND folded = ? AND value = ?;",
+                (table, column, value.casefold(), value),
+            ).fetchone() is not None
+
+    def suggest(self, table: str, column: str, value: str, limit: int = 3) -> List[Tuple[str, float]]:
+        """Closest stored values: case-insensitive matches first, then trigram candidates re-scored."""
+        with self._lock:
+            candidates = [r[0] for r in self._conn.execute(
+                "SELECT value FROM members WHERE tbl = ? AND col = ? AND folded = ?;",
+                (table, column, value.casefold()),
+            )]
+            if candidates:
+                return [(v, 1.0) for v in candidates[:limit]]
+            grams = {value[i:i + 3] for i in range(len(value) - 2)}
+            if grams:
+                query = " OR ".join(_fts_phrase(g) for g in sorted(grams))
+                candidates = [r[0] for r in self._conn.execute(
+                    "SELECT value FROM fuzzy WHERE fuzzy MATCH ? AND tbl = ? AND col = ? ORDER BY rank LIMIT 25;",
+                    (query, table, column),
+                )]
+            else:
+                # Too short for trigrams: compare against the (small) full column.
+                candidates = [r[0] for r in self._conn.execute(
+                    "SELECT value FROM members WHERE tbl = ? AND col = ? LIMIT 500;", (table, column)
+                )]
+        scored = sorted(((similarity(value, c), c) for c in candidates), reverse=True)
+        return [(c, round(s, 3)) for s, c in scored[:limit] if s >= VALUE_MATCH_THRESHOLD]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+# (resolved DB path, schema hash) -> index for the latest data version built
+_indexes: Dict[Tuple[str, str], ValueIndex] = {}
+_indexes_lock = threading.Lock()
+_build_locks: Dict[Tuple[str, str], threading.Lock] = {}
+_refreshing: set = set()
+
+
+def _sidecar(index_dir, db_path, schema: str, version: str) -> Path:
+    path_key = hashlib.sha256(str(Path(db_path).resolve()).encode("utf-8")).hexdigest()[:12]
+    return Path(index_dir) / f"{path_key}-{schema[:12]}-{version}.sqlite"
+
+
+def _load(db_path, key: Tuple[str, str], version: str, index_dir) -> ValueIndex:
+    """Open (building if needed) the sidecar for `version`, swap it in and delete the files it supersedes."""
+    path = _sidecar(index_dir, db_path, key[1], version)
+    if not path.exists():
+        count = build_value_index(db_path, path)
+        print(f"🔤 Value index built: {count} values -> {path.name}")
+    index = ValueIndex(path, version)
+    with _indexes_lock:
+        old = _indexes.get(key)
+        _indexes[key] = index
+    if old is not None:
+        with old._lock:
+            old.close()
+    prefix = path.name.split("-", 1)[0] + "-"
+    for stale in path.parent.glob(prefix + "*.sqlite"):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    return index
+
+
+def _refresh(db_path, key: Tuple[str, str], version: str, index_dir) -> None:
+    try:
+        with _build_locks[key]:
+            _load(db_path, key, version, index_dir)
+    except Exception as e:
+        print(f"Value index refresh failed: {str(e)}")
+    finally:
+        with _indexes_lock:
+            _refreshing.discard(key)
+
+
+def get_value_index(db_path, index_dir=VALUE_INDEX_DIR) -> ValueIndex:
+    """
+    Index for the DB's current schema, built on first use. After a data write
+    the previous version keeps answering while a background thread rebuilds
+    it; only a new DB or schema builds inline (and only blocks that DB).
+    """
+    version = get_catalog(db_path).fingerprint
+    key = (str(Path(db_path).resolve()), schema_hash(db_path))
+    with _indexes_lock:
+        index = _indexes.get(key)
+        build_lock = _build_locks.setdefault(key, threading.Lock())
+        if index is not None and index.version != version and key not in _refreshing:
+            _refreshing.add(key)
+            threading.Thread(target=_refresh, args=(db_path, key, version, index_dir),
+                             name="value-index", daemon=True).start()
+    if index is not None:
+        return index
+    with build_lock:
+        with _indexes_lock:
+            index = _indexes.get(key)
+        return index if index is not None else _load(db_path, key, version, index_dir)
+
+
+def forget_value_indexes(db_path) -> None:
+    """Close the in-memory indexes for `db_path` (sidecar files stay for the next load)."""
+    resolved = str(Path(db_path).resolve())
+    with _indexes_lock:
+        keys = [key for key in _indexes if key[0] == resolved]
+        indexes = [_indexes.pop(key) for key in keys]
+    for index in indexes:
+        with index._lock:
+            index.close()
+
+
+def check_literals(sql: str, db_path) -> List[LiteralCheck]:
+    """Every string literal compared (=, IN) against an indexed column, with suggestions if absent."""
+    index = get_value_index(db_path)
+    if not index.columns:
+        return []
+    resolver = get_resolver(db_path)
+    aliases = table_aliases(sql, resolver)
+    query_tables = list(dict.fromkeys(aliases.values()))
+
+    def owner(qualifier: Optional[str], column: str) -> Optional[Tuple[str, str]]:
+        tables = [aliases.get(qualifier.lower())] if qualifier else query_tables
+        for table in tables:
+            found = table and index.indexed(table, column)
+            if found:
+                return found
+        return None
+
+    literals = []        # (qualifier, column, value, start, end)
+    for m in _EQUALS_RE.finditer(sql):
+        literals.append((m.group(1), m.group(2), m.group(3), m.start(3) - 1, m.end(3) + 1))
+    for m in _IN_RE.finditer(sql):
+        for lit in _STRING_RE.finditer(m.group(3)):
+            start = m.start(3) + lit.start()
+            literals.append((m.group(1), m.group(2), lit.group(0)[1:-1], start, start + len(lit.group(0))))
+
+    checks = []
+    for qualifier, column, raw, start, end in literals:
+        real = owner(qualifier, column)
+        if real is None:
+            continue
+        value = raw.replace("''", "'")
+        found = index.contains(real[0], real[1], value)
+        suggestions = [] if found else index.suggest(real[0], real[1], value)
+        checks.append(LiteralCheck(real[0], real[1], value, start, end, found, suggestions))
+    return checks
+
+
+def correct_literals(sql: str, db_path) -> Tuple[str, List[str], List[Dict[str, object]]]:
+    """
+    Replace literals absent from their column when the column holds exactly
+    that value in another case ('math' -> 'Math'). Fuzzy candidates are never
+    substituted, since an empty answer may be the right one; they come back as
+    suggestions. Returns (sql, descriptions, suggestions).
+    """
+    fixes, suggestions = [], []
+    for check in check_literals(sql, db_path):
+        if check.found or not check.suggestions:
+            continue
+        if check.suggestions[0][1] >= 1.0:
+            fixes.append(check)
+        else:
+            suggestions.append({"table": check.table, "column": check.column, "value": check.value,
+                                "suggested_values": [value for value, _ in check.suggestions]})
+    descriptions = []
+    for check in sorted(fixes, key=lambda c: c.start, reverse=True):
+        best = check.suggestions[0][0]
+        sql = sql[:check.start] + "'" + best.replace("'", "''") + "'" + sql[check.end:]
+        descriptions.append(f"value {check.table}.{check.column} '{check.value}' -> '{best}'")
+    return sql, descriptions[::-1], suggestions
+
+
+if __name__ == "__main__":
+    from src.paths import DB_PATH
+    target_db = sys.argv[1] if len(sys.argv) > 1 else DB_PATH
+    get_value_index(target_db)
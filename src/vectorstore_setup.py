@@ -1,107 +1,155 @@
 from pathlib import Path
-import sqlite3, shutil
-from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain_community.vectorstores import Chroma
+import sqlite3, shutil, hashlib, os
 
-from .paths import DB_PATH, SCHEMA_PATH, CHROMA_DIR
+from .paths import DB_PATH, SCHEMA_PATH, CHROMA_DIR, EXEMPLAR_DIR, EMBEDDING_CACHE_PATH
+from .catalog import get_catalog
+from .connection import db_fingerprint
+from .sql_loader import load_sql_dump
+from .telemetry import instrument_vectorstore
 from langchain.schema import Document
 
 
-# For embeddings
-from langchain_huggingface import HuggingFaceEmbeddings
-embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+# For embeddings (wrapped in a persistent cache so identical text is embedded once)
+from .embedding_cache import CachedEmbeddings
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+
+def load_embedding_model():
+    """Import and load the sentence-transformers model (torch import included)."""
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+
+
+embeddings = CachedEmbeddings(
+    load_embedding_model,
+    EMBEDDING_MODEL,
+    os.getenv("EMBEDDING_CACHE_PATH", str(EMBEDDING_CACHE_PATH)),
+    batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "64")),
+    lru_size=int(os.getenv("EMBEDDING_LRU_SIZE", "4096")),
+)
 
 # For vector store
 from langchain_chroma import Chroma
 
 
-def build_sqlite_db():
-    """Run schema.sql to (re)create the SQLite database."""
+def build_sqlite_db(force=False):
+    """Stream schema.sql into the SQLite database (skipped if already built from identical SQL)."""
     print("📦 (Re)creating SQLite database...")
-    if DB_PATH.exists():
-        DB_PATH.unlink()   # start fresh
-    conn = sqlite3.connect(DB_PATH)
-    with open(SCHEMA_PATH, "r", encoding="utf-8") as f:
-        conn.executescript(f.read())
-    conn.commit()
-    conn.close()
-
-def create_schema_documents() -> list:
-    """Extract table, column & sample rows into langchain Documents."""
-    conn   = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    docs   = []
-
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    for (table_name,) in cursor.fetchall():
-        cursor.execute(f"PRAGMA table_info({table_name});")
-        cols   = cursor.fetchall()
-        cursor.execute(f"SELECT * FROM {table_name} LIMIT 3;")
-        sample = cursor.fetchall()
-        cursor.execute(f"PRAGMA foreign_key_list({table_name});")
-        fks    = cursor.fetchall()
-
-        content = [f"Table: {table_name}", "\nColumns:"]
-        for col_id, col_name, col_type, notnull, dflt, pk in cols:
-            flags = []
-            if pk:       flags.append("PRIMARY KEY")
-            if notnull:  flags.append("NOT NULL")
-            if dflt:     flags.append(f"DEFAULT {dflt}")
-            flag_txt = f" [{' '.join(flags)}]" if flags else ""
-            content.append(f"- {col_name} ({col_type}){flag_txt}")
-
-        if fks:
-            content.append("\nForeign Keys:")
-            for fk in fks:
-                content.append(f"- {fk[3]} references {fk[2]}({fk[4]})")
-
-        if sample:
-            content.append("\nSample Data:")
-            heads = [c[1] for c in cols]
-            content.append(" | ".join(heads))
-            content.append("-" * (len(" | ".join(heads))))
-            for row in sample:
-                content.append(" | ".join(str(v) if v is not None else "NULL" for v in row))
-
-        docs.append(
-            Document(
-                page_content="\n".join(content),
-                metadata={"table": table_name, "type": "schema"}
-            )
+    stats = load_sql_dump(SCHEMA_PATH, DB_PATH, force=force)
+    if stats["skipped"]:
+        print("✅ Database already built from this schema.sql, skipping")
+    else:
+        print(f"✅ Loaded {stats['statements']} statements in {stats['seconds']:.2f}s")
+
+def create_schema_documents(db_path=DB_PATH) -> list:
+    """Render one langchain Document per table from the schema catalog."""
+    catalog = get_catalog(db_path)
+    return [
+        Document(
+            page_content=catalog.render_document(table_name),
+            metadata={"table": table_name, "type": "schema"}
         )
-    conn.close()
+        for table_name in catalog.tables
+    ]
+
+SQL_PATTERN_DOCS = [
+    Document("SELECT columns FROM table WHERE condition - Basic selection pattern",
+             metadata={"type": "sql_pattern"}),
+    Document("SELECT t1.*, t2.* FROM table1 t1 JOIN table2 t2 ON t1.id=t2.fk - Join pattern",
+             metadata={"type": "sql_pattern"}),
+]
+MANAGED_TYPES = {"schema", "sql_pattern"}
+
+# persist dir -> DB fingerprint the schema documents were last synced against
+_synced_fingerprints = {}
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def desired_documents(db_path=DB_PATH) -> dict:
+    """id -> Document for every schema/pattern doc the store should contain, hashed."""
+    docs = {}
+    for doc in create_schema_documents(db_path):
+        docs[f"schema:{doc.metadata['table']}"] = doc
+    for i, doc in enumerate(SQL_PATTERN_DOCS):
+        docs[f"sql_pattern:{i}"] = Document(doc.page_content, metadata=dict(doc.metadata))
+    for doc in docs.values():
+        doc.metadata["content_hash"] = content_hash(doc.page_content)
     return docs
 
+def sync_vector_store(store, db_path=DB_PATH, persist_dir=CHROMA_DIR) -> dict:
+    """
+    Bring the store's schema documents in line with the catalog.
+
+    Documents carry their content hash as metadata; only new or changed ones
+    are embedded and upserted, and documents for dropped tables (or legacy
+    documents without a hash) are deleted. Returns counts of each action.
+    """
+    desired = desired_documents(db_path)
+    existing = store.get(include=["metadatas"])
+    current = {}
+    stale_ids = []
+    for doc_id, meta in zip(existing["ids"], existing["metadatas"]):
+        meta = meta or {}
+        if meta.get("type") not in MANAGED_TYPES:
+            continue
+        if doc_id in desired and meta.get("content_hash"):
+            current[doc_id] = meta["content_hash"]
+        else:
+            stale_ids.append(doc_id)
+
+    changed = [doc_id for doc_id, doc in desired.items()
+               if current.get(doc_id) != doc.metadata["content_hash"]]
+    if stale_ids:
+        store.delete(ids=stale_ids)
+    if changed:
+        store.add_documents([desired[doc_id] for doc_id in changed], ids=changed)
+
+    _synced_fingerprints[str(persist_dir)] = db_fingerprint(db_path)
+    stats = {"upserted": len(changed), "deleted": len(stale_ids), "unchanged": len(desired) - len(changed)}
+    print(f"🔁 Schema store synced: {stats}")
+    return stats
+
+def ensure_vector_store_fresh(store, fingerprint: str = None, db_path=DB_PATH, persist_dir=CHROMA_DIR) -> bool:
+    """Re-sync if the DB changed since the last sync. Returns True when a sync ran."""
+    fingerprint = fingerprint or db_fingerprint(db_path)
+    if _synced_fingerprints.get(str(persist_dir)) == fingerprint:
+        return False
+    sync_vector_store(store, db_path, persist_dir)
+    return True
+
+def open_schema_store(db_path, persist_dir):
+    """Open (or create) the schema store for any database and sync it incrementally."""
+    store = instrument_vectorstore(Chroma(persist_directory=str(persist_dir), embedding_function=embeddings), "schema")
+    sync_vector_store(store, db_path, persist_dir)
+    return store
+
 def setup_vector_store(rebuild=False):
-    """Build or load the Chroma store."""
-    if CHROMA_DIR.exists() and not rebuild:
-        print("🔄 Reusing existing Chroma store")
-        return Chroma(persist_directory=str(CHROMA_DIR), embedding_function=embeddings)
-
-    # Start clean
-    if CHROMA_DIR.exists():
-        shutil.rmtree(CHROMA_DIR)
-
-    build_sqlite_db()
-    docs = create_schema_documents()
-
-    # add generic SQL patterns
-    docs.extend([
-        Document("SELECT columns FROM table WHERE condition - Basic selection pattern",
-                 metadata={"type": "sql_pattern"}),
-        Document("SELECT t1.*, t2.* FROM table1 t1 JOIN table2 t2 ON t1.id=t2.fk - Join pattern",
-                 metadata={"type": "sql_pattern"}),
-    ])
-
-    print("⚙️  Building Chroma store …")
-    store = Chroma.from_documents(
-        documents=docs,
-        embedding=embeddings,
-        persist_directory=str(CHROMA_DIR)
-    )
+    """
+    Load the Chroma store and incrementally sync it with the database schema.
+
+    `rebuild=True` recreates the SQLite database from schema.sql first; the
+    store itself is never wiped, only changed documents are re-embedded.
+    """
+    if rebuild or not DB_PATH.exists():
+        build_sqlite_db()
+
+    print("🔄 Opening Chroma store")
+    store = open_schema_store(DB_PATH, CHROMA_DIR)
     print("✅ Vector store ready")
     return store
 
+def setup_exemplar_store():
+    """Load (or create) the Chroma collection of verified question -> SQL exemplars."""
+    store = Chroma(
+        collection_name="sql_exemplars",
+        persist_directory=str(EXEMPLAR_DIR),
+        embedding_function=embeddings,
+    )
+    return instrument_vectorstore(store, "sql_exemplars")
+
 if __name__ == "__main__":
     setup_vector_store(rebuild=True)
 
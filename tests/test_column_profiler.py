@@ -0,0 +1,26 @@
+import pytest
+
+from src.column_profiler import HyperLogLog
+
+
+@pytest.mark.parametrize("n", [0, 10, 1000, 50000])
+def test_hyperloglog_estimate_is_close(n):
+    hll = HyperLogLog()
+    for i in range(n):
+        hll.add(f"value-{i}")
+    assert abs(hll.count() - n) <= max(2, 0.05 * n)
+
+
+def test_hyperloglog_ignores_duplicates():
+    hll = HyperLogLog()
+    for _ in range(20):
+        for i in range(300):
+            hll.add(i)
+    assert abs(hll.count() - 300) <= 15
+
+
+def test_hyperloglog_distinguishes_types():
+    hll = HyperLogLog()
+    hll.add(1)
+    hll.add("1")
+    assert hll.count() == 2
@@ -0,0 +1,31 @@
+from src.exemplar_store import ExemplarStore, question_literals, sql_string_literals
+
+
+def test_question_literals():
+    assert question_literals('Which students enrolled in 2019 in "Data Science" at Boston?') == {
+        "2019", "data science", "boston"}
+
+
+def test_sentence_initial_words_are_not_literals():
+    assert question_literals("How many courses are there? List them.") == set()
+
+
+def test_best_match_requires_same_literals():
+    store = ExemplarStore(vectorstore=None, threshold=0.9)
+    hits = [("How many students enrolled in 2019?", "SELECT 2019", 0.97)]
+    assert store.best_match("how many students enrolled in 2019", hits) == hits[0]
+    assert store.best_match("How many students enrolled in 2020?", hits) is None
+    assert store.best_match("How many students enrolled in 2019?", [(hits[0][0], "", 0.99)]) is None
+    assert store.best_match("How many students enrolled in 2019?", [(hits[0][0], "SELECT 1", 0.5)]) is None
+
+
+def test_best_match_requires_the_stored_sql_literals():
+    store = ExemplarStore(vectorstore=None, threshold=0.9)
+    hits = [("students in the math department",
+             "SELECT * FROM Students s JOIN Departments d ON 1 WHERE d.department_name = 'math'", 0.97)]
+    assert store.best_match("students in the math department?", hits) == hits[0]
+    assert store.best_match("students in the history department", hits) is None
+
+
+def test_sql_string_literals_strip_like_wildcards():
+    assert sql_string_literals("SELECT 1 WHERE a LIKE '%Data%' AND b = 'it''s' AND c = ''") == {"data", "it's"}
@@ -0,0 +1,35 @@
+from src.output_parser import extract_sql, parse_crew_output
+
+
+def test_prefers_fenced_block():
+    raw = "I'll select the rows with the highest grade:\n```sql\nSELECT * FROM Students\n```\nDone."
+    assert extract_sql(raw) == "SELECT * FROM Students"
+
+
+def test_skips_prose_containing_keywords():
+    raw = "Here are students with addresses. We select them:\nSELECT s.first_name FROM Students s"
+    assert extract_sql(raw) == "SELECT s.first_name FROM Students s"
+
+
+def test_cte_start():
+    raw = "With this plan in mind:\nWITH recent AS (SELECT 1 AS n) SELECT n FROM recent"
+    assert extract_sql(raw) == "WITH recent AS (SELECT 1 AS n) SELECT n FROM recent"
+
+
+def test_recursive_cte_with_column_list():
+    sql = "WITH RECURSIVE c(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM c WHERE n < 3) SELECT n FROM c"
+    assert extract_sql(sql) == sql
+
+
+def test_sql_after_label():
+    assert extract_sql("SQL: select course_name from Courses") == "select course_name from Courses"
+
+
+def test_plain_text_is_returned_stripped():
+    assert extract_sql("  no query here  ") == "no query here"
+
+
+def test_parse_crew_output_accepts_fenced_json_and_python_literals():
+    assert parse_crew_output('```json\n{"success": true}\n```') == {"success": True}
+    assert parse_crew_output("{'success': True, 'query': None}") == {"success": True, "query": None}
+    assert parse_crew_output("not json") == "not json"
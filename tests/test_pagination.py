@@ -0,0 +1,63 @@
+import base64
+import json
+
+import pytest
+
+from src.pagination import InvalidPageToken, decode_page_token, encode_page_token, page_limit
+from src.paths import DB_PATH
+
+QUERY = "SELECT address_id FROM Addresses ORDER BY address_id"
+
+
+def test_page_token_round_trip():
+    token = encode_page_token(QUERY, 40)
+    assert decode_page_token(QUERY, token) == 40
+    assert decode_page_token(f"  {QUERY}\n", token) == 40
+
+
+def test_page_token_is_bound_to_its_query():
+    with pytest.raises(InvalidPageToken):
+        decode_page_token("SELECT * FROM Students", encode_page_token(QUERY, 40))
+
+
+@pytest.mark.parametrize("payload", [
+    {"o": 0, "s": "0" * 64},                 # forged signature
+    {"o": 40},                               # unsigned
+])
+def test_page_token_rejects_forgeries(payload):
+    token = base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")
+    with pytest.raises(InvalidPageToken):
+        decode_page_token(QUERY, token)
+
+
+def test_page_token_rejects_tampered_offset():
+    payload = json.loads(base64.urlsafe_b64decode(encode_page_token(QUERY, 40)))
+    payload["o"] = 0
+    token = base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")
+    with pytest.raises(InvalidPageToken):
+        decode_page_token(QUERY, token)
+
+
+def test_page_token_is_bound_to_its_database():
+    token = encode_page_token(QUERY, 40, "/data/a.sqlite")
+    assert decode_page_token(QUERY, token, "/data/a.sqlite") == 40
+    with pytest.raises(InvalidPageToken):
+        decode_page_token(QUERY, token, "/data/b.sqlite")
+
+
+def test_page_token_rejects_garbage():
+    with pytest.raises(InvalidPageToken):
+        decode_page_token(QUERY, "not a token")
+
+
+@pytest.mark.parametrize("page_size, rows", [(None, 100), (-5, 1), (0, 100), (7, 7), (500, 100)])
+def test_page_limit_clamps_to_one_through_maximum(page_size, rows):
+    assert page_limit(page_size, 100) == rows
+
+
+@pytest.mark.skipif(not DB_PATH.exists(), reason="bundled database missing")
+def test_pages_follow_their_token():
+    tool = pytest.importorskip("src.tools.sql_execution_tool").SQLExecutionTool(db_path=str(DB_PATH))
+    first = tool._execute_once(QUERY, page_size=4)
+    second = tool._execute_once(QUERY, page_size=4, page_token=first["next_page_token"])
+    assert [r["address_id"] for r in first["data"] + second["data"]] == list(range(1, 9))
@@ -0,0 +1,69 @@
+import pytest
+
+from src.schema_repair import IdentifierResolver, _stem, propose_fix, similarity
+
+
+@pytest.mark.parametrize("plural, singular", [
+    ("students", "student"),
+    ("courses", "course"),
+    ("addresses", "address"),
+    ("categories", "category"),
+    ("boxes", "box"),
+    ("matches", "match"),
+])
+def test_stem_plurals(plural, singular):
+    assert _stem(plural) == _stem(singular) == singular
+
+
+@pytest.mark.parametrize("word", ["address", "status", "analysis", "class"])
+def test_stem_keeps_singular_s_endings(word):
+    assert _stem(word) == word
+
+
+def test_similarity_treats_plural_and_underscores_as_near_equal():
+    assert similarity("Address", "Addresses") == 0.95
+    assert similarity("first_name", "firstname") == 0.95
+    assert similarity("Students", "students") == 1.0
+
+
+@pytest.fixture
+def resolver():
+    return IdentifierResolver(
+        {
+            "Students": ["student_id", "first_name", "current_address_id"],
+            "Addresses": ["address_id", "city"],
+            "Student_Enrolment": ["student_enrolment_id", "student_id"],
+        },
+        {"Students": [("current_address_id", "Addresses", "address_id")]},
+    )
+
+
+def test_fixes_misspelled_table(resolver):
+    assert propose_fix("SELECT city FROM Address", "no such table: Address", resolver) == (
+        "SELECT city FROM Addresses", "table Address -> Addresses")
+
+
+def test_fixes_misspelled_column_but_not_string_literals(resolver):
+    sql, description = propose_fix("SELECT firstname FROM Students WHERE first_name != 'firstname'",
+                                   "no such column: firstname", resolver)
+    assert sql == "SELECT first_name FROM Students WHERE first_name != 'firstname'"
+    assert description == "column firstname -> first_name"
+
+
+def test_moves_column_to_the_alias_that_has_it(resolver):
+    sql, _ = propose_fix("SELECT s.city FROM Students s JOIN Addresses a ON a.address_id = s.current_address_id",
+                         "no such column: s.city", resolver)
+    assert sql.startswith("SELECT a.city FROM")
+
+
+def test_qualifies_ambiguous_column(resolver):
+    sql, description = propose_fix(
+        "SELECT student_id FROM Students s JOIN Student_Enrolment e ON e.student_id = s.student_id",
+        "ambiguous column name: student_id", resolver)
+    assert sql.startswith("SELECT s.student_id FROM")
+    assert description == "column student_id -> s.student_id"
+
+
+def test_no_fix_for_unrelated_errors(resolver):
+    assert propose_fix("SELECT 1", "near \"SELEC\": syntax error", resolver) is None
+    assert propose_fix("SELECT zzz FROM Students", "no such column: zzz", resolver) is None
@@ -0,0 +1,36 @@
+from src.sql_loader import iter_statements
+
+
+def split(text, chunk_size=None):
+    if chunk_size:
+        chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+    else:
+        chunks = [text]
+    return [s.strip() for s in iter_statements(chunks)]
+
+
+def test_splits_on_top_level_semicolons():
+    assert split("CREATE TABLE a (x);INSERT INTO a VALUES (1);") == ["CREATE TABLE a (x);", "INSERT INTO a VALUES (1);"]
+
+
+def test_ignores_semicolons_in_strings_identifiers_and_comments():
+    text = "INSERT INTO \"t;1\" VALUES ('a;b', 'it''s;');\n-- c;\n/* d; */ SELECT 1;"
+    assert split(text) == ["INSERT INTO \"t;1\" VALUES ('a;b', 'it''s;');", "-- c;\n/* d; */ SELECT 1;"]
+
+
+def test_chunk_boundaries_do_not_matter():
+    text = "INSERT INTO t VALUES ('x;y'); -- note;\nINSERT INTO t VALUES (2); /* z; */"
+    expected = split(text)
+    for size in (1, 2, 3, 7):
+        assert split(text, size) == expected
+
+
+def test_trigger_body_is_one_statement():
+    text = "CREATE TRIGGER tr AFTER INSERT ON t BEGIN UPDATE t SET x = 1; DELETE FROM u; END; SELECT 1;"
+    assert split(text) == ["CREATE TRIGGER tr AFTER INSERT ON t BEGIN UPDATE t SET x = 1; DELETE FROM u; END;",
+                           "SELECT 1;"]
+
+
+def test_unterminated_tail_is_yielded_but_empty_statements_are_not():
+    assert split(";;SELECT 1;  SELECT 2") == ["SELECT 1;", "SELECT 2"]
+    assert split("SELECT 1; -- only a comment") == ["SELECT 1;"]
@@ -0,0 +1,95 @@
+import pytest
+
+from src.paths import DB_PATH
+from src.sql_validator import collect_references, tokenize, validate_sql
+
+
+def unqualified(sql):
+    return [t.name for t in collect_references(sql).unqualified]
+
+
+def test_tokenize_skips_comments_and_keeps_strings_whole():
+    tokens = tokenize("SELECT 'a;b' -- trailing\nFROM t /* block */")
+    assert [(t.kind, t.text) for t in tokens] == [
+        ("keyword", "SELECT"), ("string", "'a;b'"), ("keyword", "FROM"), ("name", "t"),
+    ]
+
+
+def test_tokenize_unquotes_identifiers():
+    tokens = tokenize('SELECT "first ""x"" name", `b`, [c d] FROM t')
+    assert [t.name for t in tokens if t.kind == "quoted"] == ['first "x" name', "b", "c d"]
+
+
+def test_table_and_column_aliases():
+    r = collect_references("SELECT s.first_name AS name, COUNT(*) total FROM Students AS s JOIN Addresses a ON a.address_id = s.current_address_id")
+    assert r.tables == {"students": "Students", "s": "Students", "addresses": "Addresses", "a": "Addresses"}
+    assert r.aliases == {"name", "total"}
+    assert ("s", "first_name") in r.qualified and ("a", "address_id") in r.qualified
+    assert r.unqualified == []
+
+
+def test_cte_names_are_derived_tables():
+    r = collect_references("WITH recent(id) AS (SELECT student_id FROM Students), other AS (SELECT 1) SELECT id FROM recent, other")
+    assert {"recent", "other"} <= r.derived
+
+
+def test_subquery_alias_is_derived():
+    assert "sub" in collect_references("SELECT sub.n FROM (SELECT COUNT(*) AS n FROM Students) sub").derived
+
+
+def test_window_names_and_partition_columns():
+    r = collect_references("SELECT SUM(x) OVER w AS k, RANK() OVER (PARTITION BY p) FROM t WINDOW w AS (ORDER BY y)")
+    assert "w" in r.derived
+    assert unqualified("SELECT RANK() OVER (PARTITION BY p ORDER BY q) FROM t") == ["p", "q"]
+
+
+def test_cast_type_is_not_a_column():
+    assert unqualified("SELECT CAST(course_id AS INTEGER) FROM Courses") == ["course_id"]
+
+
+def test_schema_qualified_column():
+    assert collect_references("SELECT main.Students.first_name FROM main.Students").qualified == [("Students", "first_name")]
+
+
+@pytest.mark.skipif(not DB_PATH.exists(), reason="bundled database missing")
+def test_validate_accepts_valid_query():
+    report = validate_sql("SELECT s.first_name FROM Students s WHERE s.student_id = 1", DB_PATH)
+    assert report.ok
+    assert report.tables == ["Students"]
+
+
+@pytest.mark.skipif(not DB_PATH.exists(), reason="bundled database missing")
+@pytest.mark.parametrize("sql", [
+    "WITH recent AS (SELECT student_id AS sid FROM Students) SELECT sid FROM recent",
+    "WITH recent(sid) AS (SELECT student_id FROM Students) SELECT r.sid FROM recent r",
+])
+def test_validate_accepts_cte_columns(sql):
+    report = validate_sql(sql, DB_PATH)
+    assert report.ok and not report.warnings
+
+
+@pytest.mark.skipif(not DB_PATH.exists(), reason="bundled database missing")
+def test_validate_suggests_close_names():
+    report = validate_sql("SELECT first_nam FROM Student", DB_PATH)
+    assert not report.ok
+    suggestions = {e["kind"]: e["suggestion"] for e in report.to_dict()["errors"]}
+    assert suggestions["unknown_table"] == "Students"
+
+
+@pytest.mark.skipif(not DB_PATH.exists(), reason="bundled database missing")
+def test_validate_double_quoted_string_suggests_single_quotes():
+    report = validate_sql('SELECT city FROM Addresses WHERE city = "Port Chelsea"', DB_PATH)
+    findings = report.to_dict()["errors"] + report.to_dict()["warnings"]
+    assert {"kind": "unknown_column", "name": "Port Chelsea"}.items() <= findings[0].items()
+    assert findings[0]["suggestion"] == "'Port Chelsea'"
+
+
+@pytest.mark.skipif(not DB_PATH.exists(), reason="bundled database missing")
+def test_validate_rejects_multiple_statements():
+    report = validate_sql("SELECT 1; DELETE FROM Students;", DB_PATH)
+    assert [e["kind"] for e in report.to_dict()["errors"]] == ["multiple_statements"]
+
+
+@pytest.mark.skipif(not DB_PATH.exists(), reason="bundled database missing")
+def test_validate_allows_trailing_semicolon_and_comment():
+    assert validate_sql("SELECT course_name FROM Courses; -- done", DB_PATH).ok
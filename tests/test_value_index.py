@@ -0,0 +1,31 @@
+import pytest
+
+from src.paths import DB_PATH
+from src.value_index import correct_literals, get_value_index
+
+pytestmark = pytest.mark.skipif(not DB_PATH.exists(), reason="bundled database missing")
+
+
+def test_small_lookup_tables_are_indexed():
+    columns = set(get_value_index(DB_PATH).columns.values())
+    assert {("Departments", "department_name"), ("Semesters", "semester_name"),
+            ("Courses", "course_name")} <= columns
+
+
+def test_identifier_columns_are_not_indexed():
+    index = get_value_index(DB_PATH)
+    for column in ("student_id", "email_address", "ssn", "cell_mobile_number", "first_name"):
+        assert index.indexed("Students", column) is None
+
+
+def test_case_mismatch_is_corrected():
+    sql, fixes, _ = correct_literals("SELECT department_id FROM Departments WHERE department_name = 'Math'", DB_PATH)
+    assert sql == "SELECT department_id FROM Departments WHERE department_name = 'math'"
+    assert fixes == ["value Departments.department_name 'Math' -> 'math'"]
+
+
+def test_near_miss_is_only_suggested():
+    sql = "SELECT department_id FROM Departments WHERE department_name = 'histroy'"
+    corrected, fixes, suggestions = correct_literals(sql, DB_PATH)
+    assert corrected == sql and fixes == []
+    assert "history" in suggestions[0]["suggested_values"]
@@ -1,15 +1,36 @@
-
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import Optional
+import asyncio
+import functools
+import json
 import logging
-from fastapi import FastAPI
-from src.initializer import complete_crew  # your Crew setup
-
+import os
+import threading
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
+from starlette.concurrency import run_in_threadpool
 
-# Import your existing crew
-from src.initializer import complete_crew
+# Import your existing crew (components are built lazily; see warm_up below)
+from src.initializer import get_exemplar_store, startup_phases, warm_up
+from src.db_registry import UnknownDatabase, registry
+from src.vectorstore_setup import embeddings
+from src.crew_factory import CREW_STAGES, LITE_STAGES, crew_inputs
+from src.answer_cache import AnswerCache
+from src.concurrency import CrewLimiter, QueueFullError, QueueTimeoutError
+from src.connection import db_fingerprint, schema_hash
+from src.output_parser import extract_sql, parse_crew_output
+from src.paths import ANSWER_CACHE_PATH
+from src.query_plan import advise, get_query_log
+from src.retrieval_context import retrieval_scope
+from src.tools.sql_execution_tool import MAX_RESULT_ROWS, BudgetExceeded, ExecutionBudget
+from src.result_encoding import UnsupportedFormat, encode_result, wants_format
+from src.telemetry import (MetricsUnavailable, crew_scope, record_cache, render_metrics, shutdown_tracing,
+                           text_attribute)
 
-# Configure logging 
+# Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -19,9 +40,36 @@ app = FastAPI(
     version="1.0.0",
 )
 
+answer_cache = AnswerCache(
+    os.getenv("ANSWER_CACHE_PATH", str(ANSWER_CACHE_PATH)),
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000")),
+    ttl_seconds=int(os.getenv("ANSWER_CACHE_TTL", str(7 * 24 * 3600))),
+)
+
+crew_limiter = CrewLimiter(
+    max_concurrent=int(os.getenv("CREW_MAX_CONCURRENT", "4")),
+    max_queue=int(os.getenv("CREW_MAX_QUEUE", "16")),
+    queue_timeout=float(os.getenv("CREW_QUEUE_TIMEOUT", "60")),
+)
+
 
 class QueryRequest(BaseModel):
     query: str
+    db_id: Optional[str] = None      # uploaded database (src/db_registry.py); None = bundled DB
+
+
+class PageRequest(BaseModel):
+    query: str
+    db_id: Optional[str] = None
+    page_token: str = Field(..., min_length=1)     # signed `next_page_token` from a response for this query
+    page_size: Optional[int] = Field(None, ge=1, le=MAX_RESULT_ROWS)
+    include_total: bool = False
+
+
+class InvalidateRequest(BaseModel):
+    query: Optional[str] = None
+    db_id: Optional[str] = None
+    all_databases: bool = False
 
 
 # Allow frontend access (for Streamlit)
@@ -32,11 +80,420 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def _encoded_response(result, http_request: Request, format: Optional[str]):
+    """
+    Content-negotiated result: Arrow IPC, compact columns JSON or plain JSON
+    (Accept header or ?format=arrow|columns|json), gzip/zstd per Accept-Encoding.
+    """
+    try:
+        body, media_type, encoding = encode_result(
+            result,
+            wants_format(http_request.headers.get("accept"), format),
+            http_request.headers.get("accept-encoding"),
+        )
+    except UnsupportedFormat as e:
+        return JSONResponse(status_code=406, content={"error": str(e)})
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+async def _execute_cancellable(http_request: Request, database, sql: str, **kwargs):
+    """Run `sql` in the threadpool and interrupt it if the client disconnects meanwhile."""
+    cancel = threading.Event()
+    job = asyncio.ensure_future(
+        run_in_threadpool(database.sql_execution_tool.execute, sql, budget=ExecutionBudget(cancel_event=cancel), **kwargs)
+    )
+    while not job.done():
+        await asyncio.wait({job}, timeout=0.25)
+        if not job.done() and await http_request.is_disconnected():
+            cancel.set()
+    return job.result()
+
+
+def _db_keys(db_path):
+    """(fingerprint, schema hash): the answer cache follows data versions, exemplars only the schema."""
+    schema = schema_hash(db_path)
+    return db_fingerprint(db_path, schema), schema
+
+
+def _lookup_known_sql(user_query: str, fingerprint: str, schema: str):
+    """
+    Find SQL that already answers this question, cheapest source first.
+
+    Returns (sql, source, examples): the answer cache, then an exemplar that
+    `ExemplarStore.best_match` accepts (similar enough and the same literals);
+    otherwise sql is None and `examples` holds the top-k exemplars as few-shot
+    context for the crew.
+    """
+    sql = answer_cache.get(user_query, fingerprint)
+    if sql is not None:
+        return sql, "cache", None
+    exemplar_store = get_exemplar_store()
+    hits = exemplar_store.search(user_query, schema)
+    match = exemplar_store.best_match(user_query, hits)
+    if match is not None:
+        record_cache("exemplar", hits=1)
+        return match[1], "exemplar", None
+    record_cache("exemplar", misses=1)
+    return None, None, exemplar_store.few_shot_context(hits)
+
+
+def _few_shot_examples(user_query: str, schema: str) -> str:
+    exemplar_store = get_exemplar_store()
+    return exemplar_store.few_shot_context(exemplar_store.search(user_query, schema))
+
+
+def _remember(user_query: str, fingerprint: str, schema: str, sql: str, latency: float = 0.0):
+    """Cache SQL that executed successfully and keep it as a verified exemplar."""
+    answer_cache.put(user_query, fingerprint, sql, latency=latency)
+    get_exemplar_store().add(user_query, sql, schema)
+
+
+async def _run_lite(http_request: Request, database, user_query: str, examples: str, decision,
+                    page_size: Optional[int] = None):
+    """
+    Lite path: one LLM call writes the SQL, which is then executed directly
+    (interrupted if the client disconnects, like the full path).
+
+    Returns (sql, result); result is None when the caller should fall back to
+    the full pipeline (LLM failure or SQL that does not execute).
+    """
+    try:
+        with crew_scope("lite", LITE_STAGES, **text_attribute("crew.question", user_query)) as run:
+            output = await database.create_lite_crew().kickoff_async(
+                inputs=crew_inputs(user_query, examples, decision.schema_context)
+            )
+            run.record_usage(output)
+    except Exception as e:
+        logger.warning("Lite path failed for %r, falling back: %s", user_query, e)
+        return None, None
+    sql = extract_sql(output.raw)
+    result = await _execute_cancellable(http_request, database, sql, page_size=page_size)
+    if not result.get("success"):
+        logger.info("Lite SQL failed for %r (%s), falling back", user_query, result.get("error_message"))
+        return sql, None
+    return sql, result
+
+
+async def _kickoff(crew, inputs: dict):
+    """Run the full crew (traced per task) with vector searches memoized across its agents and tools."""
+    with crew_scope("full", CREW_STAGES, **text_attribute("crew.question", inputs.get("user_query"))) as run:
+        with retrieval_scope() as retrieval:
+            result = await crew.kickoff_async(inputs=inputs)
+        run.record_usage(result)
+    logger.info("Retrieval memo for %r: %s", inputs.get("user_query"), retrieval.stats)
+    return result
+
+
 @app.post("/query")
-def handle_query(request: QueryRequest):
+async def handle_query(request: QueryRequest, http_request: Request, format: Optional[str] = None):
+    user_query = request.query.strip()
     try:
-        result = complete_crew.kickoff(inputs={"user_query": request.query.strip()})
-        return result.raw
+        database = registry.get(request.db_id)
+        fingerprint, schema = await run_in_threadpool(_db_keys, database.db_path)
+        await run_in_threadpool(database.ensure_fresh)
+        known_sql, source, examples = await run_in_threadpool(_lookup_known_sql, user_query, fingerprint, schema)
+        if known_sql is not None:
+            result = await _execute_cancellable(http_request, database, known_sql)
+            if result.get("success"):
+                logger.info("Answered %r from %s without agents", user_query, source)
+                return _encoded_response({**result, "cached": True, "source": source}, http_request, format)
+            if source == "cache":
+                # The stored SQL no longer runs (e.g. data-only change); fall through.
+                answer_cache.invalidate(fingerprint, user_query)
+            examples = await run_in_threadpool(
+                lambda: _few_shot_examples(user_query, schema)
+            )
+
+        router = await run_in_threadpool(lambda: database.router)
+        decision = await run_in_threadpool(router.route, user_query)
+        async with crew_limiter.slot():
+            started = time.perf_counter()
+            if decision.path == "lite":
+                lite_sql, lite_result = await _run_lite(http_request, database, user_query, examples, decision)
+                if lite_result is not None:
+                    elapsed = time.perf_counter() - started
+                    router.record("lite", elapsed)
+                    await run_in_threadpool(_remember, user_query, fingerprint, schema, lite_sql, elapsed)
+                    return _encoded_response({**lite_result, "route": "lite"}, http_request, format)
+            crew = await run_in_threadpool(database.create_crew)
+            result = await _kickoff(crew, crew_inputs(user_query, examples))
+            elapsed = time.perf_counter() - started
+            router.record("full", elapsed, fell_back=decision.path == "lite")
+
+        parsed = parse_crew_output(result.raw)
+        if not (isinstance(parsed, dict) and parsed.get("success") and parsed.get("query")):
+            return _encoded_response(parsed, http_request, format)
+        # The crew only returns the final SQL; rows come from the normal execution path.
+        executed = await _execute_cancellable(http_request, database, parsed["query"])
+        if executed.get("success"):
+            await run_in_threadpool(_remember, user_query, fingerprint, schema, executed["query"], elapsed)
+        return _encoded_response(executed, http_request, format)
+    except UnknownDatabase as e:
+        return JSONResponse(status_code=404, content={"error": f"Unknown db_id {e}"})
+    except QueueFullError as e:
+        return JSONResponse(status_code=429, content={"error": f"Server busy: {e}"}, headers={"Retry-After": "5"})
+    except QueueTimeoutError as e:
+        return JSONResponse(status_code=503, content={"error": f"Server busy: {e}"}, headers={"Retry-After": "5"})
     except Exception as e:
         return {"error": str(e)}
 
+
+# Task order in src/crew_factory.build_crew; one SSE "stage" event per task.
+STAGES = ["refined_question", "semantic_plan", "generated_sql", "execution"]
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def _stream_rows(database, sql: str, on_done=None):
+    """
+    SSE events for `sql`'s result, read from the SQLite cursor chunk by chunk.
+    If the client disconnects the generator is closed and the query interrupted.
+    `on_done` runs in the threadpool once every row has been sent.
+    """
+    row_count = 0
+    budget = ExecutionBudget(cancel_event=threading.Event())
+    try:
+        async for batch in iterate_in_threadpool(database.sql_execution_tool.iter_batches(sql, STREAM_BATCH_SIZE, budget)):
+            if "columns" in batch:
+                yield _sse("columns", batch)
+            else:
+                row_count += len(batch["rows"])
+                yield _sse("rows", batch)
+        yield _sse("done", {"row_count": row_count})
+        if on_done is not None:
+            await run_in_threadpool(on_done)
+    except BudgetExceeded:
+        response = budget.error_response(sql)
+        yield _sse("error", {"error": response["error_message"], **response})
+    finally:
+        budget.cancel_event.set()
+
+
+@app.post("/query/stream")
+async def stream_query(request: QueryRequest, http_request: Request):
+    """
+    Server-sent events: `stage` per finished task, `sql` once the final query
+    is known, then `columns`, `rows` chunks and `done` (or `error`).
+    """
+    user_query = request.query.strip()
+
+    async def events():
+        try:
+            database = registry.get(request.db_id)
+            fingerprint, schema = await run_in_threadpool(_db_keys, database.db_path)
+            await run_in_threadpool(database.ensure_fresh)
+            final_sql, source, examples = await run_in_threadpool(_lookup_known_sql, user_query, fingerprint, schema)
+            on_done = None
+            if final_sql is not None:
+                yield _sse("sql", {"query": final_sql, "cached": True, "source": source})
+            else:
+                loop = asyncio.get_running_loop()
+                stage_events: asyncio.Queue = asyncio.Queue()
+
+                def on_task_done(output):
+                    loop.call_soon_threadsafe(stage_events.put_nowait, output)
+
+                router = await run_in_threadpool(lambda: database.router)
+                decision = await run_in_threadpool(router.route, user_query)
+                lite_result = None
+                async with crew_limiter.slot():
+                    started = time.perf_counter()
+                    if decision.path == "lite":
+                        # Validate on one row; the full result is streamed below.
+                        final_sql, lite_result = await _run_lite(
+                            http_request, database, user_query, examples, decision, page_size=1
+                        )
+                    if lite_result is not None:
+                        elapsed = time.perf_counter() - started
+                        router.record("lite", elapsed)
+                    else:
+                        crew = await run_in_threadpool(database.create_crew, on_task_done)
+                        job = asyncio.ensure_future(_kickoff(crew, crew_inputs(user_query, examples)))
+                        stage_index = 0
+                        while not (job.done() and stage_events.empty()):
+                            getter = asyncio.ensure_future(stage_events.get())
+                            await asyncio.wait({getter, job}, return_when=asyncio.FIRST_COMPLETED)
+                            if not getter.done():
+                                getter.cancel()
+                                continue
+                            output = getter.result()
+                            stage = STAGES[stage_index] if stage_index < len(STAGES) else f"stage_{stage_index}"
+                            stage_index += 1
+                            yield _sse("stage", {"stage": stage, "output": output.raw})
+                        result = job.result()
+                        elapsed = time.perf_counter() - started
+                        router.record("full", elapsed, fell_back=decision.path == "lite")
+
+                if lite_result is not None:
+                    source = "lite"
+                    yield _sse("stage", {"stage": "generated_sql", "output": final_sql})
+                else:
+                    parsed = parse_crew_output(result.raw)
+                    if not (isinstance(parsed, dict) and parsed.get("success") and parsed.get("query")):
+                        yield _sse("error", {"error": parsed if isinstance(parsed, str) else result.raw})
+                        return
+                    source = "crew"
+                    final_sql = parsed["query"]
+                # Remembered only once the whole result has streamed without error.
+                on_done = functools.partial(_remember, user_query, fingerprint, schema, final_sql, elapsed)
+                yield _sse("sql", {"query": final_sql, "cached": False, "source": source})
+
+            async for event in _stream_rows(database, final_sql, on_done):
+                yield event
+        except UnknownDatabase as e:
+            yield _sse("error", {"error": f"Unknown db_id {e}"})
+        except (QueueFullError, QueueTimeoutError) as e:
+            yield _sse("error", {"error": f"Server busy: {e}"})
+        except Exception as e:
+            yield _sse("error", {"error": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/query/page")
+async def fetch_page(request: PageRequest, http_request: Request, format: Optional[str] = None):
+    """Fetch another page of a query returned by /query, using its `next_page_token`."""
+    try:
+        database = registry.get(request.db_id)
+        result = await _execute_cancellable(
+            http_request,
+            database,
+            request.query,
+            page_size=request.page_size,
+            page_token=request.page_token,
+            include_total=request.include_total,
+        )
+        return _encoded_response(result, http_request, format)
+    except UnknownDatabase as e:
+        return JSONResponse(status_code=404, content={"error": f"Unknown db_id {e}"})
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.get("/crew/stats")
+def crew_stats():
+    return {**crew_limiter.stats(), "routing": registry.default.router.stats()}
+
+
+@app.get("/databases")
+def databases():
+    """Uploaded databases the API can answer for (pass `db_id` to /query) and which are loaded."""
+    return {"registered": registry.registered(), **registry.stats()}
+
+
+@app.get("/plans/stats")
+def plan_stats(db_id: Optional[str] = None):
+    """Logged executions that SCANned vs SEARCHed each table of one DB (see src/query_plan.py)."""
+    try:
+        schema = schema_hash(registry.get(db_id).db_path)
+    except UnknownDatabase as e:
+        return JSONResponse(status_code=404, content={"error": f"Unknown db_id {e}"})
+    query_log = get_query_log()
+    return {**query_log.stats(), "tables": query_log.table_summary(schema)}
+
+
+# The advisor plans the whole workload on a schema clone many times over: run it
+# at most once per DB version and PLAN_ADVICE_TTL, one run at a time.
+PLAN_ADVICE_TTL = float(os.getenv("PLAN_ADVICE_TTL", "600"))
+_advice_cache = {}          # db path -> (fingerprint, computed at, report)
+_advice_lock = threading.Lock()
+
+
+@app.get("/plans/advice")
+def plan_advice(db_id: Optional[str] = None):
+    """Index recommendations with estimated speedups; measuring them is `python -m src.query_plan --apply`."""
+    try:
+        db_path = str(registry.get(db_id).db_path)
+    except UnknownDatabase as e:
+        return JSONResponse(status_code=404, content={"error": f"Unknown db_id {e}"})
+    fingerprint = db_fingerprint(db_path)
+    with _advice_lock:
+        cached = _advice_cache.get(db_path)
+        if cached and cached[0] == fingerprint and time.monotonic() - cached[1] < PLAN_ADVICE_TTL:
+            return cached[2]
+        report = advise(db_path)
+        _advice_cache[db_path] = (fingerprint, time.monotonic(), report)
+    return report
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics: stage/tool/LLM/embedding/Chroma/SQLite latency, tokens, repairs, cache hits."""
+    try:
+        body, content_type = render_metrics()
+    except MetricsUnavailable as e:
+        return JSONResponse(status_code=501, content={"error": str(e)})
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/embeddings/stats")
+def embedding_stats():
+    return embeddings.stats()
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    return answer_cache.stats()
+
+
+@app.post("/cache/invalidate")
+def cache_invalidate(request: InvalidateRequest):
+    """Drop cached answers for one DB (optionally one question), or for every DB."""
+    try:
+        fingerprint = None if request.all_databases else db_fingerprint(registry.get(request.db_id).db_path)
+    except UnknownDatabase as e:
+        return JSONResponse(status_code=404, content={"error": f"Unknown db_id {e}"})
+    removed = answer_cache.invalidate(fingerprint, request.query)
+    return {"removed": removed, **answer_cache.stats()}
+
+
+# "warming" until the background warm-up finishes, then "ready" (or "failed").
+warm_up_state = {"status": "warming", "error": None, "seconds": None}
+
+
+def _background_warm_up():
+    started = time.perf_counter()
+    try:
+        warm_up()
+        warm_up_state["status"] = "ready"
+    except Exception as e:
+        logger.exception("Warm-up failed")
+        warm_up_state.update(status="failed", error=str(e))
+    warm_up_state["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info("Warm-up %s in %.2fs: %s", warm_up_state["status"], warm_up_state["seconds"], startup_phases)
+
+
+@app.on_event("startup")
+def start_warm_up():
+    if os.getenv("WARM_UP_ON_START", "1") == "0":
+        warm_up_state["status"] = "ready"
+        return
+    threading.Thread(target=_background_warm_up, name="warm-up", daemon=True).start()
+
+
+@app.on_event("shutdown")
+def flush_traces():
+    shutdown_tracing()
+
+
+@app.get("/health")
+def health():
+    """Liveness: the process is up and serving HTTP."""
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+def ready():
+    """Readiness: 200 once models, stores and the DB are warm, 503 until then."""
+    body = {**warm_up_state, "phases": dict(startup_phases)}
+    return JSONResponse(status_code=200 if warm_up_state["status"] == "ready" else 503, content=body)
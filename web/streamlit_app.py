@@ -1,6 +1,7 @@
 import streamlit as st
 import requests
 import pandas as pd
+import hashlib
 import json
 import sqlite3
 from pathlib import Path
@@ -8,8 +9,16 @@ import sys
 import numpy as np
 import plotly.express as px
 
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow is optional; fall back to the compact JSON columns format
+    pa = None
+
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 from src.paths import DB_PATH
+from src.connection import get_pool
+from src.db_registry import register_database
+from src.sql_loader import is_current, load_sql_dump
 
 st.set_page_config(
     page_title="Text to SQL Project",
@@ -26,12 +35,14 @@ st.markdown("""
 
 # === Database Upload Feature ===
 DB_PARENT = Path(__file__).resolve().parent.parent / "data"
+# Rows shown while a streamed result arrives; the full table is built once, on `done`.
+STREAM_PREVIEW_ROWS = 200
 DB_PARENT.mkdir(exist_ok=True)
 
-if "db_upload_count" not in st.session_state:
-    st.session_state["db_upload_count"] = 0
 if "current_db_path" not in st.session_state:
     st.session_state["current_db_path"] = None
+if "current_db_id" not in st.session_state:
+    st.session_state["current_db_id"] = None   # lets the API answer NL questions against the upload
 
 st.markdown("""
 <div class="main-header">
@@ -43,32 +54,43 @@ st.markdown("""
 uploaded_file = st.file_uploader("Upload your .sql file", type=["sql"], key="file_upload")
 
 if uploaded_file:
-    db_number = st.session_state["db_upload_count"] + 1
-    db_folder = DB_PARENT / f"db{db_number}"
-    if db_folder.exists():
-        import shutil
-        shutil.rmtree(db_folder)
+    # Identical uploads (and Streamlit reruns with the same file) map to the same folder and are not rebuilt.
+    upload_bytes = uploaded_file.getbuffer()
+    upload_hash = hashlib.sha256(upload_bytes).hexdigest()
+    db_folder = DB_PARENT / f"db_{upload_hash[:12]}"
     db_folder.mkdir(exist_ok=True)
-    
+
     sql_path = db_folder / "uploaded.sql"
     db_path = db_folder / "uploaded.sqlite"
-    
-    with open(sql_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-    
+
+    if not sql_path.exists():
+        with open(sql_path, "wb") as f:
+            f.write(upload_bytes)
+
     try:
-        conn = sqlite3.connect(str(db_path))
-        with open(sql_path, "r", encoding="utf-8") as f:
-            sql_script = f.read()
-        conn.executescript(sql_script)
-        conn.close()
-        
-        st.success("Database created successfully.")
+        if is_current(sql_path, db_path, upload_hash):
+            load_stats = {"skipped": True}
+        else:
+            progress_bar = st.progress(0.0, text="Loading SQL dump...")
+
+            def on_progress(done, total, statements):
+                progress_bar.progress(min(done / total, 1.0) if total else 1.0,
+                                      text=f"Loading SQL dump... {statements:,} statements")
+
+            load_stats = load_sql_dump(sql_path, db_path, progress=on_progress)
+            progress_bar.empty()
+
+        if load_stats["skipped"]:
+            st.success("Database already loaded from this file.")
+        else:
+            st.success(f"Database created successfully ({load_stats['statements']:,} statements "
+                       f"in {load_stats['seconds']:.1f}s).")
         st.session_state["current_db_path"] = db_path
-        st.session_state["db_upload_count"] = db_number
+        st.session_state["current_db_id"] = register_database(db_path)
     except Exception as e:
         st.error(f"Failed to convert SQL file: {str(e)}")
         st.session_state["current_db_path"] = None
+        st.session_state["current_db_id"] = None
 
 if st.session_state["current_db_path"]:
     DB_PATH = st.session_state["current_db_path"]
@@ -99,6 +121,53 @@ def clear_nl_history():
 def clear_sql_history():
     st.session_state["sql_history"] = []
 
+def fetch_result_frame(question):
+    """
+    POST /query asking for a columnar body (Arrow IPC when pyarrow is available).
+
+    Returns (metadata dict, DataFrame or None). Arrow goes straight to pandas
+    without building per-row dicts; the compact JSON format needs one
+    DataFrame constructor call over row lists.
+    """
+    accept = "application/vnd.apache.arrow.stream" if pa is not None else "application/vnd.crewtosql.columns+json"
+    response = requests.post(
+        "http://localhost:8000/query",
+        json={"query": question, "db_id": st.session_state["current_db_id"]},
+        headers={"Accept": accept, "Accept-Encoding": "gzip"},
+        timeout=300
+    )
+    content_type = response.headers.get("content-type", "")
+    if response.status_code != 200:
+        return {"error": f"API Error: {response.status_code} - {response.text}"}, None
+    if content_type.startswith("application/vnd.apache.arrow.stream"):
+        table = pa.ipc.open_stream(response.content).read_all()
+        meta = json.loads(table.schema.metadata[b"crewtosql"])
+        return meta, table.to_pandas()
+    result = response.json()
+    if isinstance(result, str):
+        try:
+            result = json.loads(result)
+        except json.JSONDecodeError:
+            return {"error": result}, None
+    if isinstance(result, dict) and "rows" in result:
+        return result, pd.DataFrame(result["rows"], columns=result["columns"])
+    if isinstance(result, dict) and result.get("data") is not None:
+        return result, pd.DataFrame(result["data"])
+    return result if isinstance(result, dict) else {"error": str(result)}, None
+
+def iter_sse(response):
+    """Yield (event, data) pairs from a server-sent-events response."""
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+
 def visualize_ui(df, block_key=""):
     all_cols = df.columns.tolist()
     numeric_cols = df.select_dtypes(include=np.number).columns.tolist()
@@ -152,80 +221,116 @@ with tab1:
     col1, col2, col3 = st.columns([1, 1, 1])
     with col2:
         submit_button_nl = st.button("🚀 Execute NL Query", use_container_width=True, key="nl_submit")
+    stream_progress = st.checkbox("Show progress while the agents work", value=True, key="nl_stream")
     
-    if submit_button_nl and user_query:
+    if submit_button_nl and user_query and not stream_progress:
         with st.spinner("🔄 Processing your query..."):
             try:
-                response = requests.post(
-                    "http://localhost:8000/query",
-                    json={"query": user_query},
-                    timeout=300
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    if "error" in result:
-                        st.markdown(f"""
-                        <div class="error-box">
-                            <h3>❌ Error</h3>
-                            <p style="color: #ff6666;">{result['error']}</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                        st.session_state['nl_result_df'] = None
-                    else:
-                        # Parse the result if it's a JSON string
-                        if isinstance(result, str):
-                            try:
-                                result = json.loads(result)
-                            except json.JSONDecodeError:
-                                st.error("Failed to parse API response")
-                                st.session_state['nl_result_df'] = None
-                        
-                        if isinstance(result, dict) and "success" in result and result["success"]:
-                            st.markdown(f"""
+                meta, df = fetch_result_frame(user_query)
+                if "error" in meta or not meta.get("success"):
+                    message = meta.get("error") or meta.get("error_message") or meta.get("message") or json.dumps(meta)
+                    st.markdown(f"""
+                    <div class="error-box">
+                        <h3>❌ Error</h3>
+                        <p style="color: #ff6666;">{message}</p>
+                    </div>
+                    """, unsafe_allow_html=True)
+                    st.session_state['nl_result_df'] = None
+                else:
+                    st.markdown(f"""
+                    <div class="query-box">
+                        <h3>🔍 Generated SQL Query:</h3>
+                        <code>{meta['query']}</code>
+                    </div>
+                    """, unsafe_allow_html=True)
+                    st.session_state['nl_result_df'] = df
+                    add_nl_history(user_query, meta['query'])
+            except requests.exceptions.RequestException as e:
+                st.error(f"🌐 Could not connect to the API on http://localhost:8000: {e}")
+                st.session_state['nl_result_df'] = None
+
+    if submit_button_nl and user_query and stream_progress:
+        stage_labels = {
+            "refined_question": "🧠 Refined question",
+            "semantic_plan": "🗺️ Semantic plan",
+            "generated_sql": "🛠️ Generated SQL",
+            "execution": "✅ Execution & repair",
+        }
+        status_box = st.empty()
+        sql_box = st.empty()
+        table_box = st.empty()
+        st.session_state['nl_result_df'] = None
+        try:
+            with requests.post(
+                "http://localhost:8000/query/stream",
+                json={"query": user_query, "db_id": st.session_state["current_db_id"]},
+                stream=True,
+                timeout=300
+            ) as response:
+                if response.status_code != 200:
+                    st.error(f"❌ API Error: {response.status_code} - {response.text}")
+                else:
+                    columns, rows, final_sql = [], [], None
+                    status_box.info("🔄 Processing your query...")
+                    for event, data in iter_sse(response):
+                        if event == "stage":
+                            label = stage_labels.get(data["stage"], data["stage"])
+                            status_box.info(f"🔄 {label} ready")
+                            with st.expander(label, expanded=False):
+                                st.code(data["output"])
+                        elif event == "sql":
+                            final_sql = data["query"]
+                            cached = " (cached)" if data.get("cached") else ""
+                            sql_box.markdown(f"""
                             <div class="query-box">
-                                <h3>🔍 Generated SQL Query:</h3>
-                                <code>{result['query']}</code>
+                                <h3>🔍 Generated SQL Query{cached}:</h3>
+                                <code>{final_sql}</code>
                             </div>
                             """, unsafe_allow_html=True)
-                            
-                            if result['data']:
-                                df = pd.DataFrame(result['data'])
-                                st.session_state['nl_result_df'] = df
-                                add_nl_history(user_query, result['query'])
-                            else:
-                                st.info("🔍 Query executed successfully but returned no results.")
-                                st.session_state['nl_result_df'] = None
-                        else:
+                            status_box.info("🔄 Fetching rows...")
+                        elif event == "columns":
+                            columns = data["columns"]
+                        elif event == "rows":
+                            preview_full = len(rows) >= STREAM_PREVIEW_ROWS
+                            rows.extend(data["rows"])
+                            if not preview_full:
+                                table_box.dataframe(pd.DataFrame(rows[:STREAM_PREVIEW_ROWS], columns=columns),
+                                                    use_container_width=True, hide_index=True)
+                            status_box.info(f"🔄 {len(rows)} rows received...")
+                        elif event == "done":
+                            status_box.empty()
+                            table_box.empty()
+                            st.session_state['nl_result_df'] = pd.DataFrame(rows, columns=columns)
+                            add_nl_history(user_query, final_sql)
+                        elif event == "error":
+                            status_box.empty()
                             st.markdown(f"""
-                            <div class="query-box">
-                                <h3>📋 Raw Response:</h3>
-                                <code>{json.dumps(result, indent=2)}</code>
+                            <div class="error-box">
+                                <h3>❌ Error</h3>
+                                <p style="color: #ff6666;">{data['error']}</p>
                             </div>
                             """, unsafe_allow_html=True)
-                            st.session_state['nl_result_df'] = None
-                else:
-                    st.error(f"❌ API Error: {response.status_code} - {response.text}")
-                    st.session_state['nl_result_df'] = None
-                    
-            except requests.exceptions.RequestException as e:
-                st.markdown(f"""
-                <div class="error-box">
-                    <h3>🌐 Connection Error</h3>
-                    <p style="color: #ff6666;">Could not connect to the API. Please make sure your FastAPI server is running on http://localhost:8000</p>
-                    <p style="color: #ff6666;"><small>Error details: {str(e)}</small></p>
-                </div>
-                """, unsafe_allow_html=True)
-                st.session_state['nl_result_df'] = None
-                
-            except Exception as e:
-                st.markdown(f"""
-                <div class="error-box">
-                    <h3>⚠️ Unexpected Error</h3>
-                    <p style="color: #ff6666;">{str(e)}</p>
-                </div>
-                """, unsafe_allow_html=True)
-                st.session_state['nl_result_df'] = None
+
+        except requests.exceptions.RequestException as e:
+            status_box.empty()
+            st.markdown(f"""
+            <div class="error-box">
+                <h3>🌐 Connection Error</h3>
+                <p style="color: #ff6666;">Could not connect to the API. Please make sure your FastAPI server is running on http://localhost:8000</p>
+                <p style="color: #ff6666;"><small>Error details: {str(e)}</small></p>
+            </div>
+            """, unsafe_allow_html=True)
+            st.session_state['nl_result_df'] = None
+
+        except Exception as e:
+            status_box.empty()
+            st.markdown(f"""
+            <div class="error-box">
+                <h3>⚠️ Unexpected Error</h3>
+                <p style="color: #ff6666;">{str(e)}</p>
+            </div>
+            """, unsafe_allow_html=True)
+            st.session_state['nl_result_df'] = None
     
     # Display results exactly like Direct SQL tab
     df_nl = st.session_state.get('nl_result_df', None)
@@ -279,7 +384,7 @@ with tab2:
         else:
             with st.spinner("🔄 Executing your SQL query..."):
                 try:
-                    with sqlite3.connect(str(db_path)) as conn:
+                    with get_pool(db_path).connection() as conn:
                         cursor = conn.cursor()
                         cursor.execute(user_sql_query)
                         rows = cursor.fetchall()